@@ -0,0 +1,144 @@
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+import json
+import os
+import sys
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# api/index.py と同じく、ここでは軽いモジュールだけを読む。Firestore (google.cloud)・numpy・ソルバーは
+# 使うリクエストの最初の1回で読み込み、温かいインスタンスではそのまま使い回す
+# (GET の状態の問い合わせは numpy もソルバーも読まない)
+from shift_engine.jobs import (
+    FileJobStore, FirestoreJobStore, firestore_callbacks, job_view, run_job, start_in_background,
+)
+
+warnings.filterwarnings("ignore")
+
+# リクエストで year / month が指定されなかったときの対象月
+TARGET_YEAR = 2026
+TARGET_MONTH = 2
+# thread / worker で動かすジョブは関数の実行時間制限に縛られないので、同期版 (api/index.py) より長めに取る
+DEFAULT_TIME_LIMIT = 120
+# sync のときは api/index.py と同じ (関数の実行時間制限に収める)
+SYNC_TIME_LIMIT = 45
+
+# SHIFT_JOB_DIR を指定するとジョブ状態をローカルのファイルに置く (Firestore なしで動かすとき用)
+# SHIFT_JOB_RUNNER: ジョブの動かし方
+#   sync (既定) : このリクエストの中で最後まで解いてから返す (Vercel はレスポンスを返すと関数を止めるため)
+#   thread      : 202 を返したあと、プロセス内のスレッドで解く (ローカル・常駐サーバー用)
+#   worker      : 登録だけして、実行は job_worker.py に任せる
+JOB_DIR = os.environ.get("SHIFT_JOB_DIR")
+JOB_RUNNER = os.environ.get("SHIFT_JOB_RUNNER", "sync")
+
+# 温かいうちに使い回すもの (最初に使うリクエストで作る)
+_INSTANCE = {
+    # /tmp のキャッシュから差分だけ読む (cache.SnapshotCache)
+    "snapshotCache": None,
+    # 同じ店舗・月のジョブが続くときはモデルの骨組みを使い回す (model_cache.ModelCache)
+    "modelCache": None,
+}
+
+
+def _snapshot_cache():
+    if _INSTANCE["snapshotCache"] is None:
+        from shift_engine.cache import SnapshotCache
+
+        _INSTANCE["snapshotCache"] = SnapshotCache()
+    return _INSTANCE["snapshotCache"]
+
+
+def _model_cache():
+    if _INSTANCE["modelCache"] is None:
+        from shift_engine.model_cache import ModelCache
+
+        _INSTANCE["modelCache"] = ModelCache()
+    return _INSTANCE["modelCache"]
+
+
+def _get_client():
+    from shift_engine.firestore_io import get_client
+
+    return get_client()
+
+
+def _job_store(db):
+    if JOB_DIR:
+        return FileJobStore(JOB_DIR)
+    return FirestoreJobStore(db)
+
+
+class handler(BaseHTTPRequestHandler):
+    def _send_json(self, code, body):
+        self.send_response(code)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(body, ensure_ascii=False).encode('utf-8'))
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length == 0:
+            return {}
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_POST(self):
+        """シフト作成ジョブを登録して jobId を返す
+
+        SHIFT_JOB_RUNNER=thread / worker ならすぐに 202、sync なら解き終わってから 200 で GET と同じ形を返す
+        """
+        try:
+            options = self._read_json()
+            default_limit = SYNC_TIME_LIMIT if JOB_RUNNER == "sync" else DEFAULT_TIME_LIMIT
+            params = {
+                "year": int(options.get("year", TARGET_YEAR)),
+                "month": int(options.get("month", TARGET_MONTH)),
+                "mode": options.get("mode", "monolithic"),
+                "warmStart": bool(options.get("warmStart", False)),
+                "heuristicStart": bool(options.get("heuristicStart", False)),
+                "fixUntouched": options.get("fixUntouched", True),
+                "timeLimit": options.get("timeLimit", default_limit),
+                "gap": options.get("gap"),
+                "threads": options.get("threads"),
+                "backend": options.get("backend", "cbc"),
+                "portfolio": options.get("portfolio"),
+                "profile": bool(options.get("profile", False)),
+                "tierLimits": options.get("tierLimits"),
+            }
+            db = _get_client()
+            store = _job_store(db)
+            job = store.create(params)
+            if JOB_RUNNER == "worker":
+                self._send_json(202, {"jobId": job["id"], "status": job["status"]})
+                return
+            load, save = firestore_callbacks(db, _snapshot_cache())
+            if JOB_RUNNER == "thread":
+                start_in_background(store, job, load, save, _model_cache())
+                self._send_json(202, {"jobId": job["id"], "status": job["status"]})
+                return
+            run_job(store, job, load, save, _model_cache())
+            view = job_view(store.get(job["id"]))
+            view.pop("traceback", None)
+            self._send_json(200, dict(view, jobId=job["id"]))
+
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+    def do_GET(self):
+        """?jobId=... のジョブの状態 (phase / progress / elapsedSec) を返す"""
+        try:
+            query = parse_qs(urlparse(self.path).query)
+            job_id = (query.get("jobId") or [None])[0]
+            if not job_id:
+                self._send_json(400, {"error": "jobId を指定してください"})
+                return
+            job = _job_store(None if JOB_DIR else _get_client()).get(job_id)
+            if job is None:
+                self._send_json(404, {"error": "ジョブが見つかりません"})
+                return
+            view = job_view(job)
+            view.pop("traceback", None)
+            self._send_json(200, view)
+
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
@@ -0,0 +1,105 @@
+from http.server import BaseHTTPRequestHandler
+import json
+import os
+import sys
+import time
+import traceback
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from shift_engine.cache import SnapshotCache
+from shift_engine.firestore_io import get_client
+from shift_engine.profiling import log_json, new_run_id
+from shift_engine.solver import SolverOptions
+from shift_engine.sweep import expand_scenarios, iter_sweep, summarize
+
+warnings.filterwarnings("ignore")
+
+# リクエストで year / month が指定されなかったときの対象月
+TARGET_YEAR = 2026
+TARGET_MONTH = 2
+# 1シナリオあたりの制限時間 (秒) の既定値と、1回で解くシナリオ数の上限 (関数の実行時間制限に収めるため)
+DEFAULT_TIME_LIMIT = 20
+MAX_SCENARIOS = 24
+SNAPSHOT_CACHE = SnapshotCache()
+
+
+class handler(BaseHTTPRequestHandler):
+    def _send_json(self, code, body):
+        self.send_response(code)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(body, ensure_ascii=False).encode('utf-8'))
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length == 0:
+            return {}
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_line(self, body):
+        self.wfile.write((json.dumps(body, ensure_ascii=False) + "\n").encode('utf-8'))
+        self.wfile.flush()
+
+    def do_POST(self):
+        """monthlyConfig の設定を振ったシナリオをまとめて解き、終わった順に1行ずつ返す (NDJSON)
+
+        body: {year, month, grid: {"caps.hoursLow": [60, 70], ...}, variants: [{"caps": {...}}, ...],
+               timeLimit (1シナリオあたり), workers, threads, mode, backend, heuristicStart (既定 false)}
+        1行目 {"type": "start", scenarios}、解けるたびに {"type": "result", ...}、
+        最後に {"type": "done", summary (比較表 table と一番良い best)}。保存はしない。
+        """
+        run_id = new_run_id()
+        started = time.perf_counter()
+        try:
+            options = self._read_json()
+            try:
+                scenarios = expand_scenarios(options.get("grid"), options.get("variants"),
+                                             include_base=options.get("includeBase", True))
+            except ValueError as e:
+                self._send_json(400, {"error": str(e), "runId": run_id})
+                return
+            if len(scenarios) > MAX_SCENARIOS:
+                self._send_json(400, {"error": f"シナリオが多すぎます ({len(scenarios)} > {MAX_SCENARIOS})",
+                                      "runId": run_id})
+                return
+            db = get_client()
+            year = int(options.get("year", TARGET_YEAR))
+            month = int(options.get("month", TARGET_MONTH))
+            snap = SNAPSHOT_CACHE.load_snapshot(db, year, month)
+            solver_options = SolverOptions(
+                time_limit=options.get("timeLimit", DEFAULT_TIME_LIMIT),
+                threads=options.get("threads", 1),
+                backend=options.get("backend", "cbc"),
+                portfolio=options.get("portfolio"),
+            )
+        except Exception as e:
+            log_json("error", runId=run_id, error=str(e), traceback=traceback.format_exc())
+            self._send_json(500, {"error": str(e), "runId": run_id})
+            return
+
+        # ここからは 200 で流す (途中のエラーも1行として返す)
+        self.send_response(200)
+        self.send_header('Content-type', 'application/x-ndjson')
+        self.end_headers()
+        rows = []
+        try:
+            self._send_line({"type": "start", "runId": run_id, "scenarios": scenarios})
+            t0 = time.perf_counter()
+            for row in iter_sweep(snap, scenarios, workers=options.get("workers"),
+                                  mode=options.get("mode", "monolithic"), options=solver_options,
+                                  heuristic_start=bool(options.get("heuristicStart", False))):
+                row.pop("traceback", None)
+                rows.append(row)
+                self._send_line(dict(row, type="result"))
+            summary = summarize(rows, time.perf_counter() - t0)
+            self._send_line({"type": "done", "runId": run_id, "summary": summary})
+            log_json("sweep", runId=run_id, scenarios=len(scenarios), feasible=summary["feasible"],
+                     best=summary["best"], totalSec=round(time.perf_counter() - started, 4))
+        except (BrokenPipeError, ConnectionResetError):
+            # 画面を閉じた: iter_sweep を抜けた時点で、まだ始まっていないシナリオは取り消されている
+            log_json("sweep", runId=run_id, scenarios=len(scenarios), finished=len(rows), disconnected=True)
+        except Exception as e:
+            log_json("error", runId=run_id, error=str(e), traceback=traceback.format_exc())
+            self._send_line({"type": "error", "runId": run_id, "error": str(e)})
@@ -0,0 +1,55 @@
+from http.server import BaseHTTPRequestHandler
+import json
+import os
+import sys
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from shift_engine.cache import SnapshotCache
+from shift_engine.firestore_io import get_client, load_schedule
+from shift_engine.validate import validate_schedule
+
+warnings.filterwarnings("ignore")
+
+# リクエストで year / month が指定されなかったときの対象月
+TARGET_YEAR = 2026
+TARGET_MONTH = 2
+SNAPSHOT_CACHE = SnapshotCache()
+
+
+class handler(BaseHTTPRequestHandler):
+    def _send_json(self, code, body):
+        self.send_response(code)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(body, ensure_ascii=False).encode('utf-8'))
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length == 0:
+            return {}
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_POST(self):
+        """シフト表を今の条件 (staffs / monthlyConfig / shifts) で判定し、違反とペナルティの内訳を返す
+
+        body の schedule (日 -> 割り当ての list) を省略すると determined_shifts の保存済みシフトを判定する
+        (手で直したシフトをソルバーを回さずに確かめる用)。
+        """
+        try:
+            options = self._read_json()
+            db = get_client()
+            year = int(options.get("year", TARGET_YEAR))
+            month = int(options.get("month", TARGET_MONTH))
+            schedule = options.get("schedule")
+            if schedule is None:
+                schedule, _ = load_schedule(db, year, month)
+                if schedule is None:
+                    self._send_json(404, {"error": "確定シフトがありません"})
+                    return
+            snap = SNAPSHOT_CACHE.load_snapshot(db, year, month)
+            self._send_json(200, validate_schedule(snap, schedule))
+
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
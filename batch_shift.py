@@ -0,0 +1,66 @@
+"""複数店舗・複数月のシフトをまとめて作成する
+
+ジョブ一覧 (JSON) の例:
+    [
+      {"store": "shibuya", "keyPath": "keys/shibuya.json", "year": 2026, "month": 3},
+      {"store": "shibuya", "keyPath": "keys/shibuya.json", "year": 2026, "month": 4},
+      {"store": "demo", "synthetic": 60, "year": 2026, "month": 3}
+    ]
+
+    python batch_shift.py jobs.json --workers 4 --threads 1
+"""
+import argparse
+import json
+import sys
+import warnings
+
+from shift_engine.batch import BatchJob, run_batch
+from shift_engine.solver import SOLUTION_STATUSES, SolverOptions
+
+warnings.filterwarnings("ignore")
+
+
+def print_report(report):
+    job = report["job"]
+    label = f"{job['store']} {job['year']}-{job['month']}"
+    if report["status"] in SOLUTION_STATUSES:
+        gap = f", gap {report['gap']:.2%}" if report.get("gap") else ""
+        print(f"✅ {label}: {report['wallSec']:.2f}s (読込 {report.get('loadSec')}s / 計算 {report.get('solveSec')}s{gap})")
+    elif report["status"] == "Error":
+        print(f"💥 {label}: {report['error']}")
+    else:
+        print(f"❌ {label}: {report['status']} ({report['wallSec']:.2f}s) 条件を見直してください")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="シフトの一括作成")
+    parser.add_argument("jobs", help="ジョブ一覧の JSON ファイル")
+    parser.add_argument("--workers", type=int, default=None, help="同時に動かすプロセス数")
+    parser.add_argument("--threads", type=int, default=1, help="1ジョブあたりのソルバーのスレッド数")
+    parser.add_argument("--time-limit", type=float, default=None, help="1ジョブあたりのソルバーの制限時間 (秒)")
+    parser.add_argument("--gap", type=float, default=None, help="相対 MIP ギャップ (0.01 = 1%%)")
+    parser.add_argument("--backend", default="cbc", choices=["cbc", "highs", "cpsat", "portfolio"],
+                        help="使うソルバー (portfolio は CBC の設定違いを同時に走らせる)")
+    parser.add_argument("--out", default=None, help="各ジョブの結果を保存する JSON")
+    args = parser.parse_args(argv)
+
+    with open(args.jobs) as f:
+        jobs = [BatchJob.from_dict(j) for j in json.load(f)]
+
+    print(f"🤖 {len(jobs)}件のシフト作成を開始します")
+    options = SolverOptions(threads=args.threads, time_limit=args.time_limit, gap_rel=args.gap, backend=args.backend)
+    reports, summary = run_batch(jobs, workers=args.workers, options=options, on_result=print_report)
+
+    print("-" * 30)
+    print(f"📊 {summary['ok']}/{summary['jobs']}件成功, {summary['elapsedSec']}秒 "
+          f"({summary['jobsPerMin']}件/分, 1件あたり平均 {summary['wallSecMean']}秒 / 最大 {summary['wallSecMax']}秒, "
+          f"{summary['workers']}プロセス)")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"summary": summary, "reports": reports}, f, ensure_ascii=False, indent=2)
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+"""シフト作成のベンチマーク (Firestore不要)
+
+架空店舗 (shift_engine.synthetic) を規模別に作り、モデル構築時間・変数/制約数・
+presolve 後に CBC に渡る規模・CBC の求解時間・ピークメモリを計測して JSON に保存する。
+--rolling を付けると週単位の分割求解 (rolling) の時間と、一括求解との目的関数の差も記録する。
+--lexicographic を付けると目的関数を段に分けた求解の、段ごとの値・時間と一括求解との差も記録する。
+--backends cbc highs cpsat で同じ店舗を各ソルバーで解き、時間・目的関数値・制約違反を並べる
+(portfolio では、どの構成が勝ったかも記録する)。
+rebuild_sec は希望だけ変えて出し直したときの構築時間 (model_cache.ModelCache の骨組みを使い回したとき)。
+求解できたシナリオでは validate (ソルバー非依存の判定) の1秒あたりの判定数と、採点と目的関数値の差も記録する。
+--baseline に前回の JSON を渡すと、シナリオごとの増減を表示する。
+
+    python bench_shift.py --sizes 20 60 150 400 --out bench.json
+    python bench_shift.py --baseline bench.json --out bench_new.json
+"""
+import argparse
+import dataclasses
+import datetime
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import time
+
+import numpy as np
+
+from shift_engine.model import build_model
+from shift_engine.model_cache import ModelCache
+from shift_engine.presolve import presolve
+from shift_engine.rolling import solve_rolling
+from shift_engine.ruleset import merge_ruleset
+from shift_engine.lexicographic import solve_lexicographic
+from shift_engine.backends import BACKENDS, check_solution, solve
+from shift_engine.solver import SolverOptions
+from shift_engine.synthetic import make_store
+from shift_engine.validate import compile_rules, evaluate
+
+DEFAULT_SIZES = [20, 60, 150, 400]
+DEFAULT_MONTHS = ["2026-2", "2026-4", "2026-3"]  # 28 / 30 / 31日
+REGRESSION_RATIO = 1.2
+VALIDATE_BATCH = 256
+
+
+def _peak_rss_mb(who):
+    rss = resource.getrusage(who).ru_maxrss
+    # Linux は KB、macOS は byte
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_scenario(scenario):
+    """1シナリオを計測する (ピークメモリを分けるため、呼び出し側で別プロセスにする)"""
+    year, month = map(int, scenario["month"].split("-"))
+    snap = make_store(
+        scenario["staff"], year, month,
+        request_density=scenario["density"],
+        custom_ratio=scenario.get("custom_ratio"),
+        n_skills=scenario["skills"],
+        seed=scenario["seed"],
+    )
+    if scenario.get("slot_coverage"):
+        snap.rules = merge_ruleset({"slotCoverage": [{"from": "10:00", "to": "21:30", "min": scenario["slot_coverage"]}]})
+    n_custom = sum(1 for reqs in snap.request_map.values()
+                   for r in reqs.values() if r.get("type") == "時間指定")
+
+    t0 = time.perf_counter()
+    model = build_model(snap)
+    build_sec = time.perf_counter() - t0
+    # 出し直し: 名簿はそのままで希望だけ別の乱数にしたものを、骨組みを使い回して組む
+    cache = ModelCache(disk=False)
+    build_model(snap, cache=cache)
+    other = make_store(scenario["staff"], year, month, request_density=scenario["density"],
+                       custom_ratio=scenario.get("custom_ratio"), n_skills=scenario["skills"], seed=scenario["seed"] + 1)
+    t0 = time.perf_counter()
+    build_model(dataclasses.replace(snap, request_map=other.request_map), cache=cache)
+    rebuild_sec = time.perf_counter() - t0
+
+    result = dict(scenario)
+    result.update({
+        "days": len(snap.days),
+        "custom_requests": n_custom,
+        "build_sec": round(build_sec, 4),
+        "rebuild_sec": round(rebuild_sec, 4),
+        "model_cache": cache.to_dict(),
+        "variables": model.n_vars,
+        "integer_variables": int(np.count_nonzero(model.is_int)),
+        "constraints": model.n_rows,
+        "nonzeros": model.nnz,
+        "constraints_by_family": model.family_counts(),
+    })
+
+    # CBC に渡る縮小後の規模 (値の決まった変数・不要な行を除いたもの)
+    reduced = presolve(model)
+    result.update({
+        "presolve_sec": reduced.stats["sec"],
+        "presolved_variables": reduced.model.n_vars,
+        "presolved_constraints": reduced.model.n_rows,
+        "presolved_nonzeros": reduced.model.nnz,
+    })
+
+    if scenario["solve"]:
+        # 同じモデルを各バックエンドで解き、同じチェッカー (check_solution) で制約違反を数える
+        result["backends"] = {}
+        for name in scenario.get("backends") or ["cbc"]:
+            t0 = time.perf_counter()
+            solved = solve(model, options=SolverOptions(backend=name, time_limit=scenario.get("time_limit")))
+            result["backends"][name] = {
+                "solve_sec": round(time.perf_counter() - t0, 4),
+                "status": solved.status,
+                "objective": solved.objective,
+                "gap": solved.gap,
+                "violations": check_solution(model, solved.values) if solved.has_solution else None,
+            }
+            if solved.portfolio:
+                result["backends"][name]["winner"] = solved.portfolio["winner"]
+        first = next(iter(result["backends"].values()))
+        result["solve_sec"] = first["solve_sec"]
+        result["status"] = first["status"]
+        result["objective"] = first["objective"]
+        if solved.has_solution:
+            result.update(_bench_validator(snap, model.x_values(solved.values), solved.objective))
+
+    if scenario.get("rolling"):
+        t0 = time.perf_counter()
+        rolled, stats = solve_rolling(model)
+        result["rolling_solve_sec"] = round(time.perf_counter() - t0, 4)
+        result["rolling_status"] = rolled.status
+        result["rolling_objective"] = rolled.objective
+        result["rolling_blocks"] = len(stats.blocks)
+        # 一括で解いた目的関数値との差 (最大化なので 一括 - 分割)
+        if rolled.objective is not None and result.get("objective"):
+            result["rolling_gap"] = round((result["objective"] - rolled.objective) / abs(result["objective"]), 6)
+
+    if scenario.get("lexicographic"):
+        t0 = time.perf_counter()
+        lex, stats = solve_lexicographic(model, options=SolverOptions(time_limit=scenario.get("time_limit")))
+        result["lex_solve_sec"] = round(time.perf_counter() - t0, 4)
+        result["lex_status"] = lex.status
+        result["lex_objective"] = lex.objective
+        result["lex_tiers"] = stats.tiers
+        if lex.objective is not None and result.get("objective"):
+            result["lex_gap"] = round((result["objective"] - lex.objective) / abs(result["objective"]), 6)
+
+    # CBC は子プロセス (HiGHS / CP-SAT は同じプロセス) なので、自プロセスと子プロセスの大きい方をピークとする
+    result["peak_rss_mb"] = round(max(_peak_rss_mb(resource.RUSAGE_SELF),
+                                      _peak_rss_mb(resource.RUSAGE_CHILDREN)), 1)
+    return result
+
+
+def _bench_validator(snap, assigned, objective):
+    """validate (ソルバー非依存の判定) の速さと、採点が目的関数値と一致するかを測る"""
+    rules = compile_rules(snap)
+    single = evaluate(rules, assigned)
+    batch = np.repeat(assigned[None], VALIDATE_BATCH, axis=0)
+    t0 = time.perf_counter()
+    evaluate(rules, batch)
+    sec = time.perf_counter() - t0
+    return {
+        "validate_per_sec": round(VALIDATE_BATCH / sec),
+        "validate_hard": sum(single.hard.values()),
+        "validate_score_diff": round(single.score - objective, 6) + 0.0,
+    }
+
+
+def scenario_key(r):
+    return (r["staff"], r["month"], r["density"], r.get("custom_ratio"), r["skills"], r["seed"],
+            r.get("slot_coverage"))
+
+
+def compare(results, baseline):
+    base = {scenario_key(r): r for r in baseline["results"]}
+    print("\n📊 前回との比較 (今回 / 前回)")
+    regressions = 0
+    for r in results:
+        b = base.get(scenario_key(r))
+        if not b:
+            continue
+        parts = []
+        pairs = [(key, r.get(key), b.get(key)) for key in ("build_sec", "rebuild_sec", "solve_sec", "rolling_solve_sec",
+                                                           "lex_solve_sec", "peak_rss_mb")]
+        for name, cur in r.get("backends", {}).items():
+            prev = b.get("backends", {}).get(name, {})
+            pairs.append((f"{name}_solve_sec", cur.get("solve_sec"), prev.get("solve_sec")))
+        for key, now, before in pairs:
+            if now and before:
+                ratio = now / before
+                mark = " ⚠️" if ratio > REGRESSION_RATIO else ""
+                regressions += bool(mark)
+                parts.append(f"{key}={ratio:.2f}x{mark}")
+        print(f"  {r['staff']}人 {r['month']}: " + ", ".join(parts))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="シフト作成ベンチマーク")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="スタッフ数")
+    parser.add_argument("--months", nargs="+", default=DEFAULT_MONTHS, help="対象月 (YYYY-M)")
+    parser.add_argument("--density", type=float, nargs="+", default=[0.5], help="パートナーの希望提出率")
+    parser.add_argument("--custom-ratio", type=float, default=None, help="希望に占める時間指定の割合")
+    parser.add_argument("--skills", type=int, default=2, help="minSkills の項目数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--slot-coverage", type=int, default=None,
+                        help="10:00-21:30 の30分枠ごとの最低人数 (rules.slotCoverage) を入れて計測する")
+    parser.add_argument("--no-solve", action="store_true", help="モデル構築のみ計測する")
+    parser.add_argument("--solve-max-staff", type=int, default=None, help="この人数を超える店舗は求解しない")
+    parser.add_argument("--rolling", action="store_true", help="週単位の分割求解も計測し、一括求解と比べる")
+    parser.add_argument("--lexicographic", action="store_true",
+                        help="目的関数を優先度の段に分けた求解も計測し、一括求解と比べる")
+    parser.add_argument("--backends", nargs="+", default=["cbc"], choices=list(BACKENDS),
+                        help="比較するソルバー (先頭のものを solve_sec として記録する)")
+    parser.add_argument("--time-limit", type=float, default=None, help="1回の求解の制限時間 (秒)")
+    parser.add_argument("--out", default="bench.json", help="結果の保存先")
+    parser.add_argument("--baseline", default=None, help="比較する前回の結果 JSON")
+    args = parser.parse_args(argv)
+
+    scenarios = []
+    for staff in args.sizes:
+        for month in args.months:
+            for density in args.density:
+                run_solve = not args.no_solve and (args.solve_max_staff is None or staff <= args.solve_max_staff)
+                scenarios.append({
+                    "staff": staff, "month": month, "density": density,
+                    "custom_ratio": args.custom_ratio, "skills": args.skills,
+                    "seed": args.seed, "slot_coverage": args.slot_coverage, "solve": run_solve,
+                    "rolling": args.rolling, "lexicographic": args.lexicographic,
+                    "backends": args.backends, "time_limit": args.time_limit,
+                })
+
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for scenario in scenarios:
+        # シナリオごとに新しいプロセスで実行し、ピークメモリを独立させる
+        with ctx.Pool(1) as pool:
+            r = pool.apply(run_scenario, (scenario,))
+        results.append(r)
+        solve_info = f"solve {r['solve_sec']:.2f}s ({r['status']})" if "solve_sec" in r else "solve -"
+        if "rolling_solve_sec" in r:
+            solve_info += f", rolling {r['rolling_solve_sec']:.2f}s ({r['rolling_status']}, gap {r.get('rolling_gap')})"
+        slots = f" 枠{r['slot_coverage']}人" if r.get("slot_coverage") else ""
+        if "lex_solve_sec" in r:
+            solve_info += f", lexicographic {r['lex_solve_sec']:.2f}s ({r['lex_status']}, gap {r.get('lex_gap')})"
+        print(f"🏪 {r['staff']:>4}人 {r['month']:>7} ({r['days']}日){slots}: build {r['build_sec']:.3f}s (出し直し {r['rebuild_sec']:.3f}s), {solve_info}, "
+              f"vars {r['variables']}→{r['presolved_variables']}, cons {r['constraints']}→{r['presolved_constraints']}, "
+              f"nnz {r['nonzeros']}→{r['presolved_nonzeros']}, "
+              f"RSS {r['peak_rss_mb']}MB")
+        if "validate_per_sec" in r:
+            print(f"     validate: {r['validate_per_sec']}件/s, 違反 {r['validate_hard']}, "
+                  f"採点 - 目的関数 = {r['validate_score_diff']}")
+        if len(r.get("backends", {})) > 1:
+            for name, b in r["backends"].items():
+                check = "OK" if b["violations"] == {} else b["violations"]
+                winner = f" (勝ち: {b['winner']})" if b.get("winner") else ""
+                print(f"     {name:>6}: {b['solve_sec']:.2f}s {b['status']} obj={b['objective']} "
+                      f"制約チェック {check}{winner}")
+        for t in r.get("lex_tiers", []):
+            print(f"     {t['tier']:>9}: {t.get('sec', 0):.2f}s {t['status']} obj={t.get('objective')}")
+
+    report = {
+        "createdAt": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 {args.out} に保存しました")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            if compare(results, json.load(f)):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""コールドスタートの読み込み時間のベンチマーク
+
+入口ごとに新しい Python を `-X importtime` 付きで起動し、モジュールごとの読み込み時間を集計して JSON に保存する。
+パッケージ (google / numpy / pulp ...) ごとの合計と、時間のかかったモジュールの上位を表示する。
+--baseline に前回の JSON を渡すと入口・パッケージごとの増減を表示し、入口の合計が REGRESSION_RATIO 倍を超えるか、
+パッケージが REGRESSION_MS 以上増えたら (新しく重い依存を読み始めたなど) 終了コード 1 を返す。
+
+    python bench_startup.py --out startup.json
+    python bench_startup.py --baseline startup.json --out startup_new.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# 入口 -> 読み込むコード (別プロセスで1回ずつ実行する)
+TARGETS = {
+    # Vercel の関数 (api/index.py) を読むだけ。GET のヘルスチェックはここまでで返る
+    "api": "import sys; sys.path.insert(0, 'api'); import index",
+    # 画面から使うジョブの関数 (api/jobs.py)。GET の状態の問い合わせはここまでで返る
+    "api_jobs": "import sys; sys.path.insert(0, 'api'); import jobs",
+    # POST の最初の1回で読むもの
+    "engine": "import shift_engine.engine",
+    "firestore": "import shift_engine.firestore_io; import firebase_admin.firestore; "
+                 "import google.cloud.firestore_v1.base_query",
+    "cbc": "from shift_engine.solver import cbc_path; cbc_path()",
+}
+DEFAULT_TARGETS = list(TARGETS)
+REGRESSION_RATIO = 1.2
+# パッケージごとは比率だとぶれが大きいので、増えたミリ秒で見る
+REGRESSION_MS = 20.0
+
+
+def parse_importtime(text):
+    """-X importtime の出力 -> [(モジュール名, 深さ, 自身の us, 累積の us)]"""
+    rows = []
+    for line in text.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # "import time:   self |   cumulative | <字下げ>モジュール名" (字下げ2文字が1段)
+        head, cum_us, name = line.split("|", 2)
+        self_us = head.rsplit(":", 1)[1]
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cum_us)))
+    return rows
+
+
+def measure(code):
+    """code を新しいプロセスで実行し、読み込み時間を集計する"""
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                          capture_output=True, text=True)
+    wall = time.perf_counter() - t0
+    rows = parse_importtime(proc.stderr)
+    if proc.returncode != 0:
+        error = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        return {"error": error[-1] if error else f"exit {proc.returncode}"}
+    packages = {}
+    for name, _, self_us, _ in rows:
+        top = name.split(".")[0]
+        packages[top] = packages.get(top, 0) + self_us
+    return {
+        "wall_sec": round(wall, 4),
+        "import_ms": round(sum(cum for _, depth, _, cum in rows if depth == 0) / 1000, 1),
+        "modules": len(rows),
+        "packages": {k: round(v / 1000, 1) for k, v in sorted(packages.items(), key=lambda kv: -kv[1])},
+        "top": [{"module": name, "self_ms": round(s / 1000, 1), "cum_ms": round(c / 1000, 1)}
+                for name, _, s, c in sorted(rows, key=lambda r: -r[2])[:10]],
+    }
+
+
+def compare(results, baseline):
+    print("\n📊 前回との比較 (今回 / 前回)")
+    regressions = 0
+    for target, r in results.items():
+        b = baseline.get("results", {}).get(target)
+        if not b or "error" in r or "error" in b:
+            continue
+        ratio = r["import_ms"] / b["import_ms"]
+        mark = " ⚠️" if ratio > REGRESSION_RATIO else ""
+        regressions += bool(mark)
+        parts = [f"import_ms={ratio:.2f}x{mark}"]
+        for name, ms in r["packages"].items():
+            diff = ms - b["packages"].get(name, 0.0)
+            if diff >= REGRESSION_MS:
+                regressions += 1
+                parts.append(f"{name} +{diff:.1f}ms ⚠️" if name in b["packages"] else f"{name} 新規 {ms}ms ⚠️")
+        print(f"  {target}: " + ", ".join(parts))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="コールドスタートの読み込み時間ベンチマーク")
+    parser.add_argument("--targets", nargs="+", default=DEFAULT_TARGETS, choices=list(TARGETS), help="計測する入口")
+    parser.add_argument("--repeat", type=int, default=3, help="入口ごとの実行回数 (一番速かった回を記録する)")
+    parser.add_argument("--out", default="startup.json", help="結果の保存先")
+    parser.add_argument("--baseline", default=None, help="比較する前回の結果 JSON")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for target in args.targets:
+        runs = [measure(TARGETS[target]) for _ in range(args.repeat)]
+        ok = [r for r in runs if "error" not in r]
+        r = min(ok, key=lambda r: r["import_ms"]) if ok else runs[0]
+        results[target] = r
+        if "error" in r:
+            print(f"💥 {target}: {r['error']}")
+            continue
+        packages = ", ".join(f"{name} {ms}ms" for name, ms in list(r["packages"].items())[:5])
+        print(f"🚀 {target:>9}: import {r['import_ms']}ms ({r['modules']} modules), プロセス {r['wall_sec']:.2f}s")
+        print(f"     {packages}")
+
+    report = {
+        "createdAt": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 {args.out} に保存しました")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            if compare(results, json.load(f)):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
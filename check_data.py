@@ -1,91 +1,83 @@
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import firestore
+"""シフト希望と売上設定の事前チェック (日ごとの人員・鍵・予算)
+
+指定した月の希望を 日 × スタッフ の表にして、日ごとに
+シフト別に入れる人数・鍵を持つ人・リーダー・パートナーの時間と上限・人件費の目安の時間を並べ、
+解なしになりそうな日 (diagnose.precheck と同じ判定) や予算オーバーの日に印を付ける。
+
+    python check_data.py --year 2026 --month 2
+    python check_data.py --year 2026 --whole-year --csv check_2026.csv
+    python check_data.py --synthetic 400 --whole-year   # Firestore 無しで架空店舗を調べる
+"""
+import argparse
+import time
+import warnings
+
 import pandas as pd
-from datetime import datetime
 
-# 1. Firebaseに接続
-if not firebase_admin._apps:
-    cred = credentials.Certificate("serviceAccountKey.json")
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
+from shift_engine.staffing import HOURLY_WAGE, LABOR_COST_RATIO, risk_days, staffing_report
 
-# 設定：計算したい年月（Webで入力した月と同じにしてください）
-TARGET_YEAR = 2026
-TARGET_MONTH = 2
-DAYS_IN_MONTH = 28 # ※2月なのでとりあえず28（後で自動化します）
+warnings.filterwarnings("ignore")
 
-print(f"🤖 AIデータ読み込み開始: {TARGET_YEAR}年{TARGET_MONTH}月")
-print("-" * 40)
+# --- 1. 設定 ---
+parser = argparse.ArgumentParser(description="シフト希望と売上設定の事前チェック")
+parser.add_argument("--year", type=int, default=2026)
+parser.add_argument("--month", type=int, nargs="+", default=[2], help="対象月 (複数可)")
+parser.add_argument("--whole-year", action="store_true", help="1月から12月までまとめて調べる")
+parser.add_argument("--hourly-wage", type=float, default=HOURLY_WAGE, help="人件費の目安に使う時給 (円)")
+parser.add_argument("--labor-cost-ratio", type=float, default=LABOR_COST_RATIO, help="売上に対する人件費の割合")
+parser.add_argument("--csv", default=None, help="全日の表を CSV に書き出す")
+parser.add_argument("--synthetic", type=int, default=None, help="Firestore の代わりにこの人数の架空店舗を使う")
+args = parser.parse_args()
+months = list(range(1, 13)) if args.whole_year else args.month
 
-# 2. 売上設定（予算）を取得
-config_ref = db.collection("monthlyConfig").document(f"{TARGET_YEAR}-{TARGET_MONTH}")
-config = config_ref.get()
-daily_sales = {}
-if config.exists:
-    daily_sales = config.to_dict().get("dailySales", {})
-    print("✅ 売上設定: 読み込み成功")
-else:
-    print("⚠️ 売上設定が見つかりません（デフォルト値を使います）")
+print(f"🤖 データチェック開始: {args.year}年 {', '.join(f'{m}月' for m in months)}")
+print("-" * 40)
 
-# 3. スタッフとシフト希望をまとめて取得
-# まず全員のリストを作る
-staffs = {doc.id: doc.to_dict() for doc in db.collection("staffs").stream()}
-print(f"✅ スタッフリスト: {len(staffs)}名")
+# --- 2. データ取得 ---
+t0 = time.perf_counter()
+if args.synthetic:
+    from shift_engine.synthetic import make_store
 
-# 次に提出されたシフト希望を取得
-shifts = db.collection("shifts").where("year", "==", TARGET_YEAR).where("month", "==", TARGET_MONTH).stream()
+    snaps = [make_store(args.synthetic, args.year, m, seed=m) for m in months]
+else:
+    from shift_engine.cache import SnapshotCache
+    from shift_engine.firestore_io import get_client
 
-# データを整理する箱
-# request_map["1日"]["スタッフID"] = "早番" みたいな形にする
-request_map = {str(d): {} for d in range(1, DAYS_IN_MONTH + 1)}
+    db = get_client()
+    cache = SnapshotCache()
+    snaps = [cache.load_snapshot(db, args.year, m) for m in months]
+for snap in snaps:
+    if not snap.daily_sales:
+        print(f"⚠️ {snap.doc_id}: 売上設定が見つかりません（予算は0時間として扱います）")
+print(f"✅ 読み込み: {len(snaps)}ヶ月, スタッフ {max(len(s.staffs) for s in snaps)}名 ({time.perf_counter() - t0:.2f}秒)")
 
-for s in shifts:
-    data = s.to_dict()
-    sid = data["staffId"]
-    # その人の希望データ（requests: {"1": {type: "早番"}, ...}）
-    user_requests = data.get("requests", {})
-    
-    for day, req in user_requests.items():
-        if day in request_map:
-            # タイプ（早番、希望休など）を保存
-            request_map[day][sid] = req.get("type", "不明")
+# --- 3. 診断 ---
+t0 = time.perf_counter()
+report = pd.concat([staffing_report(snap, args.hourly_wage, args.labor_cost_ratio) for snap in snaps],
+                   ignore_index=True)
+risky = risk_days(report)
+print(f"🧮 {len(report)}日分を診断しました ({time.perf_counter() - t0:.2f}秒)")
 
-# 4. 状況を診断して表示（ここがAIの視点！）
+# --- 4. 結果 ---
 print("-" * 40)
-print("📅 日別状況レポート")
+print("📅 月別の概要")
+monthly = report.groupby("month", sort=False).agg(
+    days=("day", "size"), riskDays=("risks", lambda r: int((r != "").sum())),
+    budgetHours=("budgetHours", "sum"), forcedHours=("forcedHours", "sum"),
+    minAvailable=("available", "min"), minKeyOpeners=("keyOpeners", "min"), minKeyClosers=("keyClosers", "min"),
+)
+print(monthly.to_string())
 print("-" * 40)
-
-# 人件費の目安（適当に、売上の30%を時給1200円で割ったとする）
-# 売上 10万円 → 3万円分 → 約25時間働ける
-HOURLY_WAGE = 1200
-LABOR_COST_RATIO = 0.3
-
-for day in range(1, 6): # 全部出すと長いので最初の5日間だけ表示
-    d_str = str(day)
-    
-    # 予算計算
-    sales = int(daily_sales.get(d_str, 0)) # 売上(万円)
-    sales_yen = sales * 10000
-    budget_hours = (sales_yen * LABOR_COST_RATIO) / HOURLY_WAGE
-    
-    # 人員状況
-    requests_today = request_map.get(d_str, {})
-    staff_names = []
-    
-    for sid, r_type in requests_today.items():
-        s_name = staffs[sid]["name"]
-        staff_names.append(f"{s_name}({r_type})")
-    
-    print(f"【{day}日】 売上予測: {sales}万円")
-    print(f"   💰 確保可能時間: 約{int(budget_hours)}時間")
-    print(f"   🙋 応募スタッフ: {len(staff_names)}人 -> {', '.join(staff_names)}")
-    
-    if len(staff_names) == 0:
-        print("   ⚠️ 誰も希望を出していません！")
-    elif int(budget_hours) == 0 and len(staff_names) > 0:
-        print("   ⚠️ 売上設定が0なのに人が集まっています（赤字注意）")
-    print("")
+if risky.empty:
+    print("✅ 注意が必要な日はありません")
+else:
+    print(f"⚠️ 注意が必要な日: {len(risky)}日")
+    columns = ["month", "day", "weekday", "sales", "budgetHours", "forcedHours", "available",
+               "openers", "closers", "keyOpeners", "keyClosers", "leaders", "partnerForcedHours", "partnerCap", "risks"]
+    print(risky[columns].to_string(index=False))
+if args.csv:
+    report.to_csv(args.csv, index=False, encoding="utf-8-sig")
+    print(f"💾 {args.csv} に保存しました ({len(report)}行)")
 
 print("-" * 40)
-print("診断完了。このデータを元にシフトを組みます。")
\ No newline at end of file
+print("診断完了。このデータを元にシフトを組みます。")
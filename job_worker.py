@@ -0,0 +1,37 @@
+"""シフト作成ジョブ (api/jobs.py で登録したもの) を取り出して実行する常駐ワーカー
+
+Vercel の関数はレスポンスを返したあと止められることがあるので、
+長い計算は SHIFT_JOB_RUNNER=worker にして、このワーカーを別のマシンで動かす
+(画面からジョブ方式で作るときは NEXT_PUBLIC_SHIFT_JOBS=1 も付けてビルドする)。
+
+    python job_worker.py              # Firestore の generation_jobs を監視
+    python job_worker.py --dir jobs   # ローカルのファイルキューを監視
+    python job_worker.py --once       # たまっているジョブだけ処理して終了
+"""
+import argparse
+import warnings
+
+from shift_engine.cache import SnapshotCache
+from shift_engine.firestore_io import get_client
+from shift_engine.jobs import FileJobStore, FirestoreJobStore, firestore_callbacks, work_forever
+from shift_engine.model_cache import ModelCache
+
+warnings.filterwarnings("ignore")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="シフト作成ジョブのワーカー")
+    parser.add_argument("--dir", default=None, help="ファイルキューのディレクトリ (省略時は Firestore)")
+    parser.add_argument("--poll", type=float, default=2.0, help="キューを見に行く間隔 (秒)")
+    parser.add_argument("--once", action="store_true", help="キューが空になったら終了する")
+    args = parser.parse_args(argv)
+
+    db = get_client()
+    store = FileJobStore(args.dir) if args.dir else FirestoreJobStore(db)
+    load, save = firestore_callbacks(db, SnapshotCache())
+    print("👷 ジョブを待っています...")
+    work_forever(store, load, save, poll_sec=args.poll, once=args.once, model_cache=ModelCache())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,130 +1,94 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
-from google.cloud.firestore_v1.base_query import FieldFilter
-import pulp
+import argparse
 import warnings
 
+from shift_engine import generate_schedule
+from shift_engine.cache import SnapshotCache
+from shift_engine.firestore_io import get_client, load_snapshot, save_schedule
+from shift_engine.model_cache import ModelCache
+from shift_engine.profiling import profiled
+from shift_engine.solver import SolverOptions
+
 warnings.filterwarnings("ignore")
 
 # --- 1. 設定 ---
-TARGET_YEAR = 2026
-TARGET_MONTH = 2
-DAYS_IN_MONTH = 28 
-
-if not firebase_admin._apps:
-    cred = credentials.Certificate("serviceAccountKey.json")
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
+parser = argparse.ArgumentParser(description="シフト自動作成")
+parser.add_argument("--year", type=int, default=2026)
+parser.add_argument("--month", type=int, default=2)
+parser.add_argument("--mode", default="monolithic", choices=["monolithic", "rolling", "lexicographic", "heuristic"],
+                    help="lexicographic は目的関数を優先度の段に分けて順に解く / heuristic はソルバーを使わない速報 (1秒未満)")
+parser.add_argument("--time-limit", type=float, default=None, help="計算の制限時間 (秒)")
+parser.add_argument("--gap", type=float, default=None, help="相対 MIP ギャップ (0.01 = 1%%)")
+parser.add_argument("--backend", default="cbc", choices=["cbc", "highs", "cpsat", "portfolio"],
+                    help="使うソルバー (portfolio は CBC の設定違いを同時に走らせ、最初に最適と証明したものを使う)")
+parser.add_argument("--portfolio", nargs="+", default=None,
+                    help="portfolio で走らせる構成 (shift_engine.portfolio.PORTFOLIO_CONFIGS の名前)")
+parser.add_argument("--heuristic-start", action="store_true",
+                    help="貪欲法 + 局所探索のシフトを初期解にする (ソルバーが間に合わなければそれを使う)")
+parser.add_argument("--profile", action="store_true", help="計算に cProfile / tracemalloc をかけて上位を表示する")
+parser.add_argument("--no-cache", action="store_true", help="ローカルのキャッシュを使わず全件読む")
+args = parser.parse_args()
+TARGET_YEAR = args.year
+TARGET_MONTH = args.month
+
+db = get_client()
 
 print(f"🤖 シフト自動作成を開始します: {TARGET_YEAR}年{TARGET_MONTH}月")
 
 # --- 2. データ取得 ---
-staffs = {}
-docs = db.collection("staffs").stream()
-for doc in docs:
-    staffs[doc.id] = doc.to_dict()
-
-# 部門ごとにスタッフIDを分けておく
-dept_groups = {"家電": [], "季節": [], "情報": [], "通信": []}
-for s_id, s_data in staffs.items():
-    dept = s_data.get("department")
-    if dept in dept_groups:
-        dept_groups[dept].append(s_id)
-
-daily_sales = {}
-config = db.collection("monthlyConfig").document(f"{TARGET_YEAR}-{TARGET_MONTH}").get()
-if config.exists:
-    daily_sales = config.to_dict().get("dailySales", {})
-
-request_map = {str(d): {} for d in range(1, DAYS_IN_MONTH + 1)}
-shifts = db.collection("shifts").where(filter=FieldFilter("year", "==", TARGET_YEAR)).where(filter=FieldFilter("month", "==", TARGET_MONTH)).stream()
-for s in shifts:
-    d = s.to_dict()
-    for day, req in d.get("requests", {}).items():
-        if day in request_map:
-            request_map[day][d["staffId"]] = req.get("type")
-
-# --- 3. モデル作成 ---
-problem = pulp.LpProblem("Shift_Scheduling", pulp.LpMaximize)
-shift_types = ["A", "B", "C"]
-staff_ids = list(staffs.keys())
-days = [str(d) for d in range(1, DAYS_IN_MONTH + 1)]
-
-x = {}
-for d in days:
-    for s_id in staff_ids:
-        for st in shift_types:
-            x[d, s_id, st] = pulp.LpVariable(f"x_{d}_{s_id}_{st}", 0, 1, pulp.LpBinary)
-
-# --- 4. 制約 ---
-for d in days:
-    sales_val = int(daily_sales.get(d, 0))
-    max_staff = max(1, int(sales_val / 10))
-    
-    # 予算制約
-    problem += pulp.lpSum([x[d, s, st] for s in staff_ids for st in shift_types]) <= max_staff
-
-    # 遅番の締め作業者確保
-    closer_vars = [x[d, s, "C"] for s in staff_ids if staffs[s].get("canClose") == True]
-    if closer_vars:
-        problem += pulp.lpSum(closer_vars) >= 1
-
-    # 【追加ルール】各部門、最低1人は出勤する
-    # ※ただし、その部門に誰も登録されていない場合はスキップ
-    for dept_name, members in dept_groups.items():
-        if len(members) > 0:
-            # その部門のメンバーの出勤フラグ合計 >= 1
-            problem += pulp.lpSum([x[d, s, st] for s in members for st in shift_types]) >= 1
-
-    for s_id in staff_ids:
-        req_type = request_map[d].get(s_id)
-        problem += pulp.lpSum([x[d, s_id, st] for st in shift_types]) <= 1
-
-        if req_type == "希望休" or req_type == "有給":
-            problem += pulp.lpSum([x[d, s_id, st] for st in shift_types]) == 0
-        elif req_type in ["早番", "中番", "遅番"]:
-            target = "A" if req_type == "早番" else "B" if req_type == "中番" else "C"
-            for st in shift_types:
-                if st != target:
-                    problem += x[d, s_id, st] == 0
-        elif req_type == "時間指定":
-             problem += pulp.lpSum([x[d, s_id, st] for st in shift_types]) == 1
-
-# --- 5. 目的 ---
-problem += pulp.lpSum([x[d, s, st] for d in days for s in staff_ids for st in shift_types])
-
-# --- 6. 計算 ---
+read_stats = {}
+if args.no_cache:
+    snap = load_snapshot(db, TARGET_YEAR, TARGET_MONTH, read_stats)
+else:
+    snap = SnapshotCache().load_snapshot(db, TARGET_YEAR, TARGET_MONTH, read_stats)
+for name in ("staffs", "monthlyConfig", "shifts"):
+    reads = f", {read_stats[name]['reads']} reads" if "reads" in read_stats[name] else ""
+    print(f"📥 {name}: {read_stats[name]['docs']}件 ({read_stats[name]['sec']:.2f}秒{reads})")
+if "cache" in read_stats:
+    print(f"🗂️ キャッシュ: {read_stats['cache']} (読み取り {read_stats['reads']}件, {read_stats['wallSec']:.2f}秒)")
+
+# --- 3. 計算 ---
 print("🧮 計算中...")
-status = problem.solve(pulp.PULP_CBC_CMD(msg=0))
-
-# --- 7. 結果 ---
+with profiled(args.profile) as profile:
+    result = generate_schedule(snap, mode=args.mode, heuristic_start=args.heuristic_start,
+                               options=SolverOptions(time_limit=args.time_limit, gap_rel=args.gap,
+                                                     backend=args.backend, portfolio=args.portfolio),
+                               model_cache=None if args.no_cache else ModelCache())
+if result.model_size:
+    size = result.model_size
+    print(f"📐 モデル: 変数 {size['variables']} / 制約 {size['constraints']} / 非ゼロ {size['nonzeros']}")
+if result.model_cache:
+    print(f"🧱 モデルの骨組み: {result.model_cache['result']} (/tmp から {result.model_cache['loadSec']:.2f}秒)")
+print("⏱️ " + " / ".join(f"{name[:-3]} {sec:.2f}秒" for name, sec in result.timings.items()))
+if result.portfolio:
+    racers = ", ".join(f"{r['name']} {r['status']} {r['sec']:.2f}秒" + (" (停止)" if r["killed"] else "")
+                       for r in result.portfolio["racers"])
+    print(f"🏁 ポートフォリオ: {result.portfolio['winner']} の勝ち ({result.portfolio['reason']}) / {racers}")
+for tier in result.tiers or []:
+    value = f" 値 {tier['objective']:.1f}" if "objective" in tier else ""
+    print(f"🪜 {tier['tier']}: {tier['status']}{value} ({tier.get('sec', 0):.2f}秒)")
+if profile:
+    print(f"🔬 プロファイル (ピーク {profile['memory']['peakMB']}MB, {profile['dump']}):")
+    for row in profile["functions"][:10]:
+        print(f"   {row['cumSec']:8.3f}秒 {row['calls']:>8}回 {row['function']}")
+
+# --- 4. 結果 ---
 print("-" * 30)
-if status == pulp.LpStatusOptimal:
-    final_schedule = {} 
-    for d in range(1, DAYS_IN_MONTH + 1):
-        d_str = str(d)
-        day_assignments = []
-        for s_id in staff_ids:
-            for st in shift_types:
-                if x[d_str, s_id, st].value() == 1:
-                    assign_data = {
-                        "staffId": s_id,
-                        "name": staffs[s_id]["name"],
-                        "shift": st
-                    }
-                    day_assignments.append(assign_data)
-        
-        final_schedule[d_str] = day_assignments
-        names = [f"{a['name']}" for a in day_assignments]
-        print(f"📅 {d}日 -> {len(names)}人出勤")
-
-    doc_id = f"{TARGET_YEAR}-{TARGET_MONTH}"
-    db.collection("determined_shifts").document(doc_id).set({
-        "year": TARGET_YEAR,
-        "month": TARGET_MONTH,
-        "schedule": final_schedule,
-        "createdAt": firestore.SERVER_TIMESTAMP
-    })
-    print(f"✨ 保存完了！Firebaseに書き込みました。")
+if result.ok:
+    for d, day_assignments in result.schedule.items():
+        print(f"📅 {d}日 -> {len(day_assignments)}人出勤")
+
+    if result.heuristic and result.heuristic["used"] != "start":
+        print(f"⚡ ソルバーを使わない速報のシフトを使います (スコア {result.objective:.1f})")
+    elif result.status != "Optimal":
+        print(f"⏱️ 時間切れのため暫定解を使います (gap {result.gap})")
+    write_stats = save_schedule(db, snap, result.schedule, result.summary())
+    print(f"✨ 保存完了！Firebaseに書き込みました。({write_stats['docs']}件, "
+          f"{write_stats['bytes'] / 1024:.1f}KB / 旧形式 {write_stats['legacyBytes'] / 1024:.1f}KB, {write_stats['sec']:.2f}秒)")
 else:
-    print("❌ 作成失敗。条件が厳しすぎます（予算不足で部門人数が確保できない等）。")
\ No newline at end of file
+    print("❌ 作成失敗。条件が厳しすぎます（予算不足で部門人数が確保できない等）。")
+    if result.diagnosis:
+        for item in result.diagnosis["issues"]:
+            where = f"{item['day']}日" if "day" in item else ""
+            who = f" {item['staffId']}" if "staffId" in item else (f" {item['slot']}~" if "slot" in item else "")
+            need = f" (必要 {item['need']} / 可能 {item['available']})" if "need" in item else ""
+            print(f"   🔍 {where}{who} {item['rule']}{need}")
@@ -0,0 +1,29 @@
+"""シフト自動作成エンジン (Firestore非依存のコア部分)"""
+
+import importlib
+
+# 名前 -> 定義しているモジュール。使われたときに初めて import する
+# (shift_engine.profiling などだけを使う軽い入口 (API のヘルスチェック) で numpy・ソルバー周りを読まないため)
+_EXPORTS = {
+    "MatrixModel": ".model",
+    "ScheduleResult": ".engine",
+    "Snapshot": ".snapshot",
+    "build_model": ".model",
+    "build_snapshot": ".snapshot",
+    "extract_schedule": ".engine",
+    "generate_schedule": ".engine",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,222 @@
+import time
+from fractions import Fraction
+from math import lcm
+
+import numpy as np
+
+from .portfolio import solve_portfolio
+from .solver import SolveResult, SolverOptions, relative_gap, solve_cbc, with_presolve
+
+TOL = 1e-6
+
+
+def check_solution(model, values, tol=TOL):
+    """解ベクトルがモデルの制約 (行の上下限・変数の上下限・整数性) を満たすか調べる
+
+    戻り値: {制約の種類 (row_family): 違反した行数}。bounds / integrality は変数側の違反。
+    どのバックエンドの解にも同じ基準をかける (空の dict なら OK)。
+    """
+    values = np.asarray(values, dtype=float)
+    activity = np.bincount(model.A_row, weights=model.A_val * values[model.A_col], minlength=model.n_rows)
+    bad_row = (activity < model.row_lo - tol) | (activity > model.row_hi + tol)
+    counts = np.bincount(model.row_family[bad_row], minlength=len(model.families))
+    violations = {name: int(n) for name, n in zip(model.families, counts) if n}
+    bad_bound = int(np.count_nonzero((values < model.lb - tol) | (values > model.ub + tol)))
+    if bad_bound:
+        violations["bounds"] = bad_bound
+    frac = np.abs(values - np.round(values))
+    bad_int = int(np.count_nonzero(model.is_int & (frac > tol)))
+    if bad_int:
+        violations["integrality"] = bad_int
+    return violations
+
+
+# --- HiGHS (highspy, プロセス内) ---
+
+@with_presolve
+def solve_highs(model, msg=False, mip_start=None, options=None):
+    """HiGHS でプロセス内で解く (一時ファイル・子プロセスなし)"""
+    import highspy
+
+    options = options or SolverOptions()
+    timings = {}
+    t0 = time.perf_counter()
+    h = highspy.Highs()
+    h.setOptionValue("output_flag", bool(msg))
+    if options.time_limit:
+        h.setOptionValue("time_limit", float(options.time_limit))
+    if options.gap_rel is not None:
+        h.setOptionValue("mip_rel_gap", float(options.gap_rel))
+    if options.threads:
+        h.setOptionValue("threads", int(options.threads))
+
+    lp = highspy.HighsLp()
+    lp.num_col_ = model.n_vars
+    lp.num_row_ = model.n_rows
+    lp.sense_ = highspy.ObjSense.kMaximize
+    lp.col_cost_ = model.c
+    lp.col_lower_ = model.lb
+    lp.col_upper_ = model.ub
+    lp.row_lower_ = model.row_lo
+    lp.row_upper_ = model.row_hi
+    indptr, rows, vals = model.to_csc()
+    lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+    lp.a_matrix_.start_ = indptr
+    lp.a_matrix_.index_ = rows
+    lp.a_matrix_.value_ = vals
+    lp.integrality_ = [highspy.HighsVarType.kInteger if i else highspy.HighsVarType.kContinuous
+                       for i in model.is_int.tolist()]
+    h.passModel(lp)
+    if mip_start is not None:
+        start = highspy.HighsSolution()
+        start.col_value = list(np.asarray(mip_start, dtype=float))
+        h.setSolution(start)
+    timings["buildSec"] = round(time.perf_counter() - t0, 4)
+
+    t0 = time.perf_counter()
+    h.run()
+    timings["highsSec"] = round(time.perf_counter() - t0, 4)
+
+    status = h.getModelStatus()
+    info = h.getInfo()
+    has_solution = info.primal_solution_status == 2
+    S = highspy.HighsModelStatus
+    if status == S.kOptimal:
+        name = "Optimal"
+    elif status == S.kInfeasible:
+        name = "Infeasible"
+    elif status in (S.kUnbounded, S.kUnboundedOrInfeasible):
+        name = "Unbounded"
+    else:
+        # 時間切れなど: 実行可能解があれば暫定解
+        name = "Feasible" if has_solution else "Not Solved"
+    if name not in ("Optimal", "Feasible"):
+        return SolveResult(status=name, timings=timings)
+
+    values = np.asarray(h.getSolution().col_value, dtype=float)
+    # 整数変数の丸め誤差を落とす
+    values = np.where(model.is_int, np.round(values), values)
+    objective = float(model.c @ values)
+    bound = objective if name == "Optimal" else float(info.mip_dual_bound)
+    return SolveResult(status=name, values=values, objective=objective,
+                       bound=bound, gap=relative_gap(objective, bound), timings=timings)
+
+
+# --- CP-SAT (OR-Tools) ---
+
+def _integer_scale(values, max_scale=10000):
+    """values に掛けると全部整数になる最小の倍率 (見つからなければ None)"""
+    scale = 1
+    for v in np.unique(np.asarray(values, dtype=float)).tolist():
+        if not np.isfinite(v):
+            continue
+        scale = lcm(scale, Fraction(v).limit_denominator(max_scale).denominator)
+        if scale > max_scale:
+            return None
+    return scale
+
+
+def _finite_upper(model):
+    """上限が無い変数 (スキル不足 shortage) に、CP-SAT 用の有限の上限を付ける
+
+    shortage は目的関数で減点される変数なので、出てくる行の下限 (必要量) を超える値は取らない。
+    """
+    ub = model.ub.copy()
+    open_cols = np.nonzero(np.isinf(ub))[0]
+    if len(open_cols):
+        bound = np.where(np.isfinite(model.row_lo), np.abs(model.row_lo),
+                         np.where(np.isfinite(model.row_hi), np.abs(model.row_hi), 0))
+        need = np.zeros(model.n_vars)
+        np.maximum.at(need, model.A_col, bound[model.A_row] / np.abs(model.A_val))
+        ub[open_cols] = np.ceil(need[open_cols]) + 1
+    return ub
+
+
+@with_presolve
+def solve_cpsat(model, msg=False, mip_start=None, options=None):
+    """OR-Tools CP-SAT で解く (全変数を整数として扱い、係数は行ごとに整数に拡大する)
+
+    連続変数は shortage だけで、スキル値が整数なら最適解でも整数になるので整数変数にする。
+    options.threads は探索ワーカー数 (既定 8)。
+    """
+    from ortools.sat.python import cp_model
+
+    options = options or SolverOptions()
+    timings = {}
+    t0 = time.perf_counter()
+    m = cp_model.CpModel()
+    lb = np.ceil(model.lb - TOL)
+    ub = np.floor(_finite_upper(model) + TOL)
+    x = [m.new_int_var(int(lo), int(hi), f"v{j}") for j, (lo, hi) in enumerate(zip(lb.tolist(), ub.tolist()))]
+
+    indptr, cols, vals = model.to_csr()
+    for i in range(model.n_rows):
+        sl = slice(indptr[i], indptr[i + 1])
+        scale = _integer_scale(vals[sl])
+        if scale is None:
+            return SolveResult(status="Undefined", timings=timings)
+        coeffs = np.round(vals[sl] * scale).astype(int).tolist()
+        expr = cp_model.LinearExpr.weighted_sum([x[j] for j in cols[sl].tolist()], coeffs)
+        lo, hi = model.row_lo[i] * scale, model.row_hi[i] * scale
+        if np.isfinite(lo):
+            m.add(expr >= int(np.ceil(lo - TOL)))
+        if np.isfinite(hi):
+            m.add(expr <= int(np.floor(hi + TOL)))
+
+    obj_scale = _integer_scale(model.c)
+    if obj_scale is None:
+        return SolveResult(status="Undefined", timings=timings)
+    nz = np.nonzero(model.c)[0]
+    m.maximize(cp_model.LinearExpr.weighted_sum([x[j] for j in nz.tolist()],
+                                                np.round(model.c[nz] * obj_scale).astype(int).tolist()))
+    if mip_start is not None:
+        for j, v in enumerate(np.round(mip_start).astype(int).tolist()):
+            m.add_hint(x[j], v)
+    timings["buildSec"] = round(time.perf_counter() - t0, 4)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.num_workers = int(options.threads or 8)
+    solver.parameters.log_search_progress = bool(msg)
+    if options.time_limit:
+        solver.parameters.max_time_in_seconds = float(options.time_limit)
+    if options.gap_rel is not None:
+        solver.parameters.relative_gap_limit = float(options.gap_rel)
+
+    t0 = time.perf_counter()
+    status = solver.solve(m)
+    timings["cpsatSec"] = round(time.perf_counter() - t0, 4)
+
+    names = {
+        cp_model.OPTIMAL: "Optimal",
+        cp_model.FEASIBLE: "Feasible",
+        cp_model.INFEASIBLE: "Infeasible",
+        cp_model.UNKNOWN: "Not Solved",
+    }
+    name = names.get(status, "Undefined")
+    if name not in ("Optimal", "Feasible"):
+        return SolveResult(status=name, timings=timings)
+
+    values = np.array([solver.value(v) for v in x], dtype=float)
+    objective = float(model.c @ values)
+    bound = objective if name == "Optimal" else solver.best_objective_bound / obj_scale
+    return SolveResult(status=name, values=values, objective=objective,
+                       bound=bound, gap=relative_gap(objective, bound), timings=timings)
+
+
+# highspy / ortools は任意の依存 (選んだときだけ import する)。
+# ortools 9.15 は HiGHS を同梱しているので、同じプロセスで両方使うなら highspy は 1.11 以下にする
+# portfolio は CBC の設定違い (と、指定すれば HiGHS / CP-SAT) を同時に走らせて一番早く証明できたものを使う
+BACKENDS = {
+    "cbc": solve_cbc,
+    "highs": solve_highs,
+    "cpsat": solve_cpsat,
+    "portfolio": solve_portfolio,
+}
+
+
+def solve(model, msg=False, mip_start=None, options=None):
+    """options.backend のソルバーで解く (engine / rolling はここを通す)"""
+    options = options or SolverOptions()
+    if options.backend not in BACKENDS:
+        raise ValueError(f"unknown backend: {options.backend}")
+    return BACKENDS[options.backend](model, msg=msg, mip_start=mip_start, options=options)
@@ -0,0 +1,148 @@
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass
+
+from .engine import generate_schedule
+from .solver import SOLUTION_STATUSES, SolverOptions
+
+
+@dataclass
+class BatchJob:
+    """1店舗・1ヶ月分のシフト作成ジョブ
+
+    key_path: その店舗の Firebase サービスアカウント鍵
+    synthetic: スタッフ数を入れると Firestore を使わず架空店舗で計算する (保存もしない)
+    """
+
+    store: str
+    year: int
+    month: int
+    key_path: str = None
+    mode: str = "monolithic"
+    synthetic: int = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            store=data["store"],
+            year=int(data["year"]),
+            month=int(data["month"]),
+            key_path=data.get("keyPath"),
+            mode=data.get("mode", "monolithic"),
+            synthetic=data.get("synthetic"),
+        )
+
+    @property
+    def label(self):
+        return f"{self.store} {self.year}-{self.month}"
+
+
+def run_job(job, options=None):
+    """ワーカープロセスで1ジョブを実行する (例外もここで結果に変えて、バッチ全体は止めない)"""
+    t0 = time.perf_counter()
+    report = {"job": asdict(job), "pid": os.getpid()}
+    try:
+        if job.synthetic:
+            from .synthetic import make_store
+
+            db = None
+            snap = make_store(job.synthetic, job.year, job.month)
+        else:
+            from .cache import SnapshotCache
+            from .firestore_io import get_client
+
+            db = get_client(job.key_path, app_name=job.store)
+            report["reads"] = {}
+            snap = SnapshotCache(store=job.store).load_snapshot(db, job.year, job.month, report["reads"])
+        report["loadSec"] = round(time.perf_counter() - t0, 3)
+
+        t1 = time.perf_counter()
+        result = generate_schedule(snap, mode=job.mode, options=options or SolverOptions(threads=1))
+        report["solveSec"] = round(time.perf_counter() - t1, 3)
+        report["status"] = result.status
+        report["objective"] = result.objective
+        report["gap"] = result.gap
+
+        if result.ok and db is not None:
+            from .firestore_io import save_schedule
+
+            t2 = time.perf_counter()
+            report["write"] = save_schedule(db, snap, result.schedule, result.summary())
+            report["writeSec"] = round(time.perf_counter() - t2, 3)
+    except Exception as e:
+        report["status"] = "Error"
+        report["error"] = f"{type(e).__name__}: {e}"
+        report["traceback"] = traceback.format_exc()
+    report["wallSec"] = round(time.perf_counter() - t0, 3)
+    return report
+
+
+def _error_report(job, e):
+    """ワーカーごと落ちた (run_job の中で例外にできなかった) ジョブの結果"""
+    return {"job": asdict(job), "status": "Error", "error": f"{type(e).__name__}: {e}", "wallSec": 0.0}
+
+
+def _run_isolated(job, options, ctx):
+    """1ジョブだけのプロセスプールで動かす (落ちても他のジョブを巻き込まない)"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(run_job, job, options).result()
+
+
+def run_batch(jobs, workers=None, options=None, on_result=None):
+    """ジョブをプロセスプールに配り、終わった順に on_result(report) を呼ぶ
+
+    options.threads は1ジョブあたりのソルバーのスレッド数 (workers * threads がコア数を超えないようにする)
+    ワーカーが落ちる (メモリ不足・CBC の異常終了など) とプール全体が使えなくなるので、そのとき終わっていなかったジョブは
+    1ジョブずつ別のプールでやり直す。そこでも落ちたジョブは status="Error" の結果にして、バッチは最後まで続ける。
+    """
+    options = options or SolverOptions(threads=1)
+    workers = workers or max(1, (os.cpu_count() or 1) // max(options.threads or 1, 1))
+    t0 = time.perf_counter()
+    reports = []
+
+    def done(report):
+        reports.append(report)
+        if on_result:
+            on_result(report)
+
+    # gRPC (Firestore) は fork と相性が悪いので spawn で起動する
+    ctx = multiprocessing.get_context("spawn")
+    broken = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = {pool.submit(run_job, job, options): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                done(future.result())
+            except BrokenProcessPool:
+                broken.append(futures[future])
+            except Exception as e:
+                done(_error_report(futures[future], e))
+    if broken:
+        with ThreadPoolExecutor(max_workers=workers) as retry:
+            futures = {retry.submit(_run_isolated, job, options, ctx): job for job in broken}
+            for future in as_completed(futures):
+                try:
+                    report = future.result()
+                except Exception as e:
+                    report = _error_report(futures[future], e)
+                done(dict(report, retried=True))
+    return reports, summarize(reports, time.perf_counter() - t0, workers)
+
+
+def summarize(reports, elapsed, workers):
+    walls = sorted(r["wallSec"] for r in reports)
+    ok = sum(1 for r in reports if r["status"] in SOLUTION_STATUSES)
+    return {
+        "jobs": len(reports),
+        "ok": ok,
+        "failed": len(reports) - ok,
+        "workers": workers,
+        "elapsedSec": round(elapsed, 3),
+        "jobsPerMin": round(len(reports) / elapsed * 60, 2) if elapsed > 0 else None,
+        "wallSecMean": round(sum(walls) / len(walls), 3) if walls else None,
+        "wallSecMax": walls[-1] if walls else None,
+    }
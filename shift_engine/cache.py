@@ -0,0 +1,193 @@
+import datetime
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .firestore_io import CONFIG_FIELDS, SHIFT_FIELDS, STAFF_FIELDS
+from .snapshot import build_snapshot
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.environ.get("SHIFT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "shift_cache")
+# 画面 (page.js) が staffs / shifts を書くたびに serverTimestamp() を入れるフィールド
+UPDATED_FIELD = "updatedAt"
+# 差分読みを続けてよい時間 (秒)。これを過ぎたら全件読み直す
+# (updatedAt を付けずに書いた変更 (コンソールでの手直し・スクリプトなど) は差分読みでは見えないため)
+DEFAULT_MAX_AGE_SEC = float(os.environ.get("SHIFT_CACHE_MAX_AGE_SEC") or 6 * 3600)
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _stamp(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return None
+
+
+def _aggregate_reads(count):
+    # count() の集計クエリは索引 1000 件ごとに 1 read
+    return 1 + count // 1000
+
+
+def _count(query):
+    return int(query.count().get()[0][0].value)
+
+
+class SnapshotCache:
+    """staffs / shifts をディスクに持っておき、2回目からは変更分だけ Firestore から読む
+
+    店舗 (Firestore のプロジェクト) ごとに staffs.json と shifts_{年-月}.json を置く。
+    2回目以降は updatedAt >= 前回見た最新の updatedAt のドキュメントだけを読み、
+    count() の件数が合わなければ (削除があった) そのコレクションだけ全件読み直す。
+    shifts は1人1ヶ月1件なので staffId ごとに持つ (出し直しで ID が変わっても差分で済む)。
+    shifts の差分クエリには year + month + updatedAt の複合インデックスが要る
+    (無い場合は全件読みに戻る)。
+
+    staffs / shifts を書き換えるときは必ず updatedAt (serverTimestamp()) も更新すること。
+    updatedAt を付けない書き込みは差分読みでは拾えないので、最後に全件読んでから max_age_sec (既定 6時間) を過ぎたら
+    全件読み直す (差分読みをしても期限は延びない)。合計 max_bytes を超えたら古いファイルから消す。
+    """
+
+    def __init__(self, root=None, max_age_sec=DEFAULT_MAX_AGE_SEC, max_bytes=50 * 1024 * 1024, store=None):
+        self.root = root or DEFAULT_CACHE_DIR
+        self.max_age_sec = max_age_sec
+        self.max_bytes = max_bytes
+        self.store = store
+
+    def _dir(self, db):
+        store = self.store or getattr(db, "project", None) or "default"
+        path = os.path.join(self.root, str(store))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _read_entry(self, path):
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if entry.get("version") != CACHE_VERSION or time.time() - entry.get("fullAt", 0) > self.max_age_sec:
+            return None
+        return entry
+
+    def _write_entry(self, path, entry):
+        entry = dict(entry, version=CACHE_VERSION, savedAt=time.time())
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(entry, f, ensure_ascii=False, separators=(",", ":"), default=str)
+        os.replace(tmp, path)
+
+    def _sync(self, path, query, fields, key):
+        """1コレクション分をキャッシュと突き合わせて最新にする。戻り値: (ドキュメントの dict, 統計)"""
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        fields = fields + [UPDATED_FIELD]
+        entry = self._read_entry(path)
+        reads = 0
+        refresh = "full"
+
+        def merge(items, docs):
+            for doc in docs:
+                data = doc.to_dict()
+                stamp = _stamp(data.pop(UPDATED_FIELD, None))
+                k = key(doc.id, data)
+                old = items.get(k)
+                if old and old["id"] != doc.id and (old["stamp"] or "") > (stamp or ""):
+                    continue
+                items[k] = {"id": doc.id, "stamp": stamp, "data": data}
+            return items
+
+        items = None
+        if entry is not None:
+            try:
+                since = datetime.datetime.fromisoformat(entry["since"]) if entry.get("since") else EPOCH
+                delta = list(query.where(filter=FieldFilter(UPDATED_FIELD, ">=", since)).select(fields).stream())
+                total = _count(query)
+                reads += len(delta) + _aggregate_reads(total)
+                items = merge(entry["items"], delta)
+                refresh = "delta"
+                if len(items) != total:
+                    items = None
+            except Exception:
+                # インデックス未作成など: 全件読みに戻る
+                items = None
+        if items is None:
+            docs = list(query.select(fields).stream())
+            reads += len(docs)
+            items = merge({}, docs)
+            refresh = "full" if entry is None else "reload"
+
+        stamps = [v["stamp"] for v in items.values() if v["stamp"]]
+        full_at = entry["fullAt"] if refresh == "delta" else time.time()
+        self._write_entry(path, {"items": items, "since": max(stamps) if stamps else None, "fullAt": full_at})
+        return items, {"docs": len(items), "reads": reads, "refresh": refresh}
+
+    def load_snapshot(self, db, year, month, stats=None):
+        """firestore_io.load_snapshot と同じ Snapshot を、キャッシュを使って組み立てる
+
+        stats には各コレクションの docs / reads (課金される読み取り数) / sec / refresh と、
+        全体の wallSec・cache ("warm": キャッシュから差分更新 / "cold": 全件読み) を書き込む。
+        """
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        stats = {} if stats is None else stats
+        root = self._dir(db)
+
+        def timed(name, read):
+            t0 = time.perf_counter()
+            result, info = read()
+            stats[name] = dict(info, sec=round(time.perf_counter() - t0, 4))
+            return result
+
+        def staffs():
+            return self._sync(os.path.join(root, "staffs.json"), db.collection("staffs"),
+                              STAFF_FIELDS, key=lambda doc_id, data: doc_id)
+
+        def config():
+            doc = db.collection("monthlyConfig").document(f"{year}-{month}").get(field_paths=CONFIG_FIELDS)
+            return (doc.to_dict() if doc.exists else None), {"docs": int(doc.exists), "reads": 1, "refresh": "full"}
+
+        def shifts():
+            query = (db.collection("shifts")
+                     .where(filter=FieldFilter("year", "==", year))
+                     .where(filter=FieldFilter("month", "==", month)))
+            return self._sync(os.path.join(root, f"shifts_{year}-{month}.json"), query,
+                              SHIFT_FIELDS, key=lambda doc_id, data: data.get("staffId", doc_id))
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(timed, name, read)
+                       for name, read in (("staffs", staffs), ("monthlyConfig", config), ("shifts", shifts))]
+            staff_items, config_data, shift_items = [f.result() for f in futures]
+        stats["wallSec"] = round(time.perf_counter() - t0, 4)
+        stats["cache"] = "warm" if stats["staffs"]["refresh"] == stats["shifts"]["refresh"] == "delta" else "cold"
+        stats["reads"] = sum(stats[name]["reads"] for name in ("staffs", "monthlyConfig", "shifts"))
+        self.evict()
+
+        # Firestore の stream() と同じくドキュメント ID 順に並べる (スタッフの並びはモデルの列順になる)
+        staff_docs = sorted(((v["id"], v["data"]) for v in staff_items.values()), key=lambda d: d[0])
+        shift_docs = [v["data"] for v in shift_items.values()]
+        return build_snapshot(year, month, staff_docs, config_data, shift_docs)
+
+    def evict(self):
+        """期限切れのファイルを消し、合計サイズが max_bytes を超えていれば古いものから消す"""
+        files = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".json"):
+                    path = os.path.join(dirpath, name)
+                    st = os.stat(path)
+                    files.append((st.st_mtime, st.st_size, path))
+        now = time.time()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in sorted(files):
+            if now - mtime <= self.max_age_sec and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
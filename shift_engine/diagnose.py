@@ -0,0 +1,194 @@
+import time
+from dataclasses import replace
+
+import numpy as np
+
+from .backends import solve
+from .model import A, B, C, build_model
+from .validate import HARD_RULES, _window_sums, compile_rules, violations
+
+# elastic で緩める行の種類 (one_shift は「1日2シフト」になるだけで原因の説明にならないので緩めない)
+ELASTIC_FAMILIES = [name for name in HARD_RULES if name != "one_shift"]
+
+
+def _allowed(rules):
+    """(日, スタッフ, A/B/C) で出勤できるセル (会議・休み固定・シフト指定・シフト制限を反映)"""
+    avail = ~rules.rest & ~rules.meet
+    ok = avail[..., None] & rules.allowed[None, :, :]
+    fixed = rules.must_shift >= 0
+    for k in (A, B, C):
+        ok[..., k] &= ~fixed | (rules.must_shift == k)
+    return ok
+
+
+def capacity(rules):
+    """日ごとに「出勤できる人」を数えるための (日, スタッフ) の配列
+
+    ok: (日, スタッフ, A/B/C) で入れるセル / work: どれかのシフトに入れる人
+    opener / closer: 開け・締めに数えられる人 (通常は A / C に入れる人、時間指定は時刻が条件を満たす人)
+    key_opener / key_closer: そのうち鍵を持つ人 / both: 開けと締めの両方に数えられる人
+    forced_hours: 出勤が決まっている人の勤務時間 (シフトが決まっていなければ一番短いシフト、それ以外は 0)
+    """
+    ok = _allowed(rules)
+    work = ok.any(axis=-1)
+    normal = ~rules.custom
+    closer = (normal & ok[..., C]) | (rules.close_hit & work)
+    fixed = rules.must_shift >= 0
+    shift_hours = np.take_along_axis(rules.hours, np.maximum(rules.must_shift, 0)[..., None], -1)[..., 0]
+    return {
+        "ok": ok,
+        "work": work,
+        "opener": (normal & ok[..., A]) | (rules.open_hit & work),
+        "closer": closer,
+        "key_opener": (normal & ok[..., A] & rules.can_open) | (rules.open_key_hit & work & rules.can_open),
+        "key_closer": closer & rules.can_close,
+        # 1人は1シフトなので、両方に数えられるのは開けから締めまでの時間指定だけ
+        "both": rules.open_hit & rules.close_hit & work,
+        "forced_hours": np.where(fixed, shift_hours, np.where(rules.must_work, rules.hours.min(axis=-1), 0)),
+    }
+
+
+def precheck(rules):
+    """ソルバーを回す前に、日ごと・スタッフごとの必要条件を数えて確かめる
+
+    ここで出る問題は (他の条件に関係なく) 必ず解なしになるものと、そのままでは解かせられない希望
+    (custom_time: 時間指定の終了が開始より前)。
+    戻り値: [{rule, day / staffId, need, available}] (空なら必要条件は満たしている)
+    """
+    cap = capacity(rules)
+    ok, work, opener, closer, both = cap["ok"], cap["work"], cap["opener"], cap["closer"], cap["both"]
+    key_opener, key_closer = cap["key_opener"], cap["key_closer"]
+    # 出勤が決まっているパートナーの勤務時間
+    partner_forced = cap["forced_hours"][:, rules.is_partner].sum(axis=1)
+    fixed = rules.must_shift >= 0
+
+    day_checks = [
+        ("open_staff", rules.min_open, opener.sum(axis=1)),
+        ("close_staff", rules.min_close, closer.sum(axis=1)),
+        ("open_key", 1, key_opener.sum(axis=1)),
+        ("close_key", 1, key_closer.sum(axis=1)),
+        ("open_close_staff", rules.min_open + rules.min_close, (opener | closer).sum(axis=1) + both.sum(axis=1)),
+    ]
+    if rules.is_leader.any():
+        day_checks.append(("leaders", rules.min_leaders, work[:, rules.is_leader].sum(axis=1)))
+    issues = []
+    for rule, need, available in day_checks:
+        need = np.broadcast_to(need, available.shape)
+        for d in np.nonzero(available < need)[0].tolist():
+            issues.append({"rule": rule, "day": rules.days[d], "need": int(need[d]), "available": int(available[d])})
+    # パートナー: 出勤が決まっている人だけで時間の上限を超える
+    for d in np.nonzero(partner_forced > rules.hour_caps + 1e-6)[0].tolist():
+        issues.append({"rule": "partner_hours", "day": rules.days[d],
+                       "need": float(partner_forced[d]), "available": float(rules.hour_caps[d])})
+    # 時間帯ごとの最低人数: その枠をまるごと勤務できる人
+    coverers = (ok[..., None] & rules.slot_cover).any(axis=2).sum(axis=1)
+    for d, t in zip(*np.nonzero(coverers < rules.slot_mins)):
+        issues.append({"rule": "slot_coverage", "day": rules.days[d], "slot": rules.slot_labels[t],
+                       "need": int(rules.slot_mins[t]), "available": int(coverers[d, t])})
+
+    # 時間指定の終了が開始より前 (同じ時刻も含む): 勤務時間が 0 以下になり、時間の上限・時間帯の人数が正しく数えられない
+    bad_custom = rules.custom & ~rules.meet & (rules.hours[..., 0] <= 0)
+    for d, s in zip(*np.nonzero(bad_custom)):
+        issues.append({"rule": "custom_time", "day": rules.days[d], "staffId": rules.staff_ids[s],
+                       "hours": float(rules.hours[d, s, 0])})
+    # スタッフ: 希望のシフトがシフト制限とぶつかる / 会議と出勤希望だけで7連勤・上限日数を超える
+    limited = fixed & ~rules.allowed[np.arange(len(rules.staff_ids)), np.maximum(rules.must_shift, 0)]
+    for d, s in zip(*np.nonzero(limited)):
+        issues.append({"rule": "shift_limit", "day": rules.days[d], "staffId": rules.staff_ids[s]})
+    forced = (rules.meet | rules.must_work | (rules.must_shift >= 0)).astype(np.int16)
+    if len(rules.days) > 6:
+        for d, s in zip(*np.nonzero(_window_sums(forced, 7) > 6)):
+            issues.append({"rule": "seven_day", "day": rules.days[d], "staffId": rules.staff_ids[s]})
+    meetings = rules.meet.sum(axis=0)
+    for s in np.nonzero(rules.is_employee & (meetings > rules.max_days))[0].tolist():
+        issues.append({"rule": "max_days", "staffId": rules.staff_ids[s], "need": int(meetings[s]),
+                       "available": float(rules.max_days[s])})
+    return issues
+
+
+def elastic_model(model, families=None):
+    """絶対条件の行に不足/超過の変数 (slack) を足し、slack の合計を最小にするモデルを作る
+
+    slack は行の一番大きい係数を掛けて足すので、1 が「1人分 (1日分)」になる。
+    元の目的関数は使わない (どの条件をどれだけ破れば解けるかだけを見る)。
+    戻り値: (MatrixModel, slack の列番号 -> 行番号)
+    """
+    families = ELASTIC_FAMILIES if families is None else families
+    codes = [model.families.index(name) for name in families if name in model.families]
+    rows = np.nonzero(np.isin(model.row_family, codes))[0]
+    scale = np.zeros(model.n_rows)
+    np.maximum.at(scale, model.A_row, np.abs(model.A_val))
+
+    lo_rows = rows[np.isfinite(model.row_lo[rows])]
+    hi_rows = rows[np.isfinite(model.row_hi[rows])]
+    slack_rows = np.concatenate([lo_rows, hi_rows])
+    sign = np.concatenate([np.ones(len(lo_rows)), -np.ones(len(hi_rows))])
+    n = len(slack_rows)
+    slack_cols = np.arange(model.n_vars, model.n_vars + n)
+    elastic = replace(
+        model,
+        c=np.concatenate([np.zeros(model.n_vars), -np.ones(n)]),
+        lb=np.concatenate([model.lb, np.zeros(n)]),
+        ub=np.concatenate([model.ub, np.full(n, np.inf)]),
+        is_int=np.concatenate([model.is_int, np.ones(n, dtype=bool)]),
+        names=model.names + [f"slack_{i}" for i in range(n)],
+        A_row=np.concatenate([model.A_row, slack_rows]),
+        A_col=np.concatenate([model.A_col, slack_cols]),
+        A_val=np.concatenate([model.A_val, sign * scale[slack_rows]]),
+        stats={},
+        tier_c={},
+    )
+    return elastic, slack_rows
+
+
+def by_day(issues):
+    """問題の一覧を 日 -> ルール名の list にまとめる (日の無いもの (上限日数) は "staff" にまとめる)"""
+    days = {}
+    for item in issues:
+        rules = days.setdefault(item.get("day", "staff"), [])
+        if item["rule"] not in rules:
+            rules.append(item["rule"])
+    return days
+
+
+def describe(diagnosis, limit=5):
+    """diagnosis を1行の説明にする (エラーメッセージ用)。例: 5日: leaders / 12日: open_key, close_key"""
+    if not diagnosis or not diagnosis.get("byDay"):
+        return ""
+    items = [f"{day}日: {', '.join(rules)}" if day != "staff" else f"スタッフ: {', '.join(rules)}"
+             for day, rules in diagnosis["byDay"].items()]
+    more = f" ほか{len(items) - limit}件" if len(items) > limit else ""
+    return " / ".join(items[:limit]) + more
+
+
+def diagnose(snap, model=None, options=None, rules=None):
+    """解なしの原因を、日とルール名で特定する
+
+    1. precheck: 日ごと・スタッフごとの必要条件 (数えるだけなので速い)。ここで引っかかればそれが原因
+    2. elastic: 絶対条件を破ってよいことにして、破る量が一番少ない解を求め、破った条件を validate で並べる
+    戻り値: {stage, issues, byDay, relaxed (ルール -> 破った量), timings}
+    """
+    rules = rules or compile_rules(snap)
+    timings = {}
+    t0 = time.perf_counter()
+    issues = precheck(rules)
+    timings["precheckSec"] = round(time.perf_counter() - t0, 4)
+    if issues:
+        return {"stage": "precheck", "issues": issues, "byDay": by_day(issues), "timings": timings}
+
+    t0 = time.perf_counter()
+    model = model or build_model(snap)
+    elastic, slack_rows = elastic_model(model)
+    solved = solve(elastic, options=options)
+    timings["elasticSec"] = round(time.perf_counter() - t0, 4)
+    if not solved.has_solution:
+        return {"stage": "elastic", "status": solved.status, "issues": [], "byDay": {}, "timings": timings}
+
+    # ルールごとに破った量 (人数・日数。partner_hours は 1 = パートナー1人分の時間)
+    slack = np.round(solved.values[model.n_vars:])
+    amounts = np.bincount(model.row_family[slack_rows], weights=slack, minlength=len(model.families))
+    relaxed = {name: int(n) for name, n in zip(model.families, amounts) if n}
+    issues = [{k: v for k, v in item.items() if k != "level"}
+              for item in violations(rules, model.x_values(solved.values)) if item["level"] == "hard"]
+    return {"stage": "elastic", "status": solved.status, "issues": issues, "byDay": by_day(issues),
+            "relaxed": relaxed, "timings": timings}
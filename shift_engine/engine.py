@@ -0,0 +1,248 @@
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .backends import solve
+from .diagnose import by_day, diagnose, precheck
+from .heuristic import heuristic_schedule
+from .lexicographic import solve_lexicographic
+from .model import SHIFT_TYPES, build_model
+from .rolling import solve_rolling
+from .solver import SOLUTION_STATUSES, SolverOptions
+from .validate import compile_rules, evaluate
+from .warmstart import apply_warm_start, complete_start
+
+
+@dataclass
+class ScheduleResult:
+    status: str
+    schedule: dict = field(default_factory=dict)
+    objective: float = None
+    gap: float = None
+    bound: float = None
+    timings: dict = field(default_factory=dict)
+    limits: dict = field(default_factory=dict)
+    warm_start: dict = None
+    decomposition: dict = None
+    presolve: dict = None
+    validation: dict = None
+    heuristic: dict = None
+    diagnosis: dict = None
+    model_size: dict = None
+    tiers: list = None
+    model_cache: dict = None
+    portfolio: dict = None
+
+    @property
+    def ok(self):
+        # 時間切れでも実行可能解があれば使う (Feasible)
+        return self.status in SOLUTION_STATUSES
+
+    def summary(self):
+        """レスポンスと determined_shifts に載せる求解情報"""
+        info = {
+            "status": self.status,
+            "objective": self.objective,
+            "gap": self.gap,
+            "timings": self.timings,
+            "limits": self.limits,
+        }
+        if self.warm_start is not None:
+            info["warmStart"] = self.warm_start
+        if self.decomposition is not None:
+            info["blocks"] = len(self.decomposition["blocks"])
+        if self.presolve is not None:
+            info["presolve"] = self.presolve
+        if self.validation is not None:
+            info["validation"] = self.validation
+        if self.heuristic is not None:
+            info["heuristic"] = self.heuristic
+        if self.diagnosis is not None:
+            info["diagnosis"] = self.diagnosis
+        if self.model_size is not None:
+            info["model"] = self.model_size
+        if self.tiers is not None:
+            info["tiers"] = self.tiers
+        if self.model_cache is not None:
+            info["modelCache"] = self.model_cache
+        if self.portfolio is not None:
+            info["portfolio"] = self.portfolio
+        return info
+
+
+def extract_schedule(snap, assigned):
+    """x[日, スタッフ, シフト] の 0/1 配列を determined_shifts の schedule 形式に変換する"""
+    final_schedule = {}
+    for di, d in enumerate(snap.days):
+        day_assignments = []
+        for si, s in enumerate(snap.staff_ids):
+            for k, st in enumerate(SHIFT_TYPES):
+                if not assigned[di, si, k]:
+                    continue
+                req = snap.request(d, s)
+                start_time = ""
+                end_time = ""
+
+                if st == "M":
+                    label = "会議"
+                elif req.get("type") == "時間指定":
+                    label = "時間指定"
+                    start_time = req.get("start")
+                    end_time = req.get("end")
+                else:
+                    label = st
+
+                day_assignments.append({
+                    "staffId": s,
+                    "name": snap.staffs[s]["name"],
+                    "shift": label,
+                    "start": start_time,
+                    "end": end_time
+                })
+        final_schedule[d] = day_assignments
+    return final_schedule
+
+
+MODES = ["monolithic", "rolling", "lexicographic", "heuristic"]
+# 貪欲法 + 局所探索 (heuristic) の持ち時間 (秒)
+HEURISTIC_TIME = 0.5
+
+
+def _heuristic_result(snap, found, timings, options):
+    """mode="heuristic" の結果: 絶対条件を全部満たしていれば Feasible、違反が残れば Not Solved (シフトは付ける)"""
+    result = ScheduleResult(status="Feasible" if found.ok else "Not Solved", timings=timings,
+                            limits=options.to_dict(), heuristic=dict(found.stats, used="preview"))
+    result.schedule = extract_schedule(snap, found.assigned)
+    result.objective = found.evaluation.score
+    result.validation = found.evaluation.to_dict()
+    return result
+
+
+def generate_schedule(snap, debug_lp_path=None, warm_start=None, mode="monolithic", options=None, on_phase=None,
+                      heuristic_start=False, tier_limits=None, model_cache=None):
+    """Snapshot からシフトを作成する (Firestoreには触らない)
+
+    debug_lp_path を指定すると、同じモデルを PuLP で組み直して .lp ファイルに書き出す
+    warm_start (warmstart.WarmStart) を渡すと前回の解を MIP start にし、
+    fixed のセルは前回の値で固定して解く (固定したままでは解けなければ固定を外して解き直す)。
+    どの mode でも同じ (rolling は固定したセルを前回の値のまま週ごとの部分問題に引き継ぐ)
+    mode="rolling" は1ヶ月を週単位の部分問題に分けて順に解く (大きい店舗向け、最適とは限らない)
+    mode="lexicographic" は目的関数を優先度の段に分けて順に解く (lexicographic.solve_lexicographic)。
+    段ごとの値・時間は tiers に入る。tier_limits ({段: 秒}) で段ごとの制限時間を指定できる
+    mode="heuristic" はソルバーを使わず heuristic.heuristic_schedule だけで作る (1秒未満のプレビュー用)
+    heuristic_start=True だと、先に heuristic で作ったシフトを MIP start にし (monolithic / lexicographic で warm_start が無いとき)、
+    ソルバーが時間内に解を返せなかったときは、絶対条件を満たしていればそのシフトを使う
+    (heuristic の持ち時間 HEURISTIC_TIME の分だけ遅くなるので、既定は False)
+    解なし (Infeasible) のときは diagnosis に原因の日とルール名を入れる (diagnose.diagnose)。
+    日ごとの必要条件 (diagnose.precheck) で解なしと分かるときはソルバーを回さずに返す
+    options (solver.SolverOptions) はそのままソルバーに渡す (options.backend で CBC / HiGHS / CP-SAT を選ぶ)
+    model_cache (model_cache.ModelCache) を渡すと、名簿・暦・ルール表が前回と同じならモデルの骨組みを使い回す。
+    使い回したか ("memory" / "disk" / "miss") とキャッシュの累計は model_cache に入る
+    on_phase を渡すと、段階が変わるたびに "building" / "solving" / "extracting" / "diagnosing" を渡して呼ぶ
+    """
+    if mode not in MODES:
+        raise ValueError(f"unknown mode: {mode}")
+    options = options or SolverOptions()
+    on_phase = on_phase or (lambda phase: None)
+    timings = {}
+    t0 = time.perf_counter()
+    rules = compile_rules(snap)
+    timings["rulesSec"] = round(time.perf_counter() - t0, 4)
+    found = None
+    if mode != "heuristic":
+        t0 = time.perf_counter()
+        issues = precheck(rules)
+        timings["precheckSec"] = round(time.perf_counter() - t0, 4)
+        if issues:
+            return ScheduleResult(status="Infeasible", timings=timings, limits=options.to_dict(),
+                                  diagnosis={"stage": "precheck", "issues": issues, "byDay": by_day(issues)})
+    if mode == "heuristic" or heuristic_start:
+        t0 = time.perf_counter()
+        found = heuristic_schedule(snap, time_limit=HEURISTIC_TIME, rules=rules)
+        timings["heuristicSec"] = round(time.perf_counter() - t0, 4)
+        if mode == "heuristic":
+            return _heuristic_result(snap, found, timings, options)
+
+    on_phase("building")
+    t0 = time.perf_counter()
+    model = build_model(snap, cache=model_cache)
+    timings["buildSec"] = round(time.perf_counter() - t0, 4)
+    cache_info = dict(model_cache.to_dict(), result=model.stats["cache"]) if model_cache is not None else None
+    if debug_lp_path:
+        problem, _ = model.to_pulp()
+        problem.writeLP(debug_lp_path)
+
+    on_phase("solving")
+    t0 = time.perf_counter()
+    decomposition = tiers = None
+    start = None
+    if found is not None and warm_start is None:
+        start = np.zeros(model.n_vars)
+        start[model.x_index] = found.assigned
+        start = complete_start(model, start)
+    solve_model = model
+    if warm_start is not None:
+        solve_model, start = apply_warm_start(model, warm_start)
+
+    def run(target):
+        nonlocal decomposition, tiers
+        if mode == "rolling":
+            solved, stats = solve_rolling(target, solve=solve, options=options)
+            decomposition = stats.to_dict()
+        elif mode == "lexicographic":
+            solved, stats = solve_lexicographic(target, tier_limits=tier_limits, mip_start=start, solve=solve,
+                                                options=options)
+            tiers = stats.tiers
+        else:
+            solved = solve(target, mip_start=start, options=options)
+        return solved
+
+    solved = run(solve_model)
+    if warm_start is not None and not solved.has_solution and warm_start.fixed is not None:
+        warm_start.stats["fallback"] = True
+        solved = run(model)
+    timings["solveSec"] = round(time.perf_counter() - t0, 4)
+    timings.update(solved.timings)
+
+    result = ScheduleResult(status=solved.status, gap=solved.gap, bound=solved.bound,
+                            timings=timings, limits=options.to_dict(), decomposition=decomposition,
+                            presolve=solved.presolve, model_size=model.size_counters(), tiers=tiers,
+                            model_cache=cache_info, portfolio=solved.portfolio)
+    if warm_start is not None:
+        result.warm_start = warm_start.stats
+    evaluation = None
+    if solved.has_solution:
+        on_phase("extracting")
+        t0 = time.perf_counter()
+        assigned = model.x_values(solved.values)
+        result.schedule = extract_schedule(snap, assigned)
+        result.objective = solved.objective
+        timings["extractSec"] = round(time.perf_counter() - t0, 4)
+        # ソルバーとは別の実装 (validate) で、できたシフトが条件を満たしているか確かめる
+        t0 = time.perf_counter()
+        evaluation = evaluate(rules, assigned)
+        result.validation = evaluation.to_dict()
+        timings["validateSec"] = round(time.perf_counter() - t0, 4)
+    if found is not None:
+        result.heuristic = dict(found.stats, used="start")
+        # ソルバーが解を返せなかった / 制限時間が短すぎて条件違反の解や heuristic より悪い解で止まった:
+        # heuristic のシフト (絶対条件は満たしている) を使う
+        # (lexicographic は段の順に良い解なので、重み付きのスコアでは比べない。warm_start は固定したセルの分だけ
+        # スコアが下がるのが当然で、入れ替えると「変えていないセルはそのまま」が崩れるので比べない)
+        worse = (mode != "lexicographic" and warm_start is None and evaluation is not None
+                 and evaluation.score < found.evaluation.score)
+        if found.ok and (evaluation is None or not evaluation.ok or worse):
+            fallback = _heuristic_result(snap, found, timings, options)
+            fallback.heuristic["used"] = "fallback"
+            fallback.presolve = solved.presolve
+            fallback.model_size = result.model_size
+            fallback.model_cache = cache_info
+            fallback.portfolio = solved.portfolio
+            return fallback
+    if solved.status == "Infeasible":
+        on_phase("diagnosing")
+        t0 = time.perf_counter()
+        result.diagnosis = diagnose(snap, model=model, options=options, rules=rules)
+        timings["diagnoseSec"] = round(time.perf_counter() - t0, 4)
+    return result
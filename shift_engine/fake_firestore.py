@@ -0,0 +1,235 @@
+import copy
+import operator
+import threading
+import time
+import uuid
+
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda a, b: a in b,
+    "array_contains": lambda a, b: b in (a or []),
+}
+
+
+def _project(data, fields):
+    if fields is None:
+        return copy.deepcopy(data)
+    return {k: copy.deepcopy(data[k]) for k in fields if k in data}
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return self._data
+
+
+class FakeDocumentReference:
+    def __init__(self, db, collection, doc_id):
+        self._db = db
+        self._collection = collection
+        self.id = doc_id
+
+    def get(self, field_paths=None, transaction=None):
+        self._db._wait()
+        data = self._db._data.get(self._collection, {}).get(self.id)
+        self._db._count(self._collection, int(data is not None))
+        return FakeDocumentSnapshot(self, None if data is None else _project(data, field_paths))
+
+    def set(self, document, merge=False):
+        self._db._wait()
+        with self._db._lock:
+            docs = self._db._data.setdefault(self._collection, {})
+            if merge and self.id in docs:
+                docs[self.id].update(copy.deepcopy(document))
+            else:
+                docs[self.id] = copy.deepcopy(document)
+
+    def update(self, fields):
+        self._db._wait()
+        with self._db._lock:
+            self._db._data[self._collection][self.id].update(copy.deepcopy(fields))
+
+    def delete(self):
+        self._db._wait()
+        with self._db._lock:
+            self._db._data.get(self._collection, {}).pop(self.id, None)
+
+    def collection(self, name):
+        return FakeCollectionReference(self._db, f"{self._collection}/{self.id}/{name}")
+
+
+class FakeWriteBatch:
+    """まとめて commit() したときに1回分の待ち時間で全部書く"""
+
+    def __init__(self, db):
+        self._db = db
+        self._ops = []
+
+    def set(self, reference, document, merge=False):
+        self._ops.append(("set", reference, document, merge))
+
+    def update(self, reference, fields):
+        self._ops.append(("update", reference, fields, False))
+
+    def delete(self, reference):
+        self._ops.append(("delete", reference, None, False))
+
+    def commit(self):
+        self._db._wait()
+        latency, self._db.latency = self._db.latency, 0.0
+        try:
+            for op, ref, data, merge in self._ops:
+                if op == "set":
+                    ref.set(data, merge=merge)
+                elif op == "update":
+                    ref.update(data)
+                else:
+                    ref.delete()
+        finally:
+            self._db.latency = latency
+        self._db.writes += len(self._ops)
+        self._ops = []
+
+
+class FakeQuery:
+    def __init__(self, db, collection, filters=(), fields=None, order=None, limit=None):
+        self._db = db
+        self._collection = collection
+        self._filters = list(filters)
+        self._fields = fields
+        self._order = order
+        self._limit = limit
+
+    def _copy(self, **kwargs):
+        args = dict(filters=self._filters, fields=self._fields, order=self._order, limit=self._limit)
+        args.update(kwargs)
+        return FakeQuery(self._db, self._collection, **args)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + [(field_path, OPERATORS[op_string], value)])
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._copy(order=(field_path, direction == "DESCENDING"))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def _matches(self):
+        self._db._wait()
+        with self._db._lock:
+            items = sorted(self._db._data.get(self._collection, {}).items())
+        hits = [(doc_id, data) for doc_id, data in items
+                if all(f in data and op(data[f], v) for f, op, v in self._filters)]
+        if self._order:
+            field, reverse = self._order
+            hits = sorted((h for h in hits if field in h[1]), key=lambda h: h[1][field], reverse=reverse)
+        if self._limit is not None:
+            hits = hits[:self._limit]
+        return hits
+
+    def stream(self, transaction=None):
+        hits = self._matches()
+        self._db._count(self._collection, len(hits))
+        for doc_id, data in hits:
+            ref = FakeDocumentReference(self._db, self._collection, doc_id)
+            yield FakeDocumentSnapshot(ref, _project(data, self._fields))
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+    def count(self, alias=None):
+        return FakeAggregationQuery(self)
+
+
+class FakeAggregationResult:
+    def __init__(self, value, alias=None):
+        self.value = value
+        self.alias = alias
+
+
+class FakeAggregationQuery:
+    def __init__(self, query):
+        self._query = query
+
+    def get(self, transaction=None):
+        n = len(self._query._matches())
+        # 集計クエリは索引 1000 件ごとに 1 read
+        self._query._db._count(self._query._collection, 1 + n // 1000)
+        return [[FakeAggregationResult(n)]]
+
+
+class FakeCollectionReference(FakeQuery):
+    def document(self, document_id=None):
+        return FakeDocumentReference(self._db, self._collection, document_id or uuid.uuid4().hex)
+
+
+class FakeFirestore:
+    """テスト用のインメモリ Firestore (firestore_io が使う範囲だけ)
+
+    data: {コレクション名: {ドキュメントID: dict}}
+    latency: 読み書き1回ごとに待つ秒数 (並行読み込みの効果を確かめる用)
+    reads: コレクションごとに読んだドキュメント数 / writes: バッチで書いたドキュメント数
+    """
+
+    project = "fake"
+
+    def __init__(self, data=None, latency=0.0):
+        self._data = copy.deepcopy(data or {})
+        self._lock = threading.Lock()
+        self.latency = latency
+        self.reads = {}
+        self.writes = 0
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _count(self, collection, n):
+        with self._lock:
+            self.reads[collection] = self.reads.get(collection, 0) + n
+
+    def collection(self, name):
+        return FakeCollectionReference(self, name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+
+def fake_from_snapshot(snap, latency=0.0):
+    """Snapshot (synthetic.make_store など) を Firestore と同じ形のドキュメントに戻して FakeFirestore に入れる"""
+    shifts = {}
+    for day, reqs in snap.request_map.items():
+        for sid, req in reqs.items():
+            doc = shifts.setdefault(f"{sid}_{snap.doc_id}", {
+                "staffId": sid, "year": snap.year, "month": snap.month, "requests": {}})
+            doc["requests"][day] = req
+    config = {
+        "dailySales": snap.daily_sales,
+        "caps": snap.caps,
+        "minSkills": snap.min_skills,
+        "minStaffCounts": snap.min_staff_counts,
+        "meetings": snap.meetings,
+    }
+    return FakeFirestore({
+        "staffs": snap.staffs,
+        "monthlyConfig": {snap.doc_id: config},
+        "shifts": shifts,
+    }, latency=latency)
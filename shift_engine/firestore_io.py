@@ -0,0 +1,216 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .snapshot import build_snapshot
+from .warmstart import input_digest
+
+DEFAULT_KEY_PATH = os.path.join(os.path.dirname(__file__), "..", "serviceAccountKey.json")
+
+# ソルバーが使うフィールドだけを読む (select / field_paths で射影する)
+STAFF_FIELDS = ["rank", "rankId", "department", "canOpen", "canClose", "skills", "maxDays", "priority", "name"]
+SHIFT_FIELDS = ["staffId", "requests"]
+CONFIG_FIELDS = ["dailySales", "caps", "minSkills", "minStaffCounts", "meetings", "rules"]
+
+# firebase_admin / google.cloud.firestore は読み込みだけで 0.5 秒以上かかる (サーバーレスのコールドスタートの大半) ので、
+# 使う関数の中で import する。作ったクライアントは (key_path, app_name) ごとに残し、温かいインスタンスでは使い回す
+_clients = {}
+
+
+def initialize_firebase(key_path=None, app_name=None):
+    """Firebase アプリを初期化して返す (app_name を分けると店舗ごとに別プロジェクトへ接続できる)"""
+    import firebase_admin
+    from firebase_admin import credentials
+
+    name = app_name or firebase_admin._DEFAULT_APP_NAME
+    if name in firebase_admin._apps:
+        return firebase_admin.get_app(name)
+
+    env_key = os.environ.get('FIREBASE_KEY') if key_path is None else None
+    if env_key:
+        cred = credentials.Certificate(json.loads(env_key))
+    else:
+        key_path = key_path or DEFAULT_KEY_PATH
+        if not os.path.exists(key_path):
+            print("⚠️ 鍵が見つかりません")
+            return None
+        cred = credentials.Certificate(key_path)
+    return firebase_admin.initialize_app(cred, name=name)
+
+
+def get_client(key_path=None, app_name=None):
+    """Firestore クライアント (同じ key_path / app_name なら前回作ったものを返す)"""
+    key = (key_path, app_name)
+    if key not in _clients:
+        from firebase_admin import firestore
+
+        app = initialize_firebase(key_path, app_name)
+        _clients[key] = firestore.client(app=app)
+    return _clients[key]
+
+
+def _timed(name, read, stats):
+    t0 = time.perf_counter()
+    result = read()
+    docs = len(result) if isinstance(result, list) else int(result is not None)
+    stats[name] = {"docs": docs, "sec": round(time.perf_counter() - t0, 4)}
+    return result
+
+
+def read_inputs(db, year, month, stats=None):
+    """staffs / monthlyConfig / shifts を並行して読む
+
+    戻り値: (staff_docs, config, shift_docs)。stats (dict) を渡すとコレクションごとの
+    件数と所要時間、全体の wallSec を書き込む。
+    """
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    stats = {} if stats is None else stats
+
+    def staffs():
+        return [(doc.id, doc.to_dict()) for doc in db.collection("staffs").select(STAFF_FIELDS).stream()]
+
+    def config():
+        doc = db.collection("monthlyConfig").document(f"{year}-{month}").get(field_paths=CONFIG_FIELDS)
+        return doc.to_dict() if doc.exists else None
+
+    def shifts():
+        query = (db.collection("shifts")
+                 .where(filter=FieldFilter("year", "==", year))
+                 .where(filter=FieldFilter("month", "==", month))
+                 .select(SHIFT_FIELDS))
+        return [s.to_dict() for s in query.stream()]
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(_timed, name, read, stats)
+                   for name, read in (("staffs", staffs), ("monthlyConfig", config), ("shifts", shifts))]
+        staff_docs, config_data, shift_docs = [f.result() for f in futures]
+    stats["wallSec"] = round(time.perf_counter() - t0, 4)
+    return staff_docs, config_data, shift_docs
+
+
+def load_snapshot(db, year, month, stats=None):
+    """staffs / monthlyConfig / shifts を読み込んで Snapshot を返す (stats は read_inputs と同じ)"""
+    staff_docs, config, shift_docs = read_inputs(db, year, month, stats)
+    return build_snapshot(year, month, staff_docs, config, shift_docs)
+
+
+SCHEDULE_FORMAT = 2
+
+
+def firestore_size(value):
+    """Firestore の保存サイズの見積もり (文字列は UTF-8 + 1, 数値・日時は 8, map はキー + 値)"""
+    if isinstance(value, str):
+        return len(value.encode("utf-8")) + 1
+    if isinstance(value, bool) or value is None:
+        return 1
+    if isinstance(value, (int, float)):
+        return 8
+    if isinstance(value, dict):
+        return sum(firestore_size(k) + firestore_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(firestore_size(v) for v in value)
+    return 8
+
+
+def compact_schedule(snap, schedule):
+    """schedule (日 -> 割り当ての list) を、日ごとのドキュメントに分けた形にする
+
+    名前は親ドキュメントの staffNames に1回だけ持ち、各日は staffId とシフトの並列配列
+    (Firestore は配列の入れ子ができないため)。時間指定の時刻だけ times に入れる。
+    """
+    names = {}
+    days = {}
+    for d, assignments in schedule.items():
+        day = {"staff": [], "shift": []}
+        for a in assignments:
+            names[a["staffId"]] = a["name"]
+            day["staff"].append(a["staffId"])
+            day["shift"].append(a["shift"])
+            if a.get("start") or a.get("end"):
+                day.setdefault("times", {})[a["staffId"]] = {"start": a["start"], "end": a["end"]}
+        days[d] = day
+    return names, days
+
+
+def expand_schedule(names, days):
+    """compact_schedule の逆: 画面と warm start が使う schedule 形式に戻す"""
+    schedule = {}
+    for d, day in days.items():
+        times = day.get("times", {})
+        schedule[d] = [{
+            "staffId": sid,
+            "name": names.get(sid, ""),
+            "shift": shift,
+            "start": times.get(sid, {}).get("start", ""),
+            "end": times.get(sid, {}).get("end", ""),
+        } for sid, shift in zip(day.get("staff", []), day.get("shift", []))]
+    return schedule
+
+
+def load_schedule(db, year, month):
+    """determined_shifts/{年-月} を読んで (schedule, 親ドキュメントの dict) を返す (無ければ (None, None))
+
+    旧形式 (schedule を1ドキュメントに持つ) と、日ごとのサブコレクション days の両方を読める。
+    """
+    ref = db.collection("determined_shifts").document(f"{year}-{month}")
+    doc = ref.get()
+    if not doc.exists:
+        return None, None
+    data = doc.to_dict()
+    if "schedule" in data:
+        return data["schedule"], data
+    days = {d.id: d.to_dict() for d in ref.collection("days").stream()}
+    return expand_schedule(data.get("staffNames", {}), days), data
+
+
+def load_previous_schedule(db, snap):
+    """前回保存した determined_shifts の (schedule, inputDigest) を返す (無ければ (None, None))"""
+    schedule, data = load_schedule(db, snap.year, snap.month)
+    if data is None:
+        return None, None
+    return schedule, data.get("inputDigest")
+
+
+def save_schedule(db, snap, schedule, solve_info=None):
+    """solve_info: ScheduleResult.summary() (ステータス・ギャップ・所要時間)
+
+    親ドキュメント + days/{日} をまとめて1回のバッチで書く。
+    戻り値: 書いたドキュメント数・推定バイト数 (旧形式で書いた場合の推定 legacyBytes も)・所要時間
+    """
+    from firebase_admin import firestore
+
+    t0 = time.perf_counter()
+    names, days = compact_schedule(snap, schedule)
+    doc = {
+        "year": snap.year,
+        "month": snap.month,
+        "format": SCHEDULE_FORMAT,
+        "staffNames": names,
+        "days": sorted(days, key=int),
+        # 次回の差分再計算 (warm start) 用に、入力の要約を一緒に保存する
+        "inputDigest": input_digest(snap),
+        "createdAt": firestore.SERVER_TIMESTAMP
+    }
+    if solve_info is not None:
+        doc["solve"] = solve_info
+
+    ref = db.collection("determined_shifts").document(snap.doc_id)
+    batch = db.batch()
+    batch.set(ref, doc)
+    for d, day in days.items():
+        batch.set(ref.collection("days").document(d), day)
+    batch.commit()
+
+    legacy = {k: v for k, v in doc.items() if k not in ("format", "staffNames", "days")}
+    legacy["schedule"] = schedule
+    sizes = [firestore_size(doc)] + [firestore_size(day) for day in days.values()]
+    return {
+        "docs": len(sizes),
+        "bytes": sum(sizes),
+        "maxDocBytes": max(sizes),
+        "legacyBytes": firestore_size(legacy),
+        "sec": round(time.perf_counter() - t0, 4),
+    }
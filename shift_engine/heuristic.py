@@ -0,0 +1,491 @@
+import math
+import random
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .model import A, B, C, M
+from .validate import SOFT_WEIGHTS, compile_rules, evaluate
+
+OFF = -1
+# 局所探索で絶対条件の違反1件にかける点数 (ソフト条件のどれよりも重くする)
+HARD_PENALTY = 100000
+
+
+@dataclass
+class HeuristicResult:
+    """貪欲法 + 局所探索で作ったシフト (assigned は x[日, スタッフ, シフト] の 0/1 配列)"""
+
+    assigned: np.ndarray
+    evaluation: object
+    stats: dict = field(default_factory=dict)
+
+    @property
+    def ok(self):
+        return bool(self.evaluation.ok)
+
+
+def _to_assigned(shift, K=4):
+    return shift[..., None] == np.arange(K)
+
+
+class _Builder:
+    """1日ずつ人を足していく貪欲法の状態 (shift[日, スタッフ] は -1 / A / B / C / M)"""
+
+    def __init__(self, rules, weight):
+        self.r = rules
+        D, S = rules.meet.shape
+        self.D, self.S = D, S
+        self.shift = np.full((D, S), OFF, dtype=np.int8)
+        self.shift[rules.meet] = M
+        self.shift[rules.must_shift >= 0] = rules.must_shift[rules.must_shift >= 0]
+        # 時間指定・新規パートナーの出勤日は、開け/締めに数えられるシフトを仮に入れておく
+        must = rules.must_work & (self.shift == OFF)
+        self.shift[must & rules.open_hit] = A
+        self.shift[must & ~rules.open_hit & rules.close_hit] = C
+        self.shift[must & (self.shift == OFF)] = B
+        # シフト制限のある人は、入れるシフトのうち最初のもの (早番固定なら A) にする
+        limited = must & (self.shift >= 0) & (self.shift < M)
+        ok = rules.allowed[np.arange(S), np.where(limited, self.shift, A)]
+        self.shift[limited & ~ok] = np.broadcast_to(rules.allowed.argmax(axis=1), (D, S))[limited & ~ok]
+        # 出勤するかどうか / どのシフトかを変えてよいセル
+        self.locked = rules.meet | rules.rest | (rules.must_shift >= 0)
+        self.fixed_shift = self.locked | rules.custom
+        self.optional = ~self.locked & ~rules.must_work
+        self.weight = weight
+        # cover() で開け/締めに回した人 (後の cover() でシフトを変えない)
+        self.protected = np.zeros((D, S), dtype=bool)
+        self.budget = np.where(rules.is_employee, rules.max_days, np.inf) - (self.shift >= 0).sum(axis=0)
+
+    def working(self, d):
+        return (self.shift[d] >= 0) & (self.shift[d] != M)
+
+    def can_add(self, d, s, streak=6):
+        """(d, s) に出勤を足しても 上限日数 / 連勤 (streak 日まで) を超えないか"""
+        if self.shift[d, s] != OFF or not self.optional[d, s] or self.budget[s] < 1:
+            return False
+        work = self.shift[:, s] >= 0
+        lo, hi = max(0, d - streak), min(self.D, d + streak + 1)
+        run = work[lo:hi].copy()
+        run[d - lo] = True
+        width = streak + 1
+        if len(run) < width:
+            return True
+        sums = np.convolve(run, np.ones(width, dtype=int), mode="valid")
+        return sums.max() <= streak
+
+    def partner_room(self, d):
+        who = self.working(d) & self.r.is_partner
+        used = self.r.hours[d, who, self.shift[d, who]].sum()
+        return self.r.hour_caps[d] - used
+
+    def add(self, d, s, k):
+        if not self.r.allowed[s, k]:
+            k = int(self.r.allowed[s].argmax())
+        self.shift[d, s] = k
+        self.budget[s] -= 1
+
+    def plan_employees(self):
+        """社員の出勤日を先に決める
+
+        リーダー以上は minLeaders 名に足りない日を先に埋め、残りは週末 (目的関数 +1000) -> 人の少ない日の順に入れる。
+        """
+        r = self.r
+        weekend = r.bonus[:, :, A].max(axis=1) >= 1000
+        emp = np.nonzero(r.is_employee)[0]
+        order = sorted(emp.tolist(), key=lambda s: (not r.is_leader[s], s))
+        # パートナーが出られる人数 (少ない日ほど社員が要る)
+        supply = (r.is_partner[None, :] & (self.optional | r.must_work)).sum(axis=1)
+        for s in order:
+            avoid = r.off_soft[:, s]
+            if r.is_leader[s]:
+                load = (self.shift[:, r.is_leader] >= 0).sum(axis=1)
+                needed = load < r.min_leaders
+            else:
+                load = (self.shift[:, r.is_employee] >= 0).sum(axis=1) + supply
+                needed = np.zeros(self.D, dtype=bool)
+            days = sorted(range(self.D), key=lambda d: (not needed[d], not weekend[d], load[d], d))
+            for d in days:
+                if avoid[d] or self.budget[s] < 1:
+                    continue
+                # 4連勤はペナルティ (-500) なので3連勤まで。週末 (+1000) だけは4連勤まで入れる
+                if self.can_add(d, s, streak=4 if weekend[d] else 3):
+                    self.add(d, s, A)
+
+    def pick(self, d, need, count_shift=None):
+        """d 日に足す人を選ぶ: 任意出勤のパートナー (優先度順) -> 上限日数の残った社員 -> 希望休の社員"""
+        r = self.r
+        room = self.partner_room(d)
+        best, best_key = None, None
+        for s in np.nonzero(need & (self.shift[d] == OFF) & self.optional[d])[0].tolist():
+            if r.is_partner[s] and room < r.hours[d, s].min():
+                continue
+            if not self.can_add(d, s):
+                continue
+            key = (r.off_soft[d, s], not r.is_partner[s], -self.weight[d, s], s)
+            if best_key is None or key < best_key:
+                best, best_key = s, key
+        return best
+
+    def flexible(self, d, who, exclude=()):
+        """d 日に出勤していて、シフトを入れ替えてよい人"""
+        cand = self.working(d) & ~self.fixed_shift[d] & ~self.protected[d] & who
+        for k in exclude:
+            cand &= self.shift[d] != k
+        return np.nonzero(cand)[0].tolist()
+
+    def cover(self, d, base, hit, need, who, k):
+        """d 日の開け (A) / 締め (C) の人数を need 人以上にする"""
+        r = self.r
+        allowed = who & r.allowed[:, k]
+
+        def count():
+            w = self.working(d)
+            return np.count_nonzero(w & who & ((~r.custom[d] & (self.shift[d] == base)) | hit[d]))
+
+        def late_early(s):
+            # 社員の遅番 -> 翌日早番 (-200) になりそうか (翌日以降はまだ仮の A のことが多い)
+            if not r.is_employee[s]:
+                return False
+            if k == A:
+                return d > 0 and self.shift[d - 1, s] == C
+            return d + 1 < self.D and self.shift[d + 1, s] >= 0
+
+        while count() < need:
+            flex = [s for s in self.flexible(d, allowed, exclude=[k]) if not (k == A and late_early(s))]
+            flex.sort(key=late_early)
+            if flex:
+                self.shift[d, flex[0]] = k
+                self.protected[d, flex[0]] = True
+                continue
+            s = self.pick(d, allowed)
+            if s is None:
+                return False
+            self.add(d, s, k)
+            self.protected[d, s] = True
+        return True
+
+    def cover_slots(self, d):
+        """時間帯ごとの最低人数 (slotCoverage) が足りない枠に、その枠を含むシフトで人を足す"""
+        r = self.r
+        if not len(r.slot_mins):
+            return
+        cover = r.slot_cover[d] & r.allowed[:, :, None]
+        while True:
+            w = self.working(d)
+            k_now = np.where(w, self.shift[d], A).astype(int)
+            count = (cover[np.arange(self.S), k_now] & w[:, None]).sum(axis=0)
+            short = np.nonzero(count < r.slot_mins)[0]
+            if not len(short):
+                return
+            t = int(short[0])
+            s = self.pick(d, cover[:, :, t].any(axis=1))
+            if s is None:
+                return
+            self.add(d, s, int(cover[s, :, t].argmax()))
+
+    def fill_day(self, d):
+        r = self.r
+        everyone = np.ones(self.S, dtype=bool)
+        # リーダー以上 minLeaders 名
+        while np.count_nonzero(self.working(d) & r.is_leader) < r.min_leaders:
+            s = self.pick(d, r.is_leader)
+            if s is None:
+                break
+            self.add(d, s, A)
+        self.cover(d, A, r.open_key_hit, 1, r.can_open, A)
+        self.cover(d, C, r.close_hit, 1, r.can_close, C)
+        self.cover(d, C, r.close_hit, r.min_close, everyone, C)
+        self.cover(d, A, r.open_hit, r.min_open, everyone, A)
+        self.cover_slots(d)
+        # 部門・スキル (ソフト)
+        for j in range(len(r.dept_names)):
+            if not (self.working(d) & r.dept_masks[j]).any():
+                s = self.pick(d, r.dept_masks[j])
+                if s is not None:
+                    self.add(d, s, B)
+        for j in range(len(r.skill_names)):
+            while (self.working(d) * r.skill_levels[j]).sum() < r.skill_mins[j]:
+                s = self.pick(d, r.skill_levels[j] > 0)
+                if s is None:
+                    break
+                self.add(d, s, B)
+        # 前日が遅番の社員は、開けに回していなければ早番を中番にする
+        if d > 0:
+            moved = self.working(d) & ~self.fixed_shift[d] & ~self.protected[d] & r.is_employee \
+                & (self.shift[d] == A) & (self.shift[d - 1] == C) & r.allowed[:, B]
+            self.shift[d, moved] = B
+        # 任意出勤のパートナーは出るほど点が上がる (時間キャップの範囲で優先度順)
+        partners = np.nonzero(r.is_partner & self.optional[d] & (self.shift[d] == OFF))[0]
+        for s in sorted(partners.tolist(), key=lambda s: -self.weight[d, s]):
+            if self.partner_room(d) < r.hours[d, s, A]:
+                continue
+            self.add(d, s, A)
+
+    def move_leaders(self):
+        """リーダー以上が minLeaders 名に足りない日へ、それより多い日から同じ人の出勤を移す"""
+        r = self.r
+        leaders = np.nonzero(r.is_leader)[0].tolist()
+        for d in range(self.D):
+            for s in leaders:
+                if np.count_nonzero(self.working(d) & r.is_leader) >= r.min_leaders:
+                    break
+                if self.shift[d, s] != OFF or not self.optional[d, s] or r.off_soft[d, s]:
+                    continue
+                for e in np.nonzero(self.working(slice(None))[:, s] & self.optional[:, s])[0].tolist():
+                    if np.count_nonzero(self.working(e) & r.is_leader) <= r.min_leaders:
+                        continue
+                    k = self.shift[e, s]
+                    self.shift[e, s] = OFF
+                    self.budget[s] += 1
+                    if self.can_add(d, s):
+                        self.add(d, s, k)
+                        break
+                    self.add(e, s, k)
+
+    def build(self):
+        self.plan_employees()
+        self.move_leaders()
+        for d in range(self.D):
+            self.fill_day(d)
+        return self.shift
+
+
+def _run(col, d):
+    """col[d] を含む連続出勤 (休み = OFF 以外) の最初と最後の日"""
+    a = b = d
+    while a > 0 and col[a - 1] != OFF:
+        a -= 1
+    while b + 1 < len(col) and col[b + 1] != OFF:
+        b += 1
+    return a, b
+
+
+def _full_windows(a, b, d, width):
+    """出勤の続く [a, b] の中にあって d を含む、width 日の窓の数"""
+    return max(0, min(d, b - width + 1) - max(a, d - width + 1) + 1)
+
+
+class _Scorer:
+    """局所探索用の差分採点: 1セルのシフトを変えたときの点数の増減を、その日とその人の周りだけで計算する
+
+    点数は validate.evaluate の score - HARD_PENALTY * 絶対条件の違反数 と同じ。
+    1日1シフトの形 (shift[日, スタッフ]) なので、連勤の窓は「連続出勤の中に収まる窓の数」で数えられる。
+    """
+
+    def __init__(self, rules, shift):
+        r = self.r = rules
+        self.shift = shift
+        self.D, self.S = shift.shape
+        self.cols = shift.T.tolist()
+        self.has_leader = bool(r.is_leader.any())
+        self.levels = r.skill_levels.T.copy()
+        self.depts = r.dept_masks.T.astype(int)
+        # 1セルごとに見るフラグは Python の list にしておく (numpy のスカラー参照より速い)
+        self.flags = {name: getattr(r, name).tolist() for name in (
+            "meet", "rest", "must_work", "must_shift", "off_soft", "custom", "open_hit", "close_hit", "open_key_hit")}
+        self.staff_flags = {name: getattr(r, name).tolist() for name in (
+            "is_employee", "is_leader", "is_partner", "allowed", "can_open", "can_close", "max_days")}
+        self.bonus = r.bonus.tolist()
+        self.hours = r.hours.tolist()
+        # 時間帯ごとの最低人数があるときだけ、枠ごとの人数を数える
+        self.slots = len(r.slot_mins) > 0
+        self.slot_cnt = np.zeros((shift.shape[0], len(r.slot_mins)))
+        self.hour_caps = r.hour_caps.tolist()
+        D = self.D
+        self.open_cnt = [0] * D
+        self.close_cnt = [0] * D
+        self.open_key = [0] * D
+        self.close_key = [0] * D
+        self.leaders = [0] * D
+        self.partner_hours = [0.0] * D
+        self.dept_cnt = np.zeros((D, len(r.dept_names)))
+        self.skill_sum = np.zeros((D, len(r.skill_names)))
+        self.days_used = [0] * self.S
+        for d in range(D):
+            for s in range(self.S):
+                self._count(d, s, self.cols[s][d], 1)
+
+    def _count(self, d, s, k, sign):
+        if k == OFF:
+            return
+        self.days_used[s] += sign
+        if k == M:
+            return
+        f, sf = self.flags, self.staff_flags
+        if f["custom"][d][s]:
+            is_open, is_close, is_open_key = f["open_hit"][d][s], f["close_hit"][d][s], f["open_key_hit"][d][s]
+        else:
+            is_open = is_open_key = k == A
+            is_close = k == C
+        self.open_cnt[d] += sign * is_open
+        self.close_cnt[d] += sign * is_close
+        self.open_key[d] += sign * (is_open_key and sf["can_open"][s])
+        self.close_key[d] += sign * (is_close and sf["can_close"][s])
+        self.leaders[d] += sign * sf["is_leader"][s]
+        if sf["is_partner"][s]:
+            self.partner_hours[d] += sign * self.hours[d][s][k]
+        if self.slots:
+            self.slot_cnt[d] += sign * self.r.slot_cover[d, s, k]
+        self.dept_cnt[d] += sign * self.depts[s]
+        self.skill_sum[d] += sign * self.levels[s]
+
+    def _day(self, d):
+        r = self.r
+        hard = sum((
+            self.open_cnt[d] < r.min_open, self.close_cnt[d] < r.min_close,
+            self.open_key[d] < 1, self.close_key[d] < 1,
+            self.has_leader and self.leaders[d] < r.min_leaders,
+            self.partner_hours[d] > self.hour_caps[d] + 1e-6,
+        ))
+        if self.slots:
+            hard += int(np.count_nonzero(self.slot_cnt[d] < r.slot_mins))
+        soft = 0.0
+        if len(r.dept_names):
+            soft += int(np.count_nonzero(self.dept_cnt[d] == 0)) * SOFT_WEIGHTS["missing_dept"]
+        if len(r.skill_names):
+            soft += float(np.maximum(r.skill_mins - self.skill_sum[d], 0).sum()) * SOFT_WEIGHTS["shortage"]
+        return soft - HARD_PENALTY * hard
+
+    def _staff(self, d, s):
+        """(d, s) を含む連勤の窓・遅番->早番・上限日数・そのセル自身の条件の点数"""
+        f, sf = self.flags, self.staff_flags
+        col = self.cols[s]
+        k = col[d]
+        hard = 0
+        soft = 0.0
+        work = k != OFF and k != M
+        if k != OFF:
+            a, b = _run(col, d)
+            hard += _full_windows(a, b, d, 7)
+        if sf["is_employee"][s]:
+            if k != OFF:
+                soft += _full_windows(a, b, d, 4) * SOFT_WEIGHTS["four_in_row"]
+            late_early = (d > 0 and col[d - 1] == C and k == A) + (d + 1 < self.D and k == C and col[d + 1] == A)
+            soft += late_early * SOFT_WEIGHTS["late_early"]
+            hard += self.days_used[s] > sf["max_days"][s]
+            soft += (f["off_soft"][d][s] and k != OFF) * SOFT_WEIGHTS["off_override"]
+        hard += f["meet"][d][s] != (k == M)
+        must_shift = f["must_shift"][d][s]
+        hard += bool((f["rest"][d][s] and k != OFF) or (f["must_work"][d][s] and not work)
+                     or (must_shift >= 0 and k != must_shift))
+        hard += bool(work and not sf["allowed"][s][k])
+        bonus = self.bonus[d][s][k] if work else 0.0
+        return bonus + soft - HARD_PENALTY * hard
+
+    def local(self, d, s):
+        return self._day(d) + self._staff(d, s)
+
+    def set(self, d, s, k):
+        """(d, s) を k にして、点数の増減を返す"""
+        before = self.local(d, s)
+        self._count(d, s, self.cols[s][d], -1)
+        self.cols[s][d] = k
+        self.shift[d, s] = k
+        self._count(d, s, k, 1)
+        return self.local(d, s) - before
+
+
+def _local_search(rules, shift, movable, choices, seed, deadline, temperature=20.0):
+    """ランダムな近傍 (1セルの変更 / 同じ日の2人の入れ替え / 1人の出勤日の移動) を差分採点で試す
+
+    良くなる・変わらない移動は採用し、悪くなる移動も温度 (最初 temperature 点、締切に向けて 0 へ下げる)
+    に応じた確率で受け入れる (焼きなまし)。一番良かった状態を shift に残す。
+    """
+    scorer = _Scorer(rules, shift)
+    cols = scorer.cols
+    by_day = [np.nonzero(movable[d])[0].tolist() for d in range(movable.shape[0])]
+    by_staff = [np.nonzero(movable[:, s])[0].tolist() for s in range(movable.shape[1])]
+    cells = [(d, s) for d, row in enumerate(by_day) for s in row]
+    if not cells:
+        return 0, 0
+    rnd = random.Random(seed)
+    start = time.perf_counter()
+    span = max(deadline - start, 1e-9)
+    current = best = 0.0
+    best_shift = shift.copy()
+    tried = improved = 0
+    temp = temperature
+    while True:
+        if tried % 256 == 0:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            temp = temperature * (1 - (now - start) / span)
+        tried += 1
+        d, s = cells[rnd.randrange(len(cells))]
+        move = rnd.random()
+        changes = None
+        if move < 0.5:
+            changes = [(d, s, rnd.choice(choices[d][s]))]
+        elif move < 0.75:
+            # 同じ日の別の人とシフトを入れ替える
+            t = rnd.choice(by_day[d])
+            if t != s and cols[t][d] in choices[d][s] and cols[s][d] in choices[d][t]:
+                changes = [(d, s, cols[t][d]), (d, t, cols[s][d])]
+        else:
+            # 同じ人の出勤日を別の日へ移す (移した先のシフトは選び直す)
+            e = rnd.choice(by_staff[s])
+            if (cols[s][e] == OFF) != (cols[s][d] == OFF):
+                if cols[s][d] == OFF:
+                    d, e = e, d
+                opts = [k for k in choices[e][s] if k != OFF]
+                if OFF in choices[d][s] and opts:
+                    changes = [(d, s, OFF), (e, s, rnd.choice(opts))]
+        if not changes:
+            continue
+        undo = [(cd, cs, cols[cs][cd]) for cd, cs, _ in changes]
+        delta = sum(scorer.set(cd, cs, k) for cd, cs, k in changes)
+        if delta >= -1e-9 or (temp > 0 and rnd.random() < math.exp(delta / temp)):
+            current += delta
+            if current > best + 1e-9:
+                best = current
+                best_shift[...] = shift
+                improved += 1
+        else:
+            for cd, cs, k in reversed(undo):
+                scorer.set(cd, cs, k)
+    shift[...] = best_shift
+    return tried, improved
+
+
+def heuristic_schedule(snap, time_limit=0.5, seed=0, rules=None):
+    """ソルバーを使わずにシフトを作る (貪欲法で組んでから、局所探索で改善する)
+
+    採点は validate.evaluate (目的関数と同じ重み) から、絶対条件の違反1件ごとに HARD_PENALTY を引いたもの。
+    time_limit 秒で打ち切る。結果はそのままプレビューにも、MIP start (warmstart.complete_start) にも使える。
+    """
+    t0 = time.perf_counter()
+    rules = rules or compile_rules(snap)
+    # パートナーの優先度の点 (任意出勤のパートナーを足す順番)
+    weight = rules.bonus[:, :, A] - rules.bonus[:, :, A].min()
+    builder = _Builder(rules, weight)
+    shift = builder.build()
+    greedy_score = evaluate(rules, _to_assigned(shift)).score
+    construct_sec = time.perf_counter() - t0
+
+    # 変えてよいセルと、取りうる値 (休み / A / B / C のうちシフト制限で入れるもの)
+    D, S = shift.shape
+    movable = ~builder.locked
+    choices = [[None] * S for _ in range(D)]
+    for d in range(D):
+        for s in range(S):
+            opts = [k for k in (A, B, C) if rules.allowed[s, k]]
+            if rules.custom[d, s]:
+                opts = [int(shift[d, s])]
+            choices[d][s] = opts if rules.must_work[d, s] else [OFF] + opts
+    tried, improved = _local_search(rules, shift, movable, choices, seed, t0 + time_limit)
+
+    assigned = _to_assigned(shift)
+    current = evaluate(rules, assigned)
+    stats = {
+        "constructSec": round(construct_sec, 4),
+        "searchSec": round(time.perf_counter() - t0 - construct_sec, 4),
+        "moves": tried,
+        "improved": improved,
+        "greedyScore": round(float(greedy_score), 4),
+        "score": round(float(current.score), 4),
+        "hardViolations": int(sum(current.hard.values())),
+    }
+    return HeuristicResult(assigned=assigned, evaluation=current, stats=stats)
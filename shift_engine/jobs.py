@@ -0,0 +1,289 @@
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+
+from .profiling import log_json, profiled
+
+# フェーズごとの進捗 (solving の間は制限時間に対する経過時間で補間する)
+PHASE_PROGRESS = {
+    "queued": 0.0,
+    "fetching": 0.05,
+    "building": 0.2,
+    "solving": 0.3,
+    "extracting": 0.9,
+    "diagnosing": 0.9,
+    "writing": 0.95,
+    "done": 1.0,
+}
+
+
+def new_job(params):
+    now = time.time()
+    return {
+        "id": uuid.uuid4().hex,
+        "status": "queued",
+        "phase": "queued",
+        "params": params,
+        "createdAt": now,
+        "updatedAt": now,
+    }
+
+
+def job_view(job, now=None):
+    """GET で返す形: 経過時間と進捗を今の時刻で計算して付ける"""
+    now = now or time.time()
+    view = dict(job)
+    started = job.get("startedAt")
+    end = job.get("finishedAt") or now
+    view["elapsedSec"] = round(end - started, 2) if started else 0.0
+    progress = PHASE_PROGRESS.get(job["phase"], 0.0)
+    if job["phase"] == "solving" and job.get("phaseAt"):
+        limit = job.get("params", {}).get("timeLimit")
+        if limit:
+            ratio = min(1.0, (now - job["phaseAt"]) / limit)
+            progress += (PHASE_PROGRESS["extracting"] - progress) * ratio
+    view["progress"] = round(progress, 3)
+    return view
+
+
+class MemoryJobStore:
+    """プロセス内の辞書で持つジョブ置き場 (テスト・ローカル用)"""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, params):
+        job = new_job(params)
+        with self._lock:
+            self._jobs[job["id"]] = job
+        return job
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields, updatedAt=time.time())
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def claim_next(self):
+        with self._lock:
+            for job in sorted(self._jobs.values(), key=lambda j: j["createdAt"]):
+                if job["status"] == "queued":
+                    job.update(status="running", updatedAt=time.time())
+                    return dict(job)
+        return None
+
+
+class FileJobStore:
+    """1ジョブ1ファイル (JSON) のジョブ置き場。別プロセスのワーカーと共有できる"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, job_id):
+        return os.path.join(self.root, f"{job_id}.json")
+
+    def _write(self, job):
+        tmp = self._path(job["id"]) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp, self._path(job["id"]))
+
+    def create(self, params):
+        job = new_job(params)
+        self._write(job)
+        return job
+
+    def update(self, job_id, **fields):
+        job = self.get(job_id)
+        job.update(fields, updatedAt=time.time())
+        self._write(job)
+
+    def get(self, job_id):
+        try:
+            with open(self._path(job_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def claim_next(self):
+        queued = []
+        for name in os.listdir(self.root):
+            if name.endswith(".json"):
+                job = self.get(name[:-5])
+                if job and job["status"] == "queued":
+                    queued.append(job)
+        for job in sorted(queued, key=lambda j: j["createdAt"]):
+            # 同じジョブを2つのワーカーが取らないよう、ロックファイルを排他的に作る
+            try:
+                fd = os.open(self._path(job["id"]) + ".lock", os.O_CREAT | os.O_EXCL)
+            except FileExistsError:
+                continue
+            os.close(fd)
+            self.update(job["id"], status="running")
+            return self.get(job["id"])
+        return None
+
+
+class FirestoreJobStore:
+    """Firestore の generation_jobs コレクションに置くジョブ (サーバーレスの別インスタンスからも見える)"""
+
+    collection = "generation_jobs"
+
+    def __init__(self, db):
+        self.db = db
+
+    def create(self, params):
+        job = new_job(params)
+        self.db.collection(self.collection).document(job["id"]).set(job)
+        return job
+
+    def update(self, job_id, **fields):
+        fields["updatedAt"] = time.time()
+        self.db.collection(self.collection).document(job_id).update(fields)
+
+    def get(self, job_id):
+        doc = self.db.collection(self.collection).document(job_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    def claim_next(self):
+        from google.cloud import firestore
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        @firestore.transactional
+        def claim(transaction, doc_ref):
+            # 複数のワーカーが同じジョブを取らないよう、トランザクション内で queued を確認する
+            snap = doc_ref.get(transaction=transaction)
+            if not snap.exists or snap.to_dict()["status"] != "queued":
+                return None
+            transaction.update(doc_ref, {"status": "running", "updatedAt": time.time()})
+            return snap.to_dict()
+
+        query = (self.db.collection(self.collection)
+                 .where(filter=FieldFilter("status", "==", "queued"))
+                 .order_by("createdAt").limit(5))
+        for doc in query.stream():
+            job = claim(self.db.transaction(), doc.reference)
+            if job:
+                return job
+        return None
+
+
+def solver_options(params):
+    from .solver import SolverOptions
+
+    return SolverOptions(
+        time_limit=params.get("timeLimit"),
+        gap_rel=params.get("gap"),
+        threads=params.get("threads"),
+        backend=params.get("backend", "cbc"),
+        portfolio=params.get("portfolio"),
+    )
+
+
+def run_job(store, job, load, save, model_cache=None):
+    """ジョブを1件実行し、フェーズが変わるたびに store を更新する
+
+    load(params) -> (Snapshot, WarmStart または None) / save(snap, result) -> 書き込みの統計 (または None)
+    は呼び出し側で用意する
+    (Firestore を使うか、ローカルの置き換えを使うかはここでは決めない)
+    model_cache (model_cache.ModelCache) はジョブをまたいで使い回すモデルの骨組みの置き場
+    (engine (numpy・ソルバー) はここで読む。ジョブの登録・状態の問い合わせだけなら読まない)
+    """
+    from .diagnose import describe
+    from .engine import generate_schedule
+
+    job_id = job["id"]
+    params = job.get("params", {})
+    phases = {}
+
+    def phase(name):
+        store.update(job_id, phase=name, phaseAt=time.time())
+
+    store.update(job_id, status="running", startedAt=time.time())
+    started = time.perf_counter()
+    try:
+        # params.profile=True なら cProfile / tracemalloc の結果を result.profile に付ける
+        with profiled(params.get("profile", False), run_id=job_id) as profile:
+            phase("fetching")
+            t0 = time.perf_counter()
+            snap, warm = load(params)
+            phases["loadSec"] = round(time.perf_counter() - t0, 4)
+            t0 = time.perf_counter()
+            result = generate_schedule(snap, warm_start=warm, mode=params.get("mode", "monolithic"),
+                                       options=solver_options(params), on_phase=phase,
+                                       heuristic_start=params.get("heuristicStart", False),
+                                       tier_limits=params.get("tierLimits"), model_cache=model_cache)
+            phases["generateSec"] = round(time.perf_counter() - t0, 4)
+            write_stats = None
+            if result.ok:
+                phase("writing")
+                t0 = time.perf_counter()
+                write_stats = save(snap, result)
+                phases["writeSec"] = round(time.perf_counter() - t0, 4)
+        phases["totalSec"] = round(time.perf_counter() - started, 4)
+        summary = dict(result.summary(), phases=phases)
+        if profile:
+            summary["profile"] = profile
+        log_json("job", runId=job_id, status=result.status, phases=phases, model=summary.get("model"),
+                 profile=profile or None)
+        if not result.ok:
+            error = ("時間内に解が見つかりませんでした" if result.status == "Not Solved"
+                     else f"条件不成立: {describe(result.diagnosis) or '設定'} を見直してください")
+            store.update(job_id, status="failed", phase="done", finishedAt=time.time(),
+                         error=error, result=summary)
+            return
+        store.update(job_id, status="done", phase="done", finishedAt=time.time(), result=summary,
+                     write=write_stats)
+    except Exception as e:
+        log_json("error", runId=job_id, phases=phases, error=str(e), traceback=traceback.format_exc())
+        store.update(job_id, status="failed", phase="done", finishedAt=time.time(),
+                     error=str(e), traceback=traceback.format_exc())
+
+
+def firestore_callbacks(db, cache=None):
+    """run_job 用の load / save を Firestore で作る (cache: cache.SnapshotCache を通して読む)"""
+    from .firestore_io import load_previous_schedule, load_snapshot, save_schedule
+    from .warmstart import make_warm_start
+
+    def load(params):
+        year, month = int(params["year"]), int(params["month"])
+        snap = cache.load_snapshot(db, year, month) if cache else load_snapshot(db, year, month)
+        warm = None
+        if params.get("warmStart"):
+            prev_schedule, prev_digest = load_previous_schedule(db, snap)
+            if prev_schedule:
+                warm = make_warm_start(snap, prev_schedule, prev_digest,
+                                       fix_untouched=params.get("fixUntouched", True))
+        return snap, warm
+
+    def save(snap, result):
+        return save_schedule(db, snap, result.schedule, result.summary())
+
+    return load, save
+
+
+def start_in_background(store, job, load, save, model_cache=None):
+    """プロセス内のスレッドでジョブを動かす (ローカル・常駐サーバー用)"""
+    thread = threading.Thread(target=run_job, args=(store, job, load, save, model_cache), daemon=True)
+    thread.start()
+    return thread
+
+
+def work_forever(store, load, save, poll_sec=2.0, once=False, model_cache=None):
+    """キューからジョブを取り出して順に実行する (別プロセスのワーカー用)"""
+    while True:
+        job = store.claim_next()
+        if job:
+            run_job(store, job, load, save, model_cache)
+            continue
+        if once:
+            return
+        time.sleep(poll_sec)
@@ -0,0 +1,90 @@
+import time
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+
+from .model import OBJECTIVE_TIERS
+from .solver import SolveResult, SolverOptions, solve_cbc
+
+# 段の順番。hard は目的関数なし (絶対条件を満たす解を1つ見つけるだけ)
+TIERS = ["hard"] + OBJECTIVE_TIERS
+# options.time_limit を段ごとに配る割合 (前の段で余った時間は次の段に回す)
+TIER_TIME_SHARE = {"hard": 0.1, "requests": 0.2, "coverage": 0.3, "fairness": 0.2, "bias": 0.2}
+# 段の最適値を次の段の下限にするときの許容誤差 (相対)
+BOUND_TOL = 1e-6
+
+
+@dataclass
+class LexicographicStats:
+    tiers: list = field(default_factory=list)
+
+    def to_dict(self):
+        return {"tiers": self.tiers}
+
+
+def add_bound(model, c, lo, family="tier_bound"):
+    """c @ v >= lo の行を1本足したモデルを返す (前の段の最適値を保つ)"""
+    cols = np.nonzero(c)[0]
+    families = model.families if family in model.families else model.families + [family]
+    return replace(
+        model,
+        A_row=np.concatenate([model.A_row, np.full(len(cols), model.n_rows)]),
+        A_col=np.concatenate([model.A_col, cols]),
+        A_val=np.concatenate([model.A_val, c[cols]]),
+        row_lo=np.append(model.row_lo, lo),
+        row_hi=np.append(model.row_hi, np.inf),
+        row_family=np.append(model.row_family, np.int16(families.index(family))),
+        families=families,
+        stats={},
+    )
+
+
+def solve_lexicographic(model, tier_limits=None, mip_start=None, solve=solve_cbc, options=None):
+    """目的関数を段 (TIERS) に分け、優先度の高い段から順に解く
+
+    各段はその段の係数 (model.tier_c) だけを最大化し、得た値を下限の行にして次の段へ進む
+    (重みの桁が 1 から 5000 まで混ざった1本の目的関数より、段ごとの目的関数の方がソルバーに易しい)。
+    前の段の解を次の段の MIP start にするので、時間切れの段でもそれより悪くはならない。
+    tier_limits: {段: 秒} で段ごとの制限時間を指定する。無い段は options.time_limit を TIER_TIME_SHARE で配る。
+    係数が全部 0 の段 (希望休が1件も無い月など) は飛ばす。
+    戻り値の objective は元の (重み付きの) 目的関数の値なので、一括求解とそのまま比べられる。
+    """
+    options = options or SolverOptions()
+    tier_limits = tier_limits or {}
+    stats = LexicographicStats()
+    values = None if mip_start is None else np.asarray(mip_start, dtype=float)
+    current = model
+    all_optimal = True
+    deadline = time.perf_counter() + options.time_limit if options.time_limit else None
+
+    for i, tier in enumerate(TIERS):
+        c = model.tier_c.get(tier, np.zeros(model.n_vars)) if tier != "hard" else np.zeros(model.n_vars)
+        if tier != "hard" and not c.any():
+            stats.tiers.append({"tier": tier, "status": "Skipped"})
+            continue
+        limit = tier_limits.get(tier)
+        if limit is None and deadline is not None:
+            # まだ解いていない段の割合で残り時間を分ける
+            share = TIER_TIME_SHARE[tier] / sum(TIER_TIME_SHARE[t] for t in TIERS[i:])
+            limit = max(1.0, (deadline - time.perf_counter()) * share)
+        t0 = time.perf_counter()
+        solved = solve(replace(current, c=c), mip_start=values, options=replace(options, time_limit=limit))
+        entry = {"tier": tier, "status": solved.status, "sec": round(time.perf_counter() - t0, 4),
+                 "timeLimit": limit and round(limit, 2)}
+        if not solved.has_solution:
+            stats.tiers.append(entry)
+            if values is None:
+                return SolveResult(status=solved.status), stats
+            # 前の段の解で続ける (この段の下限は足さない)
+            all_optimal = False
+            continue
+        values = solved.values
+        all_optimal &= solved.status == "Optimal"
+        if tier != "hard":
+            value = float(c @ values)
+            entry.update(objective=value, gap=solved.gap)
+            current = add_bound(current, c, value - BOUND_TOL * max(1.0, abs(value)))
+        stats.tiers.append(entry)
+
+    return SolveResult(status="Optimal" if all_optimal else "Feasible", values=values,
+                       objective=float(model.c @ values)), stats
@@ -0,0 +1,516 @@
+import datetime
+import hashlib
+import json
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .ruleset import compile_ruleset, parse_hour
+
+SHIFT_TYPES = ["A", "B", "C", "M"]
+WORK_SHIFTS = ["A", "B", "C"]
+SHIFT_BIAS = {"A": 1.2, "B": 1.05, "C": 1.0}
+# 目的関数の段 (優先度の高い順)。c はこれらの和で、MatrixModel.tier_c に段ごとの係数を残す
+# requests: 社員の希望休 / coverage: 部門・スキル・土日の社員 / fairness: 連勤・遅番→早番 / bias: シフトの好み・パートナーの優先度
+OBJECTIVE_TIERS = ["requests", "coverage", "fairness", "bias"]
+A, B, C, M = range(4)
+
+# 希望の種別コード (request_arrays で (日, スタッフ) の配列に変換する)
+REQ_NONE, REQ_PAID, REQ_OFF, REQ_FREE, REQ_EARLY, REQ_MID, REQ_LATE, REQ_CUSTOM, REQ_OTHER = range(9)
+REQUEST_CODES = {
+    "有給": REQ_PAID,
+    "希望休": REQ_OFF,
+    "フリー": REQ_FREE,
+    "早番": REQ_EARLY,
+    "中番": REQ_MID,
+    "遅番": REQ_LATE,
+    "時間指定": REQ_CUSTOM,
+}
+
+def partner_hour_cap(sales, caps):
+    if sales <= caps["salesLow"]: return caps["hoursLow"]
+    if sales <= caps["salesHigh"]: return caps["hoursHigh"]
+    return 9999
+
+
+def request_arrays(snap):
+    """request_map を (日, スタッフ) の配列 (種別コード, 開始時刻, 終了時刻) に変換する"""
+    days, staff_ids = snap.days, snap.staff_ids
+    index = {s: i for i, s in enumerate(staff_ids)}
+    code = np.zeros((len(days), len(staff_ids)), dtype=np.int8)
+    start_h = np.full(code.shape, 99.0)
+    end_h = np.zeros(code.shape)
+    for di, d in enumerate(days):
+        for sid, req in snap.request_map[d].items():
+            si = index.get(sid)
+            if si is None: continue
+            r_type = req.get("type")
+            code[di, si] = REQUEST_CODES.get(r_type, REQ_OTHER if r_type else REQ_NONE)
+            if r_type == "時間指定":
+                start_h[di, si] = parse_hour(req.get("start", "00:00"))
+                end_h[di, si] = parse_hour(req.get("end", "00:00"))
+    return code, start_h, end_h
+
+
+def meeting_mask(snap):
+    index = {s: i for i, s in enumerate(snap.staff_ids)}
+    mask = np.zeros((len(snap.days), len(snap.staff_ids)), dtype=bool)
+    for di, d in enumerate(snap.days):
+        for sid in snap.meetings.get(d, []):
+            if sid in index:
+                mask[di, index[sid]] = True
+    return mask
+
+
+class _Columns:
+    def __init__(self):
+        self.lb, self.ub, self.is_int, self.obj, self.names = [], [], [], [], []
+        self.n = 0
+
+    def add(self, names, lb, ub, is_int, obj):
+        """obj: {目的の段: 係数} (係数は列数にブロードキャスト)"""
+        n = len(names)
+        self.names.extend(names)
+        self.lb.append(np.broadcast_to(np.asarray(lb, dtype=float), (n,)))
+        self.ub.append(np.broadcast_to(np.asarray(ub, dtype=float), (n,)))
+        self.is_int.append(np.broadcast_to(np.asarray(is_int, dtype=bool), (n,)))
+        self.obj.append({tier: np.broadcast_to(np.asarray(obj.get(tier, 0), dtype=float), (n,))
+                         for tier in OBJECTIVE_TIERS})
+        idx = np.arange(self.n, self.n + n)
+        self.n += n
+        return idx
+
+
+class _Rows:
+    def __init__(self, start=0):
+        """start: 最初の行の番号 (ModelTemplate の行の後ろに足すとき)"""
+        self.row, self.col, self.val, self.lo, self.hi = [], [], [], [], []
+        self.families = []
+        self.n = start
+
+    def add(self, cols, vals, lo, hi, family):
+        """cols: (行数, 幅) の列番号 (-1 は空き) / vals: 係数 (cols にブロードキャスト)"""
+        cols = np.asarray(cols)
+        if cols.ndim == 1:
+            cols = cols[:, None]
+        n = cols.shape[0]
+        if n == 0:
+            return
+        vals = np.broadcast_to(np.asarray(vals, dtype=float), cols.shape)
+        mask = (cols >= 0) & (vals != 0)
+        rows = np.broadcast_to(np.arange(self.n, self.n + n)[:, None], cols.shape)
+        self.row.append(rows[mask])
+        self.col.append(cols[mask])
+        self.val.append(vals[mask])
+        self.lo.append(np.broadcast_to(np.asarray(lo, dtype=float), (n,)))
+        self.hi.append(np.broadcast_to(np.asarray(hi, dtype=float), (n,)))
+        self.families.append((family, n))
+        self.n += n
+
+
+def _cat(parts, dtype):
+    return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+
+
+@dataclass
+class MatrixModel:
+    """疎行列 (COO) 形式のシフトモデル
+
+    最大化: c @ v  /  制約: row_lo <= A @ v <= row_hi  /  lb <= v <= ub
+    x_index[日, スタッフ, シフト] が x[d, s, st] の列番号
+    tier_c: 目的関数の段 (OBJECTIVE_TIERS) -> その段の係数 (c はこれらの和。段に分けて解くときに使う)
+    """
+
+    c: np.ndarray
+    lb: np.ndarray
+    ub: np.ndarray
+    is_int: np.ndarray
+    names: list
+    A_row: np.ndarray
+    A_col: np.ndarray
+    A_val: np.ndarray
+    row_lo: np.ndarray
+    row_hi: np.ndarray
+    row_family: np.ndarray
+    families: list
+    x_index: np.ndarray
+    days: list
+    staff_ids: list
+    stats: dict = field(default_factory=dict)
+    tier_c: dict = field(default_factory=dict)
+
+    @property
+    def n_vars(self):
+        return len(self.c)
+
+    @property
+    def n_rows(self):
+        return len(self.row_lo)
+
+    @property
+    def nnz(self):
+        return len(self.A_val)
+
+    def family_counts(self):
+        counts = np.bincount(self.row_family, minlength=len(self.families))
+        return {name: int(n) for name, n in zip(self.families, counts) if n}
+
+    def size_counters(self):
+        """モデルの大きさ (変数・制約・非ゼロ要素の数と、制約の種類ごとの行数・非ゼロ数)"""
+        rows = np.bincount(self.row_family, minlength=len(self.families))
+        nnz = np.bincount(self.row_family[self.A_row], minlength=len(self.families))
+        return {
+            "variables": self.n_vars,
+            "integers": int(self.is_int.sum()),
+            "constraints": self.n_rows,
+            "nonzeros": self.nnz,
+            "families": {name: {"rows": int(r), "nonzeros": int(z)}
+                         for name, r, z in zip(self.families, rows, nnz) if r},
+        }
+
+    def to_csr(self):
+        order = np.argsort(self.A_row, kind="stable")
+        indptr = np.zeros(self.n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.A_row, minlength=self.n_rows), out=indptr[1:])
+        return indptr, self.A_col[order], self.A_val[order]
+
+    def to_csc(self):
+        order = np.lexsort((self.A_row, self.A_col))
+        indptr = np.zeros(self.n_vars + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.A_col, minlength=self.n_vars), out=indptr[1:])
+        return indptr, self.A_row[order], self.A_val[order]
+
+    def x_values(self, values):
+        """解ベクトルから x[日, スタッフ, シフト] の 0/1 配列を取り出す"""
+        return np.asarray(values)[self.x_index] > 0.5
+
+    def to_pulp(self):
+        """同じ問題を PuLP の LpProblem として組み立てる (デバッグ用)"""
+        import pulp
+
+        problem = pulp.LpProblem("Shift_Scheduling", pulp.LpMaximize)
+        cols = []
+        for j, name in enumerate(self.names):
+            lb = None if np.isinf(self.lb[j]) else float(self.lb[j])
+            ub = None if np.isinf(self.ub[j]) else float(self.ub[j])
+            cat = pulp.LpBinary if self.is_int[j] and lb == 0 and ub == 1 else (
+                pulp.LpInteger if self.is_int[j] else pulp.LpContinuous)
+            cols.append(pulp.LpVariable(name, lb, ub, cat))
+
+        indptr, indices, data = self.to_csr()
+        for i in range(self.n_rows):
+            sl = slice(indptr[i], indptr[i + 1])
+            expr = pulp.LpAffineExpression([(cols[j], v) for j, v in zip(indices[sl], data[sl])])
+            lo, hi = self.row_lo[i], self.row_hi[i]
+            if lo == hi:
+                problem += expr == lo
+                continue
+            if not np.isinf(lo): problem += expr >= lo
+            if not np.isinf(hi): problem += expr <= hi
+
+        nz = np.nonzero(self.c)[0]
+        problem += pulp.LpAffineExpression([(cols[j], self.c[j]) for j in nz])
+        x = {
+            (d, s, st): cols[self.x_index[di, si, k]]
+            for di, d in enumerate(self.days)
+            for si, s in enumerate(self.staff_ids)
+            for k, st in enumerate(SHIFT_TYPES)
+        }
+        return problem, x
+
+
+def _count_cols(X, base, custom, hit, who=None):
+    """開け/締め/鍵のカウント行 (1日1行) の列番号: 通常は base のシフト、時間指定は条件を満たせば A/B/C"""
+    cols = np.full(X[:, :, :3].shape, -1)
+    normal = ~custom
+    if who is not None:
+        normal = normal & who[None, :]
+        hit = hit & who[None, :]
+    cols[..., 0] = np.where(normal, X[..., base], -1)
+    cols[hit] = X[..., :3][hit]
+    return cols.reshape(len(X), -1)
+
+
+def _family_codes(row_families, families):
+    """_Rows.families ([(名前, 行数)]) -> 行ごとの families の番号 (families に無い名前は足す)"""
+    for name, _ in row_families:
+        if name not in families:
+            families.append(name)
+    if not row_families:
+        return np.zeros(0, dtype=np.int16)
+    return np.concatenate([np.full(n, families.index(name), dtype=np.int16) for name, n in row_families])
+
+
+@dataclass
+class ModelTemplate:
+    """名簿・暦・ルール表だけで決まるモデルの骨組み (model_cache.ModelCache に入れて使い回す)
+
+    列 (x と補助変数) 全部と、希望・会議・売上に依らない行 (1日1シフト・リーダー・スキル・部門・シフト制限・
+    7連勤・上限日数・4連勤・遅番→早番) を持つ。x の目的関数の係数は毎回 build_model で足す。
+    rhs_rows: 右辺だけ月の設定で変わる行の範囲 ("max_days" / "skill:<スキル名>" -> [開始, 終了))
+    """
+
+    key: str
+    names: list
+    lb: np.ndarray
+    ub: np.ndarray
+    is_int: np.ndarray
+    tier_c: dict
+    x_index: np.ndarray
+    A_row: np.ndarray
+    A_col: np.ndarray
+    A_val: np.ndarray
+    row_lo: np.ndarray
+    row_hi: np.ndarray
+    row_family: np.ndarray
+    families: list
+    rhs_rows: dict
+
+    @property
+    def n_rows(self):
+        return len(self.row_lo)
+
+    def rows_of(self, name):
+        start, stop = self.rhs_rows[name]
+        return slice(start, stop)
+
+
+def template_key(snap):
+    """ModelTemplate のキー: 暦・スタッフ (役職・鍵・スキル)・部門・ルール表・不足を数えるスキルのハッシュ
+
+    希望・会議・売上・minStaffCounts・スキルの必要値・maxDays・priority は含めない (毎回 build_model で入れる)。
+    """
+    staffs = [[sid, d["rankId"], d.get("name", ""), bool(d.get("canOpen")), bool(d.get("canClose")),
+               d.get("skills", {})] for sid, d in ((s, snap.staffs[s]) for s in snap.staff_ids)]
+    skills = sorted(name for name, v in snap.min_skills.items() if v > 0)
+    depts = {name: sorted(members) for name, members in snap.groups.dept_groups.items()}
+    payload = [snap.year, snap.month, [str(d) for d in snap.days], staffs, depts, skills, snap.rules]
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def _build_template(snap, idx, key):
+    """ModelTemplate を組み立てる (build_model のうち、名簿・暦・ルール表だけで決まる部分)"""
+    staffs = snap.staffs
+    days, staff_ids = snap.days, snap.staff_ids
+    D, S, K = len(days), len(staff_ids), len(SHIFT_TYPES)
+    g = snap.groups
+
+    def staff_mask(members):
+        members = set(members)
+        return np.array([s in members for s in staff_ids], dtype=bool).reshape(S)
+
+    is_leader, is_employee = idx.is_leader, idx.is_employee
+    cols, rows = _Columns(), _Rows()
+    rhs_rows = {}
+
+    # --- x[d, s, st] (目的関数の係数は build_model で入れる) ---
+    x_names = [f"x_{d}_{s}_{st}" for d in days for s in staff_ids for st in SHIFT_TYPES]
+    X = cols.add(x_names, 0, 1, True, {}).reshape(D, S, K)
+
+    # --- 基本制約: 1日1シフト ---
+    rows.add(X.reshape(D * S, K), 1, -np.inf, 1, "one_shift")
+
+    # リーダー以上 minLeaders 名 (絶対)
+    if is_leader.any():
+        rows.add(X[:, is_leader, :3].reshape(D, -1), 1, idx.min_leaders, np.inf, "leaders")
+
+    # スキル (ソフト): 右辺 (必要値) は build_model で入れる
+    for skill_name, min_val in snap.min_skills.items():
+        if min_val > 0:
+            level = np.array([staffs[s].get("skills", {}).get(skill_name, 0) for s in staff_ids], dtype=float).reshape(S)
+            shortage = cols.add([f"shortage_{d}_{skill_name}" for d in days], 0, np.inf, False, {"coverage": -100})
+            rhs_rows[f"skill:{skill_name}"] = [rows.n, rows.n + D]
+            rows.add(np.concatenate([X[:, :, :3].reshape(D, -1), shortage[:, None]], axis=1),
+                     np.append(np.repeat(level, 3), 1.0), 0, np.inf, "skill")
+
+    # 部門の網羅性 (ソフト)
+    for dept_name, members in g.dept_groups.items():
+        if len(members) == 0: continue
+        missing = cols.add([f"missing_{d}_{dept_name}" for d in days], 0, 1, True, {"coverage": -2000})
+        rows.add(np.concatenate([X[:, staff_mask(members), :3].reshape(D, -1), missing[:, None]], axis=1),
+                 1, 1, np.inf, "dept")
+
+    # --- 個人制約 ---
+
+    # シフト制限 (ルール表の shiftLimits。店長・名前指定の早番固定など): 入れないシフトを 0 に固定
+    rows.add(X[:, :, :3][np.broadcast_to(~idx.allowed, (D, S, 3))], 1, 0, 0, "shift_limit")
+
+    # 全員共通: 7連勤禁止
+    if D > 6:
+        window = np.arange(D - 6)[:, None] + np.arange(7)
+        rows.add(X[window].transpose(2, 0, 1, 3).reshape(S * (D - 6), -1), 1, -np.inf, 6, "seven_day")
+
+    emp = is_employee
+    E = int(emp.sum())
+    emp_ids = [s for s, e in zip(staff_ids, emp) if e]
+
+    # 上限日数: 右辺 (maxDays - 有給) は build_model で入れる
+    rhs_rows["max_days"] = [rows.n, rows.n + E]
+    rows.add(X[:, emp, :].transpose(1, 0, 2).reshape(E, -1), 1, -np.inf, 0, "max_days")
+
+    # 連勤ペナルティ (4連勤以上)
+    if D > 3:
+        c4 = cols.add([f"c4_{s}_{days[i]}" for s in emp_ids for i in range(D - 3)], 0, 1, True, {"fairness": -500})
+        window = np.arange(D - 3)[:, None] + np.arange(4)
+        con = X[window][:, :, emp, :].transpose(2, 0, 1, 3).reshape(E * (D - 3), -1)
+        rows.add(np.concatenate([con, c4[:, None]], axis=1),
+                 np.append(np.ones(con.shape[1]), -1.0), -np.inf, 3, "four_in_row")
+
+    # 遅番 -> 早番 回避
+    if D > 1:
+        interval = cols.add([f"int_{s}_{days[i]}" for s in emp_ids for i in range(D - 1)], 0, 1, True, {"fairness": -200})
+        pair = np.stack([X[:-1, emp, C].T.ravel(), X[1:, emp, A].T.ravel(), interval], axis=1)
+        rows.add(pair, [1, 1, -1], -np.inf, 1, "late_early")
+
+    families = []
+    row_family = _family_codes(rows.families, families)
+    return ModelTemplate(
+        key=key,
+        names=cols.names,
+        lb=_cat(cols.lb, float),
+        ub=_cat(cols.ub, float),
+        is_int=_cat(cols.is_int, bool),
+        tier_c={tier: _cat([part[tier] for part in cols.obj], float) for tier in OBJECTIVE_TIERS},
+        x_index=X,
+        A_row=_cat(rows.row, np.int64),
+        A_col=_cat(rows.col, np.int64),
+        A_val=_cat(rows.val, float),
+        row_lo=_cat(rows.lo, float),
+        row_hi=_cat(rows.hi, float),
+        row_family=row_family,
+        families=families,
+        rhs_rows=rhs_rows,
+    )
+
+
+def build_model(snap, cache=None):
+    """Snapshot から疎行列形式のモデルを一括で組み立てる
+
+    cache (model_cache.ModelCache) を渡すと、名簿・暦・ルール表だけで決まる部分 (ModelTemplate) を使い回し、
+    目的関数の係数・右辺と、希望・会議・売上で形の変わる行だけを作り直す (使い回しても同じモデルになる)。
+    使い回したかどうかは model.stats["cache"] ("memory" / "disk" / "miss") に入る。
+    """
+    staffs = snap.staffs
+    days, staff_ids = snap.days, snap.staff_ids
+    D, S, K = len(days), len(staff_ids), len(SHIFT_TYPES)
+
+    code, start_h, end_h = request_arrays(snap)
+    meet = meeting_mask(snap)
+    custom = code == REQ_CUSTOM
+
+    # 役職・鍵・シフト制限・時刻の境界はルール表 (snap.rules) をまとめて配列にしたものを使う
+    idx = compile_ruleset(snap)
+    is_employee, is_partner, is_newcomer = idx.is_employee, idx.is_partner, idx.is_newcomer
+    can_open, can_close = idx.can_open, idx.can_close
+    open_hit, open_key_hit, close_hit = idx.windows(start_h, end_h)
+    # セルごとの勤務時間帯 (通常シフトはルール表の shiftTimes、時間指定は希望の時刻)
+    start, end = idx.cell_times(custom, start_h, end_h)
+    weekend = np.array([datetime.date(snap.year, snap.month, int(d)).weekday() >= 5 for d in days], dtype=bool)
+
+    template = source = None
+    if cache is not None:
+        key = template_key(snap)
+        template, source = cache.get(key)
+        if template is None:
+            template = _build_template(snap, idx, key)
+            cache.put(key, template)
+    else:
+        template = _build_template(snap, idx, None)
+    X = template.x_index
+
+    # --- 目的関数の係数 (段ごと): x の分を骨組みの補助変数の係数に足す ---
+    obj = {tier: np.zeros((D, S, K)) for tier in OBJECTIVE_TIERS}
+    for k, st in enumerate(WORK_SHIFTS):
+        obj["bias"][:, :, k] += SHIFT_BIAS[st]
+    obj["coverage"][np.ix_(weekend, is_employee, [A, B, C])] += 1000
+    # 社員の希望休 (ソフト)
+    obj["requests"][(code == REQ_OFF) & ~meet & is_employee[None, :]] += -5000
+    # パートナーの優先度
+    prio = np.array([str(staffs[s].get("priority", "2")) for s in staff_ids]).reshape(S)
+    weight = np.where(prio == "1", 100, np.where(prio == "2", 50, 10))
+    pn_active = ~meet & ~np.isin(code, [REQ_NONE, REQ_PAID, REQ_OFF])
+    obj["bias"][..., :3] += np.where(pn_active & is_partner[None, :], weight[None, :], 0)[..., None]
+    tier_c = {tier: template.tier_c[tier].copy() for tier in OBJECTIVE_TIERS}
+    for tier in OBJECTIVE_TIERS:
+        tier_c[tier][X.ravel()] = obj[tier].ravel()
+
+    # --- 右辺: スキルの必要値 / 上限日数 (有給分を差し引く) ---
+    row_lo, row_hi = template.row_lo.copy(), template.row_hi.copy()
+    for skill_name, min_val in snap.min_skills.items():
+        if min_val > 0:
+            row_lo[template.rows_of(f"skill:{skill_name}")] = min_val
+    emp = is_employee
+    emp_ids = [s for s, e in zip(staff_ids, emp) if e]
+    max_days = np.array([staffs[s].get("maxDays", 22) for s in emp_ids], dtype=float).reshape(len(emp_ids))
+    paid = (code[:, emp] == REQ_PAID).sum(axis=0)
+    row_hi[template.rows_of("max_days")] = max_days - paid
+
+    # --- 希望・会議・売上で形の変わる行 (骨組みの後ろに足す) ---
+    rows = _Rows(start=template.n_rows)
+
+    # 会議
+    rows.add(X[meet][:, M], 1, 1, 1, "meeting")
+    rows.add(X[meet][:, :3], 1, 0, 0, "meeting")
+    rows.add(X[~meet][:, M], 1, 0, 0, "meeting")
+
+    # --- 人数・鍵カウント ---
+    min_counts = snap.min_staff_counts
+    rows.add(_count_cols(X, A, custom, custom & open_hit),
+             1, min_counts.get("open", 3), np.inf, "open_staff")
+    rows.add(_count_cols(X, C, custom, custom & close_hit),
+             1, min_counts.get("close", 3), np.inf, "close_staff")
+    rows.add(_count_cols(X, A, custom, custom & open_key_hit, can_open),
+             1, 1, np.inf, "open_key")
+    rows.add(_count_cols(X, C, custom, custom & close_hit, can_close),
+             1, 1, np.inf, "close_key")
+
+    # パートナー労働時間キャップ (実際の勤務時間の合計)
+    caps = np.array([partner_hour_cap(int(snap.daily_sales.get(d, 0)), snap.caps) for d in days], dtype=float)
+    rows.add(X[:, is_partner, :3].reshape(D, -1), (end - start)[:, is_partner, :].reshape(D, -1),
+             -np.inf, caps, "partner_hours")
+
+    # 時間帯ごとの最低人数 (ルール表の slotCoverage がある枠だけ、1日1枠1行)
+    T = len(idx.coverage_slots)
+    if T:
+        cover = np.where(idx.slot_cover(start, end), X[:, :, :3, None], -1)
+        rows.add(cover.transpose(0, 3, 1, 2).reshape(D * T, -1), 1, np.tile(idx.coverage_mins, D), np.inf,
+                 "slot_coverage")
+
+    # 希望処理 (社員): 有給は休み
+    rows.add(X[(code == REQ_PAID) & ~meet & emp[None, :]], 1, 0, 0, "request")
+
+    # 希望処理 (パートナー・新規パートナー)
+    pn = (is_partner | is_newcomer)[None, :] & ~meet
+    rows.add(X[pn & np.isin(code, [REQ_NONE, REQ_PAID, REQ_OFF])], 1, 0, 0, "request")
+    active = pn & pn_active
+    rows.add(X[active & is_newcomer[None, :]][:, :3], 1, 1, 1, "request")
+    rows.add(X[active & (code == REQ_EARLY)][:, A], 1, 1, 1, "request")
+    rows.add(X[active & (code == REQ_MID)][:, B], 1, 1, 1, "request")
+    rows.add(X[active & (code == REQ_LATE)][:, C], 1, 1, 1, "request")
+    rows.add(X[active & custom][:, :3], 1, 1, 1, "request")
+
+    families = list(template.families)
+    row_family = np.concatenate([template.row_family, _family_codes(rows.families, families)])
+
+    model = MatrixModel(
+        c=sum(tier_c.values()),
+        lb=template.lb.copy(),
+        ub=template.ub.copy(),
+        is_int=template.is_int.copy(),
+        names=list(template.names),
+        A_row=np.concatenate([template.A_row, _cat(rows.row, np.int64)]),
+        A_col=np.concatenate([template.A_col, _cat(rows.col, np.int64)]),
+        A_val=np.concatenate([template.A_val, _cat(rows.val, float)]),
+        row_lo=np.concatenate([row_lo, _cat(rows.lo, float)]),
+        row_hi=np.concatenate([row_hi, _cat(rows.hi, float)]),
+        row_family=row_family,
+        families=families,
+        x_index=X.copy(),
+        days=days,
+        staff_ids=staff_ids,
+        tier_c=tier_c,
+    )
+    if cache is not None:
+        model.stats["cache"] = source or "miss"
+    return model
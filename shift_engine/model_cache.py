@@ -0,0 +1,150 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .model import OBJECTIVE_TIERS, ModelTemplate
+
+MODEL_CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.environ.get("SHIFT_MODEL_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "shift_models")
+# ModelTemplate の配列のフィールド (.npz にそのまま入れる)
+ARRAY_FIELDS = ["lb", "ub", "is_int", "x_index", "A_row", "A_col", "A_val", "row_lo", "row_hi", "row_family"]
+# 行・列の番号はファイルでは int32 にする (読んだら int64 に戻す)
+INDEX_FIELDS = ["x_index", "A_row", "A_col"]
+
+
+def save_template(path, template):
+    """ModelTemplate を .npz に書き出す (書きかけのファイルを読まないよう、別名で書いてから置き換える)"""
+    meta = {"version": MODEL_CACHE_VERSION, "key": template.key, "families": template.families,
+            "rhsRows": template.rhs_rows}
+    arrays = {name: getattr(template, name) for name in ARRAY_FIELDS}
+    arrays.update({name: arrays[name].astype(np.int32) for name in INDEX_FIELDS})
+    arrays.update({f"c_{tier}": template.tier_c[tier] for tier in OBJECTIVE_TIERS})
+    # 列名は改行でつないだ UTF-8 (numpy の文字列配列は1文字4バイトで大きい)
+    names = np.frombuffer("\n".join(template.names).encode(), dtype=np.uint8)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, names=names, meta=np.array(json.dumps(meta, ensure_ascii=False)), **arrays)
+    os.replace(tmp, path)
+
+
+def load_template(path):
+    """save_template で書いた .npz を読む (形式の版が違えば None)"""
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.get("version") != MODEL_CACHE_VERSION:
+            return None
+        arrays = {name: data[name] for name in ARRAY_FIELDS}
+        arrays.update({name: arrays[name].astype(np.int64) for name in INDEX_FIELDS})
+        names = data["names"].tobytes().decode()
+        return ModelTemplate(
+            key=meta["key"],
+            names=names.split("\n") if names else [],
+            tier_c={tier: data[f"c_{tier}"] for tier in OBJECTIVE_TIERS},
+            families=meta["families"],
+            rhs_rows=meta["rhsRows"],
+            **arrays,
+        )
+
+
+class ModelCache:
+    """model.ModelTemplate (名簿・暦・ルール表だけで決まるモデルの骨組み) の置き場
+
+    同じ店舗・月の出し直しでは build_model が骨組みを使い回し、目的関数・右辺と希望で形の変わる行だけを作る。
+    温かいインスタンスではメモリから (max_entries 件の LRU)、無ければディスク (root に 1件1ファイルの .npz、
+    合計 max_bytes を超えたら最後に使ったのが古いものから消す) から読む。disk=False ならメモリだけ。
+    ソルバーに渡すのは presolve で縮めたモデル (毎回形が変わる) なので、ディスクには MPS ではなく配列のまま置く。
+    api/jobs.py のようにスレッドから同時に使ってもよい。
+    """
+
+    def __init__(self, root=None, max_entries=8, max_bytes=200 * 1024 * 1024, disk=True):
+        self.root = (root or DEFAULT_CACHE_DIR) if disk else None
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "diskHits": 0, "misses": 0, "evictions": 0, "diskEvictions": 0, "loadSec": 0.0}
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.npz")
+
+    def get(self, key):
+        """(ModelTemplate, "memory" / "disk") / 無ければ (None, None)"""
+        with self._lock:
+            template = self._entries.get(key)
+            if template is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return template, "memory"
+        if self.root is not None and os.path.exists(self._path(key)):
+            # ファイルの読み込みはロックの外で (その間も他のスレッドはメモリの分を使える)
+            t0 = time.perf_counter()
+            try:
+                template = load_template(self._path(key))
+            except (OSError, ValueError, KeyError):
+                template = None
+            if template is not None:
+                try:
+                    os.utime(self._path(key))
+                except OSError:
+                    pass
+                with self._lock:
+                    self.stats["loadSec"] = round(self.stats["loadSec"] + time.perf_counter() - t0, 4)
+                    self.stats["diskHits"] += 1
+                    self._remember(key, template)
+                return template, "disk"
+        with self._lock:
+            self.stats["misses"] += 1
+        return None, None
+
+    def put(self, key, template):
+        with self._lock:
+            self._remember(key, template)
+        if self.root is None:
+            return
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            save_template(self._path(key), template)
+            evicted = self._evict_files()
+        except OSError:
+            # /tmp に書けなくてもメモリの分は使える
+            return
+        with self._lock:
+            self.stats["diskEvictions"] += evicted
+
+    def _remember(self, key, template):
+        # self._lock を持って呼ぶ
+        self._entries[key] = template
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _evict_files(self):
+        paths = [os.path.join(self.root, name) for name in os.listdir(self.root) if name.endswith(".npz")]
+        sizes = {path: os.path.getsize(path) for path in paths}
+        total = sum(sizes.values())
+        removed = 0
+        # 最後に書いたファイル (今入れた分) は残す
+        for path in sorted(paths, key=os.path.getmtime)[:-1]:
+            if total <= self.max_bytes:
+                break
+            total -= sizes[path]
+            os.remove(path)
+            removed += 1
+        return removed
+
+    def clear(self):
+        """メモリの分を捨てる (ディスクのファイルは残す)"""
+        with self._lock:
+            self._entries.clear()
+
+    def to_dict(self):
+        with self._lock:
+            stats, entries = dict(self.stats), len(self._entries)
+        lookups = stats["hits"] + stats["diskHits"] + stats["misses"]
+        hit_rate = (stats["hits"] + stats["diskHits"]) / lookups if lookups else None
+        return dict(stats, entries=entries, hitRate=hit_rate)
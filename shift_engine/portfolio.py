@@ -0,0 +1,242 @@
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict, dataclass, replace
+
+from .profiling import log_json
+from .solver import (
+    SOLUTION_STATUSES, SolveResult, SolverOptions, cbc_path, empty_rows_infeasible, parse_cbc_log, read_solution,
+    relative_gap, with_presolve, write_mip_start, write_mps,
+)
+
+# 終わった構成を見に行く間隔 (秒)
+POLL_SEC = 0.05
+# 制限時間を過ぎても止まらない構成を待つ時間 (秒)。これを過ぎたら止めて、それまでの一番良い解を使う
+KILL_GRACE_SEC = 5.0
+# この状態で終わった構成が出たら、残りを待たずに止める (最適 / 解なしを証明した)
+PROVEN_STATUSES = ("Optimal", "Infeasible")
+
+
+@dataclass
+class PortfolioConfig:
+    """ポートフォリオの1構成
+
+    backend="cbc" は同じ MPS を別々の CBC プロセスで解く (seed: 分枝の乱数の種 / cuts: CBC の -cuts
+    (off / root / ifmove / on / forceOn) / heuristics: -heuristics on/off)。
+    "highs" / "cpsat" は別プロセスで backends の関数を呼ぶ (止めるときはプロセスごと止める)。
+    """
+
+    name: str
+    backend: str = "cbc"
+    seed: int = None
+    threads: int = 1
+    cuts: str = None
+    heuristics: bool = None
+
+    def cbc_args(self):
+        args = []
+        if self.seed is not None:
+            args += ["-randomCbcSeed", str(self.seed), "-randomSeed", str(self.seed)]
+        if self.cuts:
+            args += ["-cuts", self.cuts]
+        if self.heuristics is not None:
+            args += ["-heuristics", "on" if self.heuristics else "off"]
+        return args
+
+    def to_dict(self):
+        return {k: v for k, v in asdict(self).items() if v is not None}
+
+
+PORTFOLIO_CONFIGS = {config.name: config for config in [
+    PortfolioConfig("default"),
+    PortfolioConfig("seed1", seed=1),
+    PortfolioConfig("seed2_root_cuts", seed=2, cuts="root"),
+    PortfolioConfig("seed3_no_cuts", seed=3, cuts="off", heuristics=True),
+    PortfolioConfig("seed4_force_cuts", seed=4, cuts="forceOn"),
+    PortfolioConfig("threads4", threads=4),
+    PortfolioConfig("highs", backend="highs"),
+    PortfolioConfig("cpsat", backend="cpsat", threads=4),
+]}
+# options.portfolio を指定しないときの構成 (コア数までに減らす)
+DEFAULT_PORTFOLIO = ["default", "seed1", "seed2_root_cuts", "seed3_no_cuts"]
+
+
+def resolve_configs(names=None):
+    """構成の名前 (または PortfolioConfig の dict) の list -> PortfolioConfig の list"""
+    if names is None:
+        names = DEFAULT_PORTFOLIO[:max(2, os.cpu_count() or 1)]
+    configs = []
+    for item in names:
+        if isinstance(item, dict):
+            configs.append(PortfolioConfig(**item))
+        elif item in PORTFOLIO_CONFIGS:
+            configs.append(PORTFOLIO_CONFIGS[item])
+        else:
+            raise ValueError(f"unknown portfolio config: {item}")
+    return configs
+
+
+class _CbcRacer:
+    """CBC の子プロセス1つ (ログと解はそれぞれのファイルに書かせる)"""
+
+    def __init__(self, config, args, tmp):
+        self.config = config
+        self.sol_path = os.path.join(tmp, f"{config.name}.sol")
+        self.log_path = os.path.join(tmp, f"{config.name}.log")
+        with open(self.log_path, "w") as log:
+            self.proc = subprocess.Popen(args + ["-solve", "-solution", self.sol_path], stdout=log,
+                                         stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+
+    def done(self):
+        return self.proc.poll() is not None
+
+    def result(self, model, options, sec):
+        if self.proc.returncode != 0 or not os.path.exists(self.sol_path):
+            return SolveResult(status="Not Solved")
+        status, values, _ = read_solution(self.sol_path, model.n_vars)
+        if status == "Infeasible" and options.time_limit and sec >= options.time_limit * 0.95:
+            # solve_cbc と同じ: 前処理の途中で時間切れになったときの「実行不可能」は信用しない
+            status = "Not Solved"
+        if status not in SOLUTION_STATUSES:
+            return SolveResult(status=status)
+        with open(self.log_path) as f:
+            log = parse_cbc_log(f.read())
+        objective = float(model.c @ values)
+        bound = -log["bound"] if "bound" in log else (objective if status == "Optimal" else None)
+        return SolveResult(status=status, values=values, objective=objective, bound=bound,
+                           gap=relative_gap(objective, bound))
+
+    def kill(self):
+        self.proc.kill()
+        self.proc.wait()
+
+
+def _run_backend(conn, backend, model, mip_start, options):
+    from .backends import BACKENDS
+
+    try:
+        conn.send(BACKENDS[backend](model, mip_start=mip_start, options=options))
+    except Exception as e:
+        # highspy / ortools が入っていないなど: この構成だけ負けにする
+        log_json("error", backend=backend, error=f"{type(e).__name__}: {e}")
+        conn.send(SolveResult(status="Error"))
+    conn.close()
+
+
+class _ProcessRacer:
+    """HiGHS / CP-SAT を別プロセスで動かす (結果はパイプで受け取る)"""
+
+    def __init__(self, config, model, mip_start, options):
+        self.config = config
+        ctx = multiprocessing.get_context("spawn")
+        self.conn, child = ctx.Pipe(duplex=False)
+        options = replace(options, backend=config.backend, threads=config.threads, presolve=False)
+        self.proc = ctx.Process(target=_run_backend, args=(child, config.backend, model, mip_start, options),
+                                daemon=True)
+        self.proc.start()
+        child.close()
+        self.solved = None
+
+    def done(self):
+        if self.solved is None and self.conn.poll():
+            try:
+                self.solved = self.conn.recv()
+            except EOFError:
+                self.solved = SolveResult(status="Not Solved")
+        return self.solved is not None or not self.proc.is_alive()
+
+    def result(self, model, options, sec):
+        return self.solved or SolveResult(status="Not Solved")
+
+    def kill(self):
+        self.proc.terminate()
+        self.proc.join()
+
+
+@with_presolve
+def solve_portfolio(model, msg=False, mip_start=None, options=None):
+    """いくつかの構成 (乱数の種・スレッド数・カット・バックエンド違い) で同じモデルを同時に解く
+
+    どれかが最適 (または解なし) と証明した時点でそれを使い、残りは止める。全部が制限時間で止まったら、一番良い解を使う
+    (上界は各構成の上界のうち一番きついもの)。構成は options.portfolio (既定は DEFAULT_PORTFOLIO)。
+    どの構成が勝ったかは portfolio に入れ、店舗の大きさと一緒に1行の JSON ログ (portfolio) にも書く
+    (racers の objective は presolve で縮めたモデルでの値。構成どうしの比較用)。
+    """
+    options = options or SolverOptions()
+    configs = resolve_configs(options.portfolio)
+    if empty_rows_infeasible(model):
+        return SolveResult(status="Infeasible")
+
+    timings = {}
+    racers, results = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        mps_path = os.path.join(tmp, "model.mps")
+        write_mps(model, mps_path)
+        base = [cbc_path(), mps_path]
+        if mip_start is not None:
+            mst_path = os.path.join(tmp, "model.mst")
+            write_mip_start(mst_path, mip_start)
+            base += ["-mips", mst_path]
+        timings["writeSec"] = round(time.perf_counter() - t0, 4)
+
+        started = time.perf_counter()
+        for config in configs:
+            if config.backend == "cbc":
+                args = base + replace(options, threads=config.threads).cbc_args() + config.cbc_args()
+                racers[config.name] = _CbcRacer(config, args, tmp)
+            else:
+                racers[config.name] = _ProcessRacer(config, model, mip_start, options)
+        deadline = started + options.time_limit + KILL_GRACE_SEC if options.time_limit else None
+
+        winner = None
+        while racers and winner is None:
+            for name, racer in list(racers.items()):
+                if not racer.done():
+                    continue
+                sec = time.perf_counter() - started
+                results[name] = (racer.result(model, options, sec), round(sec, 4), False)
+                del racers[name]
+                if results[name][0].status in PROVEN_STATUSES:
+                    winner = name
+                    break
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            if racers and winner is None:
+                time.sleep(POLL_SEC)
+        for name, racer in racers.items():
+            racer.kill()
+            results[name] = (SolveResult(status="Not Solved"), round(time.perf_counter() - started, 4), True)
+        timings["portfolioSec"] = round(time.perf_counter() - started, 4)
+
+    reason = "proven"
+    if winner is None:
+        solved = [name for name, (r, _, _) in results.items() if r.has_solution]
+        winner = max(solved, key=lambda name: results[name][0].objective) if solved else None
+        reason = "best_incumbent" if winner else "none"
+    stats = {
+        "winner": winner,
+        "reason": reason,
+        "racers": [dict(config.to_dict(), status=results[config.name][0].status,
+                        objective=results[config.name][0].objective, sec=results[config.name][1],
+                        killed=results[config.name][2]) for config in configs],
+    }
+    log_json("portfolio", winner=winner, reason=reason, days=int(model.x_index.shape[0]),
+             staff=int(model.x_index.shape[1]), variables=model.n_vars, constraints=model.n_rows,
+             timeLimit=options.time_limit, racers=stats["racers"])
+    if msg:
+        print(f"portfolio: {winner} ({reason})")
+
+    if winner is None or not results[winner][0].has_solution:
+        status = results[winner][0].status if winner else "Not Solved"
+        return SolveResult(status=status, timings=timings, portfolio=stats)
+    best = results[winner][0]
+    bounds = [r.bound for r, _, _ in results.values() if r.bound is not None]
+    bound = min(bounds) if bounds else None
+    if best.status == "Optimal":
+        bound = best.objective
+    timings["winnerSec"] = results[winner][1]
+    return SolveResult(status=best.status, values=best.values, objective=best.objective, bound=bound,
+                       gap=relative_gap(best.objective, bound), timings=timings, portfolio=stats)
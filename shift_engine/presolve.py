@@ -0,0 +1,153 @@
+import time
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+
+TOL = 1e-9
+
+
+def _activity_bounds(model, lb, ub):
+    """各行の A v が取りうる最小値・最大値 (無限大を含む列があれば ±inf)"""
+    a = model.A_val
+    lo_c, up_c = lb[model.A_col], ub[model.A_col]
+    with np.errstate(invalid="ignore"):
+        cmin = np.where(a > 0, a * lo_c, a * up_c)
+        cmax = np.where(a > 0, a * up_c, a * lo_c)
+
+    def total(contrib, inf_value):
+        inf = np.isinf(contrib)
+        n_inf = np.bincount(model.A_row[inf], minlength=model.n_rows)
+        finite = np.bincount(model.A_row[~inf], weights=contrib[~inf], minlength=model.n_rows)
+        return np.where(n_inf > 0, inf_value, finite)
+
+    return total(cmin, -np.inf), total(cmax, np.inf)
+
+
+def _tighten(model, lb, ub):
+    """0/1 変数について、0 (または 1) にすると行を満たせないものを固定する
+
+    例: 会議の日の x[M] == 1、有給の x == 0、1日1シフトで1つが 1 なら残りは 0
+    """
+    min_act, max_act = _activity_bounds(model, lb, ub)
+    row, col, a = model.A_row, model.A_col, model.A_val
+    binary = model.is_int[col] & (lb[col] == 0) & (ub[col] == 1)
+    hi, lo = model.row_hi[row], model.row_lo[row]
+
+    # 上限側: 最小の活動量でもこの変数を反対側に動かすと hi を超える
+    over = binary & np.isfinite(min_act[row]) & np.isfinite(hi) & (min_act[row] + np.abs(a) > hi + TOL)
+    # 下限側: 最大の活動量からこの変数を反対側に動かすと lo を下回る
+    under = binary & np.isfinite(max_act[row]) & np.isfinite(lo) & (max_act[row] - np.abs(a) < lo - TOL)
+
+    to_zero = col[(over & (a > 0)) | (under & (a < 0))]
+    to_one = col[(over & (a < 0)) | (under & (a > 0))]
+    lb, ub = lb.copy(), ub.copy()
+    ub[to_zero] = 0
+    lb[to_one] = 1
+    return lb, ub, len(to_zero) + len(to_one) > 0
+
+
+@dataclass
+class Presolved:
+    """presolve() の結果: 縮小したモデルと、元の列への戻し方"""
+
+    model: object
+    cols: np.ndarray
+    fixed_values: np.ndarray
+    offset: float = 0.0
+    infeasible: bool = False
+    stats: dict = field(default_factory=dict)
+
+    def expand(self, values):
+        """縮小モデルの解を元のモデルの解ベクトルに戻す"""
+        full = self.fixed_values.copy()
+        full[self.cols] = values
+        return full
+
+
+def presolve(model, max_rounds=10):
+    """値が決まっている変数を定数に置き換え、意味のなくなった行を落とした縮小モデルを作る
+
+    ビルダーは「会議でない人の x[M] == 0」「有給・希望休のパートナーは休み」「早番希望は A == 1」などを
+    1変数の等式行として出すので、それを変数の上下限に移し、1日1シフト等の行を通して伝播させる。
+    固定した列の寄与は行の上下限に繰り入れ (rolling.restrict と同じ)、
+    どう値を取っても必ず満たされる行は落とす。
+    """
+    t0 = time.perf_counter()
+    lb, ub = model.lb.copy(), model.ub.copy()
+    rounds = 0
+    for rounds in range(1, max_rounds + 1):
+        lb, ub, changed = _tighten(model, lb, ub)
+        if not changed or np.any(lb > ub + TOL):
+            break
+
+    min_act, max_act = _activity_bounds(model, lb, ub)
+    infeasible = bool(np.any(lb > ub + TOL) or np.any(max_act < model.row_lo - TOL)
+                      or np.any(min_act > model.row_hi + TOL))
+
+    fixed = lb == ub
+    fixed_values = np.where(fixed, lb, 0.0)
+    redundant = (min_act >= model.row_lo - TOL) & (max_act <= model.row_hi + TOL)
+    # 残した変数を1つも含まない行は、固定値で満たされるか (上で判定済み) だけなので落とす
+    has_free = np.zeros(model.n_rows, dtype=bool)
+    has_free[model.A_row[~fixed[model.A_col]]] = True
+    keep_row = has_free & ~redundant
+
+    # 残った行のどれにも出てこない変数は、目的関数が良くなる側の上下限に置けばよい
+    in_row = np.zeros(model.n_vars, dtype=bool)
+    in_row[model.A_col[keep_row[model.A_row]]] = True
+    best = np.where(model.c > 0, ub, lb)
+    orphan = ~fixed & ~in_row & np.isfinite(best)
+    fixed_values[orphan] = best[orphan]
+    fixed |= orphan
+
+    fixed_entry = fixed[model.A_col]
+    fixed_activity = np.bincount(model.A_row[fixed_entry],
+                                 weights=model.A_val[fixed_entry] * fixed_values[model.A_col[fixed_entry]],
+                                 minlength=model.n_rows)
+
+    rows = np.nonzero(keep_row)[0]
+    cols = np.nonzero(~fixed)[0]
+    row_map = np.full(model.n_rows, -1)
+    row_map[rows] = np.arange(len(rows))
+    col_map = np.full(model.n_vars, -1)
+    col_map[cols] = np.arange(len(cols))
+    entry = keep_row[model.A_row] & ~fixed_entry
+
+    reduced = replace(
+        model,
+        c=model.c[cols],
+        lb=lb[cols],
+        ub=ub[cols],
+        is_int=model.is_int[cols],
+        names=[model.names[j] for j in cols],
+        A_row=row_map[model.A_row[entry]],
+        A_col=col_map[model.A_col[entry]],
+        A_val=model.A_val[entry],
+        row_lo=model.row_lo[rows] - fixed_activity[rows],
+        row_hi=model.row_hi[rows] - fixed_activity[rows],
+        row_family=model.row_family[rows],
+        x_index=col_map[model.x_index],
+        stats={},
+        tier_c={tier: v[cols] for tier, v in model.tier_c.items()},
+    )
+
+    dropped = np.bincount(model.row_family[~keep_row], minlength=len(model.families))
+    x_fixed = fixed[model.x_index]
+    x_vals = fixed_values[model.x_index]
+    stats = {
+        "variables": model.n_vars,
+        "variablesKept": len(cols),
+        "fixedZero": int(np.count_nonzero(x_fixed & (x_vals == 0))),
+        "fixedOne": int(np.count_nonzero(x_fixed & (x_vals == 1))),
+        "fixedAux": int(np.count_nonzero(fixed)) - int(np.count_nonzero(x_fixed)),
+        "orphans": int(np.count_nonzero(orphan)),
+        "rows": model.n_rows,
+        "rowsKept": len(rows),
+        "rowsDropped": {name: int(n) for name, n in zip(model.families, dropped) if n},
+        "nonzeros": model.nnz,
+        "nonzerosKept": reduced.nnz,
+        "rounds": rounds,
+        "sec": round(time.perf_counter() - t0, 4),
+    }
+    return Presolved(model=reduced, cols=cols, fixed_values=fixed_values,
+                     offset=float(model.c @ fixed_values), infeasible=infeasible, stats=stats)
@@ -0,0 +1,71 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+# cProfile の生データ (.prof) の置き場所 (Vercel でも書ける /tmp)
+PROFILE_DIR = os.path.join(tempfile.gettempdir(), "shift-profiles")
+
+
+def new_run_id():
+    return uuid.uuid4().hex[:12]
+
+
+def log_json(event, **fields):
+    """1行の JSON ログを標準出力に書く (Vercel のログにそのまま残る)"""
+    record = {"event": event, "ts": round(time.time(), 3), **fields}
+    print(json.dumps(record, ensure_ascii=False, default=str), file=sys.stdout, flush=True)
+
+
+def _function_stats(profile, top):
+    """累積時間の長い順に top 件: {function, calls, totalSec, cumSec}"""
+    stats = pstats.Stats(profile).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+    return [{
+        "function": f"{os.path.basename(filename)}:{line}({name})",
+        "calls": nc,
+        "totalSec": round(tt, 4),
+        "cumSec": round(ct, 4),
+    } for (filename, line, name), (cc, nc, tt, ct, callers) in rows]
+
+
+@contextmanager
+def profiled(enabled, run_id=None, top=20, dump_dir=PROFILE_DIR):
+    """enabled のときだけ cProfile と tracemalloc をかける
+
+    with の中で受け取った dict に、抜けたときに結果が入る:
+    functions (累積時間の上位) / memory (ピーク MB と確保の多い行) / dump (.prof のパス、pstats で開ける)。
+    CBC は別プロセスなので、その時間は solver.py の subprocess 待ちとして出る。
+    """
+    report = {}
+    if not enabled:
+        yield report
+        return
+    profile = cProfile.Profile()
+    tracemalloc.start()
+    profile.enable()
+    try:
+        yield report
+    finally:
+        profile.disable()
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        report["functions"] = _function_stats(profile, top)
+        report["memory"] = {
+            "peakMB": round(peak / 2 ** 20, 2),
+            "top": [{"where": f"{os.path.basename(st.traceback[0].filename)}:{st.traceback[0].lineno}",
+                     "kb": round(st.size / 1024, 1), "count": st.count}
+                    for st in snapshot.statistics("lineno")[:10]],
+        }
+        if dump_dir:
+            os.makedirs(dump_dir, exist_ok=True)
+            path = os.path.join(dump_dir, f"{run_id or new_run_id()}.prof")
+            profile.dump_stats(path)
+            report["dump"] = path
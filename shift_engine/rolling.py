@@ -0,0 +1,142 @@
+import time
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+
+from .model import MatrixModel
+from .solver import SolveResult, SolverOptions, solve_cbc
+
+
+@dataclass
+class SubModel:
+    """restrict() で切り出した部分問題と、元のモデルの列番号との対応"""
+
+    model: MatrixModel
+    cols: np.ndarray
+    rows: np.ndarray
+
+
+def restrict(model, free_days, values, budget_days=None):
+    """free_days の x だけを変数として残し、それ以外は values の値で固定した部分問題を作る
+
+    固定した列の寄与は行の上下限に繰り入れる (前の週までの連勤数・使った日数がここで引き継がれる)。
+    自由な x を1つも含まない行は落とし、補助変数は残った行に出てくるものだけ自由にする。
+    budget_days を渡すと、上限日数 (max_days) の残りを「残り日数のうち今回解く日数」の割合で配分する
+    (上下限が同じ列 = 固定したセルの分は配分とは別に必ず入れる)。
+    """
+    D = model.x_index.shape[0]
+    free_x = np.zeros(model.n_vars, dtype=bool)
+    free_x[model.x_index[free_days].ravel()] = True
+    is_x = np.zeros(model.n_vars, dtype=bool)
+    is_x[model.x_index.ravel()] = True
+
+    keep_row = np.zeros(model.n_rows, dtype=bool)
+    keep_row[model.A_row[free_x[model.A_col]]] = True
+    free = free_x.copy()
+    free[model.A_col[keep_row[model.A_row] & ~is_x[model.A_col]]] = True
+
+    fixed_entry = ~free[model.A_col]
+    fixed_activity = np.bincount(model.A_row[fixed_entry],
+                                 weights=model.A_val[fixed_entry] * values[model.A_col[fixed_entry]],
+                                 minlength=model.n_rows)
+
+    rows = np.nonzero(keep_row)[0]
+    cols = np.nonzero(free)[0]
+    row_map = np.full(model.n_rows, -1)
+    row_map[rows] = np.arange(len(rows))
+    col_map = np.full(model.n_vars, -1)
+    col_map[cols] = np.arange(len(cols))
+
+    entry = keep_row[model.A_row] & free[model.A_col]
+    row_lo = model.row_lo[rows] - fixed_activity[rows]
+    row_hi = model.row_hi[rows] - fixed_activity[rows]
+
+    if budget_days is not None and "max_days" in model.families:
+        remaining_days, span = budget_days
+        is_budget = model.row_family[rows] == model.families.index("max_days")
+        pinned_entry = entry & (model.lb[model.A_col] == model.ub[model.A_col])
+        pinned = np.bincount(model.A_row[pinned_entry],
+                             weights=model.A_val[pinned_entry] * model.lb[model.A_col[pinned_entry]],
+                             minlength=model.n_rows)[rows][is_budget]
+        share = pinned + np.ceil(np.maximum(row_hi[is_budget] - pinned, 0) * span / max(remaining_days, 1))
+        row_hi[is_budget] = np.minimum(row_hi[is_budget], share)
+
+    x_index = col_map[model.x_index]
+    day_set = set(np.atleast_1d(free_days).tolist())
+    sub = MatrixModel(
+        c=model.c[cols],
+        lb=model.lb[cols],
+        ub=model.ub[cols],
+        is_int=model.is_int[cols],
+        names=[model.names[j] for j in cols],
+        A_row=row_map[model.A_row[entry]],
+        A_col=col_map[model.A_col[entry]],
+        A_val=model.A_val[entry],
+        row_lo=row_lo,
+        row_hi=row_hi,
+        row_family=model.row_family[rows],
+        families=model.families,
+        x_index=x_index,
+        days=[model.days[d] for d in range(D) if d in day_set],
+        staff_ids=model.staff_ids,
+        tier_c={tier: v[cols] for tier, v in model.tier_c.items()},
+    )
+    return SubModel(model=sub, cols=cols, rows=rows)
+
+
+@dataclass
+class RollingStats:
+    blocks: list = field(default_factory=list)
+    polish: list = field(default_factory=list)
+
+    def to_dict(self):
+        return {"blocks": self.blocks, "polish": self.polish}
+
+
+def solve_rolling(model, block_days=7, lookahead=7, polish_radius=3, solve=solve_cbc, options=None):
+    """週単位の部分問題を順に解く (ローリングホライズン)
+
+    各ブロックは block_days 日を確定させ、その先 lookahead 日も一緒に解いて境界の無理を避ける。
+    最後に各ブロックの境目 ±polish_radius 日だけを自由にして解き直す (既存の解を初期解にするので悪化しない)。
+    options.time_limit は全体の持ち時間として、残り時間を残りのブロック数で割って配る。
+    分割して解いた解は最適性の保証がないので status は "Feasible" になる。
+    上下限が同じ列 (warm start で固定したセルなど) は、まだ解いていない週でもその値として扱う。
+    """
+    options = options or SolverOptions()
+    D = model.x_index.shape[0]
+    values = np.where(model.lb == model.ub, model.lb, 0.0)
+    stats = RollingStats()
+    starts = list(range(0, D, block_days))
+    boundaries = list(range(block_days, D, block_days)) if polish_radius else []
+    deadline = time.perf_counter() + options.time_limit if options.time_limit else None
+
+    def budget(n_left):
+        if deadline is None:
+            return options
+        return replace(options, time_limit=max(1.0, (deadline - time.perf_counter()) / max(n_left, 1)))
+
+    for i, a in enumerate(starts):
+        free_days = np.arange(a, min(D, a + block_days + lookahead))
+        sub = restrict(model, free_days, values, budget_days=(D - a, len(free_days)))
+        t0 = time.perf_counter()
+        solved = solve(sub.model, options=budget(len(starts) - i + len(boundaries) / 2))
+        stats.blocks.append({"days": [int(free_days[0]) + 1, int(free_days[-1]) + 1],
+                             "variables": sub.model.n_vars, "status": solved.status,
+                             "sec": round(time.perf_counter() - t0, 4)})
+        if not solved.has_solution:
+            return SolveResult(status=solved.status), stats
+        values[sub.cols] = solved.values
+
+    for i, b in enumerate(boundaries):
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+        free_days = np.arange(max(0, b - polish_radius), min(D, b + polish_radius))
+        sub = restrict(model, free_days, values)
+        t0 = time.perf_counter()
+        solved = solve(sub.model, mip_start=values[sub.cols], options=budget(len(boundaries) - i))
+        stats.polish.append({"days": [int(free_days[0]) + 1, int(free_days[-1]) + 1],
+                             "status": solved.status, "sec": round(time.perf_counter() - t0, 4)})
+        if solved.has_solution and sub.model.c @ solved.values >= sub.model.c @ values[sub.cols]:
+            values[sub.cols] = solved.values
+
+    return SolveResult(status="Feasible", values=values, objective=float(model.c @ values)), stats
@@ -0,0 +1,188 @@
+import copy
+import json
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+# 店舗のルール表 (monthlyConfig の rules で項目ごとに上書きできる)
+DEFAULT_RULESET = {
+    # 役職名 -> RankID (Firestore上のrankIdより役職名を優先する)
+    "ranks": {"店長": 1, "リーダー": 2, "社員": 3, "パートナー": 4, "新規パートナー": 5},
+    # 役割 -> 当てはまる RankID
+    "roles": {
+        "manager": [1],
+        "leader": [1, 2],
+        "employee": [1, 2, 3],
+        "partner": [4],
+        "newcomer": [5],
+    },
+    # 時間指定のとき、開け (開店時刻までに出勤) / 鍵開け / 締め (閉店時刻まで勤務) に数える境界
+    "openTime": "10:00",
+    "openKeyTime": "09:30",
+    "closeTime": "21:30",
+    # 通常シフトの勤務時間帯 (パートナーの時間キャップと時間帯ごとの人数に使う。時間指定は希望の時刻)
+    "shiftTimes": {"A": ["09:30", "17:30"], "B": ["11:30", "19:30"], "C": ["13:30", "21:30"]},
+    # 時間帯ごとの最低人数 ({"from": "10:00", "to": "21:30", "min": 4} の list。空なら見ない) と、その刻み (分)
+    "slotCoverage": [],
+    "slotMinutes": 30,
+    # 毎日出勤させるリーダー以上の人数
+    "minLeaders": 2,
+    # 入れるシフトの制限 (早番固定など)。staffIds / names / ranks のどれかに当たる人は shifts にしか入れない
+    "shiftLimits": [
+        {"ranks": ["店長"], "shifts": ["A"]},
+        {"names": ["村上　秀人"], "shifts": ["A"]},
+    ],
+}
+# shiftLimits の shifts に書けるシフト (会議 M は制限しない)
+LIMIT_SHIFTS = ["A", "B", "C"]
+# 組み立て済みの StaffIndex を (ルール表, スタッフ) の要約ごとに残しておく数
+INDEX_CACHE_SIZE = 32
+
+_index_cache = OrderedDict()
+
+
+@lru_cache(maxsize=1024)
+def parse_hour(hhmm):
+    """HH:MM -> 時間 (float)。希望の時刻は同じ文字列が多いので結果を覚えておく"""
+    h, m = (hhmm or "00:00").split(":")
+    return int(h) + int(m) / 60
+
+
+def merge_ruleset(overrides=None):
+    """既定のルール表に monthlyConfig.rules を項目ごとに上書きしたものを返す"""
+    ruleset = copy.deepcopy(DEFAULT_RULESET)
+    for key, value in (overrides or {}).items():
+        if key in ruleset:
+            ruleset[key] = value
+    return ruleset
+
+
+def normalize_rank(data, ranks=None):
+    ranks = DEFAULT_RULESET["ranks"] if ranks is None else ranks
+    return ranks.get(data.get("rank", ""), data.get("rankId", 99))
+
+
+@dataclass
+class StaffIndex:
+    """ルール表をスタッフの並び (snap.staff_ids) に合わせて配列にしたもの
+
+    build_model / validate.compile_rules はスタッフごとの判定をここから取り、日ごとにスタッフを走査しない。
+    """
+
+    rank: np.ndarray
+    is_manager: np.ndarray
+    is_leader: np.ndarray
+    is_employee: np.ndarray
+    is_partner: np.ndarray
+    is_newcomer: np.ndarray
+    can_open: np.ndarray
+    can_close: np.ndarray
+    allowed: np.ndarray
+    open_hour: float
+    open_key_hour: float
+    close_hour: float
+    shift_start: np.ndarray
+    shift_end: np.ndarray
+    slot_minutes: int
+    coverage_slots: np.ndarray
+    coverage_mins: np.ndarray
+    min_leaders: int
+
+    def windows(self, start_h, end_h):
+        """時間指定の開始・終了時刻 (日, スタッフ) -> (開けに数える, 鍵開けに数える, 締めに数える)"""
+        return start_h <= self.open_hour, start_h <= self.open_key_hour, end_h >= self.close_hour
+
+    def cell_times(self, custom, start_h, end_h):
+        """(日, スタッフ, A/B/C) の勤務の開始・終了時刻 (float32)。時間指定のセルはどのシフトでも希望の時刻"""
+        shape = custom.shape + (len(LIMIT_SHIFTS),)
+        start = np.broadcast_to(self.shift_start, shape).copy()
+        end = np.broadcast_to(self.shift_end, shape).copy()
+        start[custom] = start_h[custom][:, None]
+        end[custom] = end_h[custom][:, None]
+        return start, end
+
+    def slot_cover(self, start, end):
+        """勤務 (日, スタッフ, シフト) が最低人数のある枠をまるごと含むか: (日, スタッフ, シフト, 枠) の bool"""
+        step = self.slot_minutes / 60
+        lo = self.coverage_slots * step
+        return (start[..., None] <= lo + 1e-6) & (end[..., None] >= lo + step - 1e-6)
+
+    def slot_labels(self):
+        return [f"{t * self.slot_minutes // 60:02d}:{t * self.slot_minutes % 60:02d}"
+                for t in self.coverage_slots.tolist()]
+
+
+def _coverage(rules):
+    """slotCoverage -> (最低人数のある枠の番号 (0:00 からの刻み), 枠ごとの最低人数)。重なる指定は大きい方"""
+    step = rules["slotMinutes"]
+    mins = {}
+    for item in rules["slotCoverage"]:
+        lo = int(np.ceil(parse_hour(item["from"]) * 60 / step - 1e-9))
+        hi = int(np.floor(parse_hour(item["to"]) * 60 / step + 1e-9))
+        for t in range(lo, hi):
+            mins[t] = max(mins.get(t, 0), int(item["min"]))
+    slots = np.array(sorted(t for t, n in mins.items() if n > 0), dtype=np.int16)
+    return slots, np.array([mins[t] for t in slots.tolist()], dtype=np.int16)
+
+
+def _digest(snap):
+    fields = [[sid, d["rankId"], d.get("name", ""), bool(d.get("canOpen")), bool(d.get("canClose"))]
+              for sid, d in snap.staffs.items()]
+    return zlib.crc32(json.dumps([snap.rules, fields], sort_keys=True, ensure_ascii=False).encode())
+
+
+def _build_index(snap):
+    rules = snap.rules
+    staffs, staff_ids = snap.staffs, snap.staff_ids
+    S = len(staff_ids)
+    rank = np.array([staffs[s]["rankId"] for s in staff_ids], dtype=int).reshape(S)
+    names = np.array([staffs[s].get("name", "") for s in staff_ids], dtype=object).reshape(S)
+
+    def role(name):
+        return np.isin(rank, rules["roles"].get(name, []))
+
+    slots, mins = _coverage(rules)
+    allowed = np.ones((S, len(LIMIT_SHIFTS)), dtype=bool)
+    for limit in rules["shiftLimits"]:
+        ranks = [rules["ranks"].get(r, r) for r in limit.get("ranks", [])]
+        who = (np.isin(staff_ids, limit.get("staffIds", [])) | np.isin(names, limit.get("names", []))
+               | np.isin(rank, ranks))
+        ok = np.isin(LIMIT_SHIFTS, limit.get("shifts", LIMIT_SHIFTS))
+        allowed[who] &= ok
+    return StaffIndex(
+        rank=rank,
+        is_manager=role("manager"),
+        is_leader=role("leader"),
+        is_employee=role("employee"),
+        is_partner=role("partner"),
+        is_newcomer=role("newcomer"),
+        can_open=np.array([bool(staffs[s].get("canOpen")) for s in staff_ids], dtype=bool).reshape(S),
+        can_close=np.array([bool(staffs[s].get("canClose")) for s in staff_ids], dtype=bool).reshape(S),
+        allowed=allowed,
+        open_hour=parse_hour(rules["openTime"]),
+        open_key_hour=parse_hour(rules["openKeyTime"]),
+        close_hour=parse_hour(rules["closeTime"]),
+        shift_start=np.array([parse_hour(rules["shiftTimes"][k][0]) for k in LIMIT_SHIFTS], dtype=np.float32),
+        shift_end=np.array([parse_hour(rules["shiftTimes"][k][1]) for k in LIMIT_SHIFTS], dtype=np.float32),
+        slot_minutes=int(rules["slotMinutes"]),
+        coverage_slots=slots,
+        coverage_mins=mins,
+        min_leaders=int(rules["minLeaders"]),
+    )
+
+
+def compile_ruleset(snap):
+    """snap.rules と snap.staffs から StaffIndex を作る (同じ入力なら前回の結果を使い回す)"""
+    key = _digest(snap)
+    index = _index_cache.get(key)
+    if index is None:
+        index = _build_index(snap)
+        _index_cache[key] = index
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    else:
+        _index_cache.move_to_end(key)
+    return index
@@ -0,0 +1,134 @@
+import calendar
+from dataclasses import dataclass, field
+from functools import cached_property
+
+from .ruleset import merge_ruleset, normalize_rank
+
+DEPARTMENTS = ["家電", "季節", "情報", "通信"]
+
+DEFAULT_CAPS = {"salesLow": 100, "hoursLow": 70, "salesHigh": 500, "hoursHigh": 100}
+DEFAULT_MIN_STAFF_COUNTS = {"open": 3, "close": 3}
+
+
+@dataclass
+class StaffGroups:
+    dept_groups: dict
+    store_managers: list
+    leaders_and_managers: list
+    employees: list
+    partners: list
+    newcomers: list
+
+
+@dataclass
+class Snapshot:
+    """1店舗・1ヶ月分のシフト作成に必要な入力をまとめたもの (Firestore非依存)"""
+
+    year: int
+    month: int
+    staffs: dict
+    request_map: dict
+    daily_sales: dict = field(default_factory=dict)
+    caps: dict = field(default_factory=lambda: dict(DEFAULT_CAPS))
+    min_skills: dict = field(default_factory=dict)
+    min_staff_counts: dict = field(default_factory=lambda: dict(DEFAULT_MIN_STAFF_COUNTS))
+    meetings: dict = field(default_factory=dict)
+    rules: dict = field(default_factory=merge_ruleset)
+
+    @property
+    def doc_id(self):
+        return f"{self.year}-{self.month}"
+
+    @property
+    def days_in_month(self):
+        return calendar.monthrange(self.year, self.month)[1]
+
+    @property
+    def days(self):
+        return [str(d) for d in range(1, self.days_in_month + 1)]
+
+    @property
+    def staff_ids(self):
+        return list(self.staffs.keys())
+
+    @cached_property
+    def groups(self):
+        dept_groups = {name: [] for name in DEPARTMENTS}
+        groups = StaffGroups(dept_groups, [], [], [], [], [])
+        roles = self.rules["roles"]
+        for sid, data in self.staffs.items():
+            rank_id = data["rankId"]
+            dept = data.get("department")
+            if dept in dept_groups:
+                dept_groups[dept].append(sid)
+
+            if rank_id in roles["manager"]: groups.store_managers.append(sid)
+            if rank_id in roles["leader"]: groups.leaders_and_managers.append(sid)
+            if rank_id in roles["employee"]: groups.employees.append(sid)
+            if rank_id in roles["partner"]: groups.partners.append(sid)
+            if rank_id in roles["newcomer"]: groups.newcomers.append(sid)
+        return groups
+
+    def request(self, day, sid):
+        return self.request_map[day].get(sid, {})
+
+    def to_dict(self):
+        return {
+            "year": self.year,
+            "month": self.month,
+            "staffs": self.staffs,
+            "requestMap": self.request_map,
+            "dailySales": self.daily_sales,
+            "caps": self.caps,
+            "minSkills": self.min_skills,
+            "minStaffCounts": self.min_staff_counts,
+            "meetings": self.meetings,
+            "rules": self.rules,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            year=data["year"],
+            month=data["month"],
+            staffs=data["staffs"],
+            request_map=data["requestMap"],
+            daily_sales=data.get("dailySales", {}),
+            caps=data.get("caps", dict(DEFAULT_CAPS)),
+            min_skills=data.get("minSkills", {}),
+            min_staff_counts=data.get("minStaffCounts", dict(DEFAULT_MIN_STAFF_COUNTS)),
+            meetings=data.get("meetings", {}),
+            rules=merge_ruleset(data.get("rules")),
+        )
+
+
+def build_snapshot(year, month, staff_docs, config=None, shift_docs=()):
+    """Firestoreから読んだ生データ (dict) からSnapshotを組み立てる
+
+    staff_docs: (staffId, dict) の列 / config: monthlyConfig の dict (無ければ None)
+    shift_docs: shifts の dict の列
+    config.rules があれば既定のルール表 (ruleset.DEFAULT_RULESET) を項目ごとに上書きする
+    """
+    rules = merge_ruleset((config or {}).get("rules"))
+    staffs = {}
+    for sid, data in staff_docs:
+        data = dict(data)
+        data["rankId"] = normalize_rank(data, rules["ranks"])
+        staffs[sid] = data
+
+    days_in_month = calendar.monthrange(year, month)[1]
+    request_map = {str(d): {} for d in range(1, days_in_month + 1)}
+    for d in shift_docs:
+        sid = d["staffId"]
+        for day, req in d.get("requests", {}).items():
+            if day in request_map:
+                request_map[day][sid] = req
+
+    snap = Snapshot(year=year, month=month, staffs=staffs, request_map=request_map, rules=rules)
+    if config:
+        snap.daily_sales = config.get("dailySales", {})
+        snap.caps = config.get("caps", snap.caps)
+        snap.min_skills = config.get("minSkills", {})
+        snap.min_staff_counts = config.get("minStaffCounts", snap.min_staff_counts)
+        snap.meetings = config.get("meetings", {})
+    return snap
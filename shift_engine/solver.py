@@ -0,0 +1,279 @@
+import functools
+import os
+import re
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field, replace
+
+import numpy as np
+
+# CBC の解ファイル先頭の単語 -> ステータス文字列
+# (Feasible: 時間切れ等で止まったが、実行可能解はある / Not Solved: 実行可能解なし)
+CBC_STATUS = {
+    "Optimal": "Optimal",
+    "Infeasible": "Infeasible",
+    "Integer": "Infeasible",
+    "Unbounded": "Unbounded",
+    "Stopped": "Not Solved",
+}
+SOLUTION_STATUSES = ("Optimal", "Feasible")
+
+
+@dataclass
+class SolverOptions:
+    """ソルバーに渡す設定
+
+    time_limit: 秒。時間切れのときは、それまでに見つかった一番良い解を返す
+    gap_rel: 相対 MIP ギャップ (0.01 なら最適値との差 1% 以内と証明できた時点で止める)
+    presolve: ソルバーに渡す前に、値の決まっている変数と不要な行を取り除く (presolve.presolve)
+    backend: "cbc" / "highs" / "cpsat" / "portfolio" (backends.BACKENDS)
+    portfolio: backend="portfolio" で同時に走らせる構成の名前 (portfolio.PORTFOLIO_CONFIGS) の list
+    """
+
+    threads: int = None
+    time_limit: float = None
+    gap_rel: float = None
+    presolve: bool = True
+    backend: str = "cbc"
+    portfolio: list = None
+
+    def cbc_args(self):
+        args = []
+        if self.time_limit:
+            args += ["-sec", str(self.time_limit)]
+        if self.gap_rel is not None:
+            args += ["-ratio", str(self.gap_rel)]
+        if self.threads:
+            args += ["-threads", str(self.threads)]
+        return args
+
+    def to_dict(self):
+        keys = {"threads": "threads", "time_limit": "timeLimit", "gap_rel": "gapRel", "backend": "backend",
+                "portfolio": "portfolio"}
+        return {keys[k]: v for k, v in asdict(self).items() if k in keys and v is not None}
+
+
+@dataclass
+class SolveResult:
+    status: str
+    values: np.ndarray = None
+    objective: float = None
+    bound: float = None
+    gap: float = None
+    timings: dict = field(default_factory=dict)
+    presolve: dict = None
+    portfolio: dict = None
+
+    @property
+    def has_solution(self):
+        return self.status in SOLUTION_STATUSES
+
+
+@functools.lru_cache(maxsize=1)
+def cbc_path():
+    """PuLP 同梱の CBC の場所 (pulp の import と探索は初回だけ。温かいインスタンスでは使い回す)"""
+    import pulp
+
+    return pulp.PULP_CBC_CMD().path
+
+
+def _column_lines(model, cols, c):
+    """指定した列の COLUMNS 行 (目的関数の係数 + 制約の係数) を列ごとにまとめて作る"""
+    indptr, rows, vals = model.to_csc()
+    counts = indptr[cols + 1] - indptr[cols]
+    starts = np.repeat(indptr[cols], counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    pos = starts + offsets
+    owner = np.repeat(cols, counts)
+    lines = [f"    C{j}  OBJ  {v!r}" for j, v in zip(cols.tolist(), c[cols].tolist())]
+    lines += [f"    C{j}  R{r}  {v!r}" for j, r, v in zip(owner.tolist(), rows[pos].tolist(), vals[pos].tolist())]
+    # 列ごとに連続させる (MPS の要件)
+    order = np.argsort(np.concatenate([cols, owner]), kind="stable")
+    return [lines[i] for i in order.tolist()]
+
+
+def write_mps(model, path):
+    """MatrixModel を MPS 形式で書き出す (目的関数は符号を反転して最小化として書く)"""
+    lo, hi = model.row_lo, model.row_hi
+    eq = lo == hi
+    ge = ~eq & ~np.isinf(lo)
+    ranged = ge & ~np.isinf(hi)
+    row_type = np.where(eq, "E", np.where(ge, "G", "L"))
+    rhs = np.where(eq | ge, lo, hi)
+    c = -model.c
+
+    lines = ["NAME          SHIFT", "ROWS", " N  OBJ"]
+    lines += [f" {t}  R{i}" for i, t in enumerate(row_type.tolist())]
+    lines.append("COLUMNS")
+    lines += _column_lines(model, np.nonzero(~model.is_int)[0], c)
+    int_cols = np.nonzero(model.is_int)[0]
+    if len(int_cols):
+        lines.append("    MARKER  'MARKER'  'INTORG'")
+        lines += _column_lines(model, int_cols, c)
+        lines.append("    MARKER  'MARKER'  'INTEND'")
+
+    lines.append("RHS")
+    nz = np.nonzero(rhs)[0]
+    lines += [f"    RHS  R{i}  {v!r}" for i, v in zip(nz.tolist(), rhs[nz].tolist())]
+    if ranged.any():
+        lines.append("RANGES")
+        rg = np.nonzero(ranged)[0]
+        lines += [f"    RNG  R{i}  {v!r}" for i, v in zip(rg.tolist(), (hi - lo)[rg].tolist())]
+
+    lines.append("BOUNDS")
+    lb, ub = model.lb, model.ub
+    free = np.nonzero(np.isinf(lb))[0]
+    lines += [f" MI BND  C{j}" for j in free.tolist()]
+    has_lo = np.nonzero(~np.isinf(lb) & ((lb != 0) | model.is_int))[0]
+    lines += [f" LO BND  C{j}  {v!r}" for j, v in zip(has_lo.tolist(), lb[has_lo].tolist())]
+    has_up = np.nonzero(~np.isinf(ub))[0]
+    lines += [f" UP BND  C{j}  {v!r}" for j, v in zip(has_up.tolist(), ub[has_up].tolist())]
+    lines.append("ENDATA")
+
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def read_solution(path, n_vars):
+    """CBC の解ファイルを読む (列名 C{j} のみ)"""
+    values = np.zeros(n_vars)
+    with open(path) as f:
+        words = f.readline().split()
+        status = CBC_STATUS.get(words[0], "Undefined") if words else "Undefined"
+        objective = None
+        if "objective" in words:
+            objective = float(words[words.index("objective") + 2])
+            if status == "Not Solved":
+                status = "Feasible"
+        for line in f:
+            parts = line.split()
+            if parts and parts[0] == "**":
+                parts = parts[1:]
+            if len(parts) < 3 or not parts[1].startswith("C"):
+                continue
+            values[int(parts[1][1:])] = float(parts[2])
+    return status, values, objective
+
+
+def write_mip_start(path, values):
+    """CBC の -mips 用の初期解ファイル (解ファイルと同じ形式) を書き出す"""
+    lines = ["Stopped on time - objective value 0"]
+    lines += [f"{j:>7} C{j} {v!r} 0" for j, v in enumerate(values.tolist())]
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def parse_cbc_log(text):
+    """CBC のログ末尾から 目的関数値 / 下界 (最小化として) を読む"""
+    found = {}
+    for key, label in (("objective", "Objective value"), ("bound", "Lower bound")):
+        m = re.search(rf"^{label}:\s*(\S+)", text, re.MULTILINE)
+        if m:
+            found[key] = float(m.group(1))
+    return found
+
+
+def relative_gap(objective, bound):
+    if objective is None or bound is None:
+        return None
+    return abs(bound - objective) / max(abs(objective), 1e-9)
+
+
+def empty_rows_infeasible(model, tol=1e-9):
+    """係数を持たない行で 0 が範囲外のもの (例: 鍵を持つ人が誰もいない日)"""
+    has_entry = np.zeros(model.n_rows, dtype=bool)
+    has_entry[model.A_row] = True
+    empty = ~has_entry
+    return bool(np.any(empty & ((model.row_lo > tol) | (model.row_hi < -tol))))
+
+
+def with_presolve(solve):
+    """solve(model, msg, mip_start, options) の前に presolve.presolve をかける (options.presolve のとき)
+
+    縮小したモデルを solve に渡し、解・初期解・上界は元の列に戻して返す。どのバックエンドにも共通。
+    """
+    @functools.wraps(solve)
+    def wrapper(model, msg=False, mip_start=None, options=None):
+        options = options or SolverOptions()
+        if not options.presolve:
+            return solve(model, msg=msg, mip_start=mip_start, options=options)
+        from .presolve import presolve
+
+        reduced = presolve(model)
+        if reduced.infeasible:
+            return SolveResult(status="Infeasible", presolve=reduced.stats)
+        if reduced.model.n_vars == 0:
+            # 全部の値が決まった (前回の解を全セル固定した再計算など): ソルバーを呼ぶまでもない
+            values = reduced.expand(np.zeros(0))
+            objective = float(model.c @ values)
+            return SolveResult(status="Optimal", values=values, objective=objective, bound=objective,
+                               gap=0.0, timings={"presolveSec": reduced.stats["sec"]}, presolve=reduced.stats)
+        start = mip_start[reduced.cols] if mip_start is not None else None
+        solved = solve(reduced.model, msg=msg, mip_start=start, options=replace(options, presolve=False))
+        solved.presolve = reduced.stats
+        solved.timings["presolveSec"] = reduced.stats["sec"]
+        if solved.has_solution:
+            solved.values = reduced.expand(solved.values)
+            solved.objective = float(model.c @ solved.values)
+            if solved.status == "Optimal":
+                solved.bound = solved.objective
+            elif solved.bound is not None:
+                solved.bound += reduced.offset
+            solved.gap = relative_gap(solved.objective, solved.bound)
+        return solved
+
+    return wrapper
+
+
+@with_presolve
+def solve_cbc(model, msg=False, mip_start=None, options=None):
+    """MatrixModel を MPS に書き出し、PuLP 同梱の CBC で解く
+
+    mip_start: 初期解ベクトル (前回のシフトなど)
+    options.time_limit で止まった場合は status="Feasible" で暫定解とギャップを返す
+    options.presolve (既定) のときは縮小したモデルを CBC に渡し、解は元の列に戻して返す
+    """
+    options = options or SolverOptions()
+    if empty_rows_infeasible(model):
+        return SolveResult(status="Infeasible")
+
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        mps_path = os.path.join(tmp, "model.mps")
+        sol_path = os.path.join(tmp, "model.sol")
+        write_mps(model, mps_path)
+        args = [cbc_path(), mps_path]
+        if mip_start is not None:
+            mst_path = os.path.join(tmp, "model.mst")
+            write_mip_start(mst_path, mip_start)
+            args += ["-mips", mst_path]
+        args += options.cbc_args()
+        args += ["-solve", "-solution", sol_path]
+        timings["writeSec"] = round(time.perf_counter() - t0, 4)
+
+        t0 = time.perf_counter()
+        proc = subprocess.run(args, capture_output=True, text=True, stdin=subprocess.DEVNULL, check=True)
+        timings["cbcSec"] = round(time.perf_counter() - t0, 4)
+        if msg:
+            print(proc.stdout)
+        if not os.path.exists(sol_path):
+            return SolveResult(status="Not Solved", timings=timings)
+
+        t0 = time.perf_counter()
+        status, values, _ = read_solution(sol_path, model.n_vars)
+        timings["readSec"] = round(time.perf_counter() - t0, 4)
+
+    if status == "Infeasible" and options.time_limit and timings["cbcSec"] >= options.time_limit * 0.95:
+        # 前処理の途中で時間切れになると CBC は「実行不可能」と報告することがあるので信用しない
+        status = "Not Solved"
+    if status not in SOLUTION_STATUSES:
+        return SolveResult(status=status, timings=timings)
+
+    objective = float(model.c @ values)
+    log = parse_cbc_log(proc.stdout)
+    # MPS は最小化 (-c) で書いているので、下界の符号を戻すと最大化の上界になる
+    bound = -log["bound"] if "bound" in log else (objective if status == "Optimal" else None)
+    return SolveResult(status=status, values=values, objective=objective,
+                       bound=bound, gap=relative_gap(objective, bound), timings=timings)
@@ -0,0 +1,87 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from .diagnose import by_day, capacity, precheck
+from .model import REQ_NONE, REQ_OFF, REQ_OTHER, REQ_PAID, REQUEST_CODES, A, B, C, request_arrays
+from .validate import compile_rules
+
+# 人件費の目安: 売上 (万円) の LABOR_COST_RATIO を時給 HOURLY_WAGE で割った時間 (売上10万円 -> 約25時間)
+HOURLY_WAGE = 1200
+LABOR_COST_RATIO = 0.3
+# 予算時間に対する「出勤が決まっている人の時間」の割合がこれを超えたら budget を付ける
+BUDGET_WARN_RATIO = 1.0
+WEEKDAYS = "月火水木金土日"
+# 種別コード -> 表示名 (request_frame の値。未提出は空文字)
+REQUEST_LABELS = np.full(REQ_OTHER + 1, "", dtype=object)
+REQUEST_LABELS[list(REQUEST_CODES.values())] = list(REQUEST_CODES)
+REQUEST_LABELS[REQ_OTHER] = "その他"
+
+
+def request_frame(snap, labels=False):
+    """日 × スタッフの希望の表
+
+    値は model の種別コード (REQ_*) の int8 (1つのブロックなので日ごとの集計が速い)。
+    labels=True なら 早番 / 希望休 などの表示名 (CSV 用、空文字は未提出) にする。
+    """
+    code = request_arrays(snap)[0]
+    return pd.DataFrame(REQUEST_LABELS[code] if labels else code, index=pd.Index(snap.days, name="day"),
+                        columns=pd.Index(snap.staff_ids, name="staffId"))
+
+
+def staffing_report(snap, hourly_wage=HOURLY_WAGE, labor_cost_ratio=LABOR_COST_RATIO, rules=None):
+    """1ヶ月分の日ごとの人員・鍵・予算の表 (1行1日)
+
+    avail{A,B,C} / available: そのシフト (どれか) に入れる人数 (休み・会議・シフト指定・シフト制限を反映)
+    openers / closers / keyOpeners / keyClosers / leaders: 開け・締め・鍵・リーダー以上に数えられる人数
+    partnerForcedHours / partnerCap: 出勤が決まっているパートナーの時間と、その日の売上で決まる時間の上限
+    forcedHours / budgetHours: 出勤が決まっている全員の時間と、売上から出した人件費の目安の時間
+    risks: その日に引っかかる条件 (diagnose.precheck のルール名 + budget / no_requests / zero_budget)
+    """
+    rules = rules or compile_rules(snap)
+    requests = request_frame(snap)
+    cap = capacity(rules)
+    ok = cap["ok"]
+    days = np.array(snap.days, dtype=int)
+    weekday = np.array([datetime.date(snap.year, snap.month, int(d)).weekday() for d in days])
+    sales = np.array([int(snap.daily_sales.get(d, 0)) for d in snap.days], dtype=float)
+
+    frame = pd.DataFrame({
+        "month": snap.doc_id,
+        "day": days,
+        "weekday": np.array(list(WEEKDAYS))[weekday],
+        "sales": sales,
+        "budgetHours": np.round(sales * 10000 * labor_cost_ratio / hourly_wage, 1),
+        "requests": requests.ne(REQ_NONE).sum(axis=1).to_numpy(),
+        "off": requests.isin([REQ_PAID, REQ_OFF]).sum(axis=1).to_numpy(),
+        "availA": ok[..., A].sum(axis=1),
+        "availB": ok[..., B].sum(axis=1),
+        "availC": ok[..., C].sum(axis=1),
+        "available": cap["work"].sum(axis=1),
+        "openers": cap["opener"].sum(axis=1),
+        "closers": cap["closer"].sum(axis=1),
+        "keyOpeners": cap["key_opener"].sum(axis=1),
+        "keyClosers": cap["key_closer"].sum(axis=1),
+        "leaders": cap["work"][:, rules.is_leader].sum(axis=1),
+        "partnerForcedHours": cap["forced_hours"][:, rules.is_partner].sum(axis=1),
+        "partnerCap": rules.hour_caps,
+        "forcedHours": cap["forced_hours"].sum(axis=1),
+    })
+
+    # 予算: 出勤が決まっている人だけで目安を超える / 売上0なのに人が来る / 誰も希望を出していない
+    extra = pd.DataFrame({
+        "budget": frame["forcedHours"] > frame["budgetHours"] * BUDGET_WARN_RATIO,
+        "zero_budget": (frame["budgetHours"] == 0) & (frame["requests"] > 0),
+        "no_requests": frame["requests"] == 0,
+    })
+    flagged = extra.apply(lambda col: np.where(col, col.name, ""))
+    day_rules = by_day(precheck(rules))
+    frame["risks"] = [", ".join(day_rules.get(d, []) + [name for name in names if name])
+                      for d, names in zip(snap.days, flagged.itertuples(index=False))]
+    return frame
+
+
+def risk_days(report):
+    """staffing_report (を月ごとにつないだ表) のうち、risks のある日だけ"""
+    return report[report["risks"] != ""]
@@ -0,0 +1,168 @@
+import itertools
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import replace
+
+from .solver import SolverOptions
+
+# 振ってよい monthlyConfig の項目 -> Snapshot のフィールド ("caps.hoursLow" のように「項目.キー」で指定する)
+SWEEP_FIELDS = {"caps": "caps", "minStaffCounts": "min_staff_counts", "minSkills": "min_skills"}
+# 比較表の列 (sweep_row の戻り値のうち表に並べるもの)
+TABLE_COLUMNS = ["id", "label", "status", "engine", "feasible", "objective", "partnerHours", "offViolations",
+                 "shortage", "missingDept", "solveSec"]
+
+# ワーカープロセスごとに1回だけ受け取る Snapshot と、シナリオをまたいで使い回すモデルの骨組み
+_WORKER = {"snap": None, "modelCache": None}
+
+
+def _label(overrides):
+    parts = [f"{field}.{key}={value}" for field, values in overrides.items() for key, value in values.items()]
+    return ", ".join(parts) or "現在の設定"
+
+
+def expand_scenarios(grid=None, variants=None, include_base=True):
+    """設定の組み合わせ -> シナリオ ({id, label, overrides}) の list
+
+    grid: {"caps.hoursLow": [60, 70, 80], "minStaffCounts.open": [2, 3]} のように項目ごとの候補 (全組み合わせを作る)
+    variants: [{"caps": {"hoursLow": 60}}, ...] のように組み合わせをそのまま並べたもの
+    include_base: 先頭に今の設定 (上書きなし) を入れる
+    """
+    overrides_list = [{}] if include_base else []
+    if grid:
+        paths = list(grid)
+        for path in paths:
+            field, _, key = path.partition(".")
+            if field not in SWEEP_FIELDS or not key:
+                raise ValueError(f"unknown sweep field: {path}")
+        for values in itertools.product(*(grid[path] for path in paths)):
+            overrides = {}
+            for path, value in zip(paths, values):
+                field, _, key = path.partition(".")
+                overrides.setdefault(field, {})[key] = value
+            overrides_list.append(overrides)
+    for overrides in variants or []:
+        unknown = set(overrides) - set(SWEEP_FIELDS)
+        if unknown:
+            raise ValueError(f"unknown sweep field: {sorted(unknown)}")
+        overrides_list.append(overrides)
+    return [{"id": f"s{i:02d}", "label": _label(o), "overrides": o} for i, o in enumerate(overrides_list)]
+
+
+def apply_overrides(snap, overrides):
+    """monthlyConfig の項目を上書きした Snapshot (名簿・希望は同じものを共有する)"""
+    changes = {SWEEP_FIELDS[field]: {**getattr(snap, SWEEP_FIELDS[field]), **values}
+               for field, values in overrides.items()}
+    return replace(snap, **changes)
+
+
+def _init_worker(snap):
+    from .model_cache import ModelCache
+
+    _WORKER["snap"] = snap
+    _WORKER["modelCache"] = ModelCache(disk=False)
+
+
+def sweep_row(scenario, mode="monolithic", options=None, heuristic_start=False):
+    """1シナリオを解いて比較表の1行にする (ワーカープロセスで動く。例外も行に変えて、全体は止めない)
+
+    engine はシフトを作ったもの: "solver" / "fallback" (ソルバーが間に合わず heuristic のシフトを使った) /
+    "preview" (mode="heuristic")。fallback の objective は heuristic のスコアなので、ソルバーの値とは分けて見る。
+    """
+    from .diagnose import describe
+    from .engine import generate_schedule
+    from .validate import compile_rules
+    from .warmstart import prior_assignment
+
+    t0 = time.perf_counter()
+    row = {"id": scenario["id"], "label": scenario["label"], "overrides": scenario["overrides"], "pid": os.getpid()}
+    try:
+        snap = apply_overrides(_WORKER["snap"], scenario["overrides"])
+        result = generate_schedule(snap, mode=mode, options=options or SolverOptions(threads=1),
+                                   heuristic_start=heuristic_start, model_cache=_WORKER["modelCache"])
+        used = (result.heuristic or {}).get("used", "start")
+        row.update({
+            "status": result.status,
+            "engine": "solver" if used == "start" else used,
+            "feasible": True if result.ok else (False if result.status == "Infeasible" else None),
+            "objective": result.objective,
+            "gap": result.gap,
+            "solveSec": result.timings.get("solveSec"),
+        })
+        if result.ok:
+            rules = compile_rules(snap)
+            assigned = prior_assignment(snap, result.schedule)
+            hours = sum(assigned[..., k] * rules.hours[..., k] for k in range(3))
+            soft = result.validation["soft"]
+            row.update({
+                "partnerHours": round(float(hours[:, rules.is_partner].sum()), 1),
+                "offViolations": soft["off_override"],
+                "shortage": soft["shortage"],
+                "missingDept": soft["missing_dept"],
+            })
+        elif result.diagnosis:
+            row["diagnosis"] = describe(result.diagnosis)
+    except Exception as e:
+        row["status"] = "Error"
+        row["feasible"] = None
+        row["error"] = f"{type(e).__name__}: {e}"
+        row["traceback"] = traceback.format_exc()
+    row["wallSec"] = round(time.perf_counter() - t0, 3)
+    return row
+
+
+def iter_sweep(snap, scenarios, workers=None, mode="monolithic", options=None, heuristic_start=False):
+    """シナリオをプロセスプールで並列に解き、終わった順に sweep_row の行を yield する
+
+    snap はワーカーごとに1回だけ渡す (シナリオごとには送らない)。options.time_limit は1シナリオあたりの制限時間、
+    options.threads は1シナリオあたりのソルバーのスレッド数 (workers * threads がコア数を超えないようにする)。
+    workers=1 か、プロセスプールを作れない環境 (/dev/shm の無いサーバーレスなど) ではこのプロセスで順に解く。
+    heuristic_start は engine.generate_schedule と同じ (既定 False。シナリオごとに heuristic の時間がかかる)。
+    """
+    options = options or SolverOptions(threads=1)
+    workers = workers or max(1, (os.cpu_count() or 1) // max(options.threads or 1, 1))
+    workers = min(workers, len(scenarios)) or 1
+    pool = None
+    if workers > 1:
+        try:
+            # gRPC (Firestore) は fork と相性が悪いので spawn で起動する
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_worker, initargs=(snap,))
+        except OSError:
+            pool = None
+    if pool is None:
+        _init_worker(snap)
+        for scenario in scenarios:
+            yield sweep_row(scenario, mode, options, heuristic_start)
+        return
+    with pool:
+        futures = [pool.submit(sweep_row, scenario, mode, options, heuristic_start) for scenario in scenarios]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # 途中でやめた (接続が切れたなど) ときは、まだ始まっていないシナリオを取り消す
+            for future in futures:
+                future.cancel()
+
+
+def summarize(rows, elapsed):
+    """比較表 (id 順、TABLE_COLUMNS の列) と、ソルバーで解けたシナリオのうち目的関数値が一番良いもの (best)"""
+    rows = sorted(rows, key=lambda r: r["id"])
+    table = [{key: row.get(key) for key in TABLE_COLUMNS} for row in rows]
+    # 同点なら id の若い方 (s00 = 今の設定)。fallback (heuristic のスコア) はソルバーの目的関数と比べない
+    solved = [row for row in rows if row.get("feasible") and row.get("objective") is not None
+              and row.get("engine") != "fallback"]
+    best = max(solved, key=lambda r: r["objective"])["id"] if solved else None
+    walls = [row["wallSec"] for row in rows]
+    return {
+        "scenarios": len(rows),
+        "feasible": sum(1 for row in rows if row.get("feasible")),
+        "best": best,
+        "elapsedSec": round(elapsed, 3),
+        "wallSecMax": max(walls) if walls else None,
+        "wallSecSum": round(sum(walls), 3),
+        "table": table,
+    }
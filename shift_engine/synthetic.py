@@ -0,0 +1,98 @@
+import calendar
+import math
+import random
+
+from .snapshot import DEPARTMENTS, build_snapshot
+
+SKILL_NAMES = ["fridge", "washing", "ac", "tv", "mobile", "pc"]
+
+# 店舗規模に対する役職の比率 (店長は常に1名)
+RANK_MIX = [("リーダー", 0.08), ("社員", 0.17), ("パートナー", 0.62), ("新規パートナー", 0.13)]
+PARTNER_REQUESTS = [("フリー", 0.45), ("早番", 0.15), ("中番", 0.1), ("遅番", 0.15), ("時間指定", 0.15)]
+CUSTOM_TIMES = [("09:30", "15:00"), ("10:00", "16:00"), ("13:00", "21:30"), ("15:30", "21:30"), ("11:00", "18:00")]
+
+
+def _pick(rnd, table):
+    r = rnd.random() * sum(w for _, w in table)
+    for value, w in table:
+        r -= w
+        if r <= 0:
+            return value
+    return table[-1][0]
+
+
+def make_store(n_staff, year=2026, month=3, request_density=0.5, custom_ratio=None,
+               n_skills=2, off_ratio=0.05, seed=0):
+    """ベンチマーク用の架空店舗の Snapshot を作る (Firestore不要)
+
+    request_density: パートナーが各日に希望を出す確率
+    custom_ratio: パートナーの希望のうち 時間指定 の割合 (None なら既定の比率)
+    n_skills: minSkills に設定するスキル数
+    off_ratio: 社員が各日に 希望休/有給 を出す確率
+    """
+    rnd = random.Random(seed)
+    days_in_month = calendar.monthrange(year, month)[1]
+
+    requests = PARTNER_REQUESTS
+    if custom_ratio is not None:
+        rest = [(t, w) for t, w in PARTNER_REQUESTS if t != "時間指定"]
+        scale = (1 - custom_ratio) / sum(w for _, w in rest)
+        requests = [(t, w * scale) for t, w in rest] + [("時間指定", custom_ratio)]
+
+    ranks = ["店長"]
+    for rank, ratio in RANK_MIX:
+        ranks += [rank] * max(2 if rank == "リーダー" else 1, round(n_staff * ratio))
+    ranks = (ranks + ["パートナー"] * n_staff)[:max(n_staff, 4)]
+
+    skills = SKILL_NAMES[:n_skills]
+    staff_docs = []
+    shift_docs = []
+    for i, rank in enumerate(ranks):
+        sid = f"staff{i:04d}"
+        is_employee = rank in ("店長", "リーダー", "社員")
+        data = {
+            "name": f"スタッフ{i}",
+            "rank": rank,
+            "department": DEPARTMENTS[i % len(DEPARTMENTS)],
+            "canOpen": is_employee or rnd.random() < 0.1,
+            "canClose": (is_employee and rank != "店長") or rnd.random() < 0.1,
+            "skills": {name: rnd.randint(0, 3) for name in skills},
+            "maxDays": 22 if is_employee else rnd.choice([12, 16, 20]),
+            "priority": rnd.choice(["1", "2", "2", "3"]),
+        }
+        staff_docs.append((sid, data))
+
+        reqs = {}
+        streak = 0
+        for d in range(1, days_in_month + 1):
+            if is_employee:
+                if rnd.random() < off_ratio:
+                    reqs[str(d)] = {"type": rnd.choice(["希望休", "有給"])}
+                continue
+            # 7連勤禁止に当たらないよう、出勤希望は5日続いたら1日空ける
+            if streak >= 5 or rnd.random() >= request_density:
+                streak = 0
+                continue
+            streak += 1
+            if rnd.random() < off_ratio:
+                reqs[str(d)] = {"type": "希望休"}
+                continue
+            r_type = _pick(rnd, requests)
+            req = {"type": r_type}
+            if r_type == "時間指定":
+                req["start"], req["end"] = rnd.choice(CUSTOM_TIMES)
+            reqs[str(d)] = req
+        shift_docs.append({"staffId": sid, "year": year, "month": month, "requests": reqs})
+
+    # パートナーの希望が通る程度に労働時間キャップを店舗規模へ合わせる
+    n_partners = sum(1 for r in ranks if r in ("パートナー", "新規パートナー"))
+    hours = n_partners * request_density * 8
+    config = {
+        "dailySales": {str(d): rnd.choice([80, 150, 300, 600]) for d in range(1, days_in_month + 1)},
+        "caps": {"salesLow": 100, "hoursLow": math.ceil(hours * 1.1),
+                 "salesHigh": 500, "hoursHigh": math.ceil(hours * 1.4)},
+        "minSkills": {name: 2 for name in skills},
+        "minStaffCounts": {"open": 3, "close": 3},
+        "meetings": {"10": [sid for sid, d in staff_docs if d["rank"] == "社員"][:2]},
+    }
+    return build_snapshot(year, month, staff_docs, config, shift_docs)
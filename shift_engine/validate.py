@@ -0,0 +1,296 @@
+import datetime
+from dataclasses import dataclass
+
+import numpy as np
+
+from .model import (
+    REQ_CUSTOM, REQ_EARLY, REQ_LATE, REQ_MID, REQ_NONE, REQ_OFF, REQ_PAID, SHIFT_BIAS, WORK_SHIFTS, A, B, C, M,
+    meeting_mask, partner_hour_cap, request_arrays,
+)
+from .ruleset import compile_ruleset
+from .warmstart import prior_assignment
+
+# 絶対条件 (モデルの行の種類と同じ名前) / ソフト条件と1件あたりの点数 (model.build_model の目的関数と同じ)
+HARD_RULES = [
+    "one_shift", "meeting", "open_staff", "close_staff", "open_key", "close_key", "leaders",
+    "partner_hours", "slot_coverage", "shift_limit", "seven_day", "max_days", "request",
+]
+SOFT_WEIGHTS = {
+    "off_override": -5000,  # 社員の希望休に出勤
+    "missing_dept": -2000,  # 部門の誰も出勤していない日
+    "four_in_row": -500,    # 社員の4連勤 (4日の窓ごと)
+    "late_early": -200,     # 社員の遅番 -> 翌日早番
+    "shortage": -100,       # スキル不足 (不足量1あたり)
+}
+
+
+@dataclass
+class Rules:
+    """Snapshot から1回だけ作る判定用の配列 ((日, スタッフ) の bool / 数値)"""
+
+    days: list
+    staff_ids: list
+    meet: np.ndarray
+    custom: np.ndarray
+    open_hit: np.ndarray
+    open_key_hit: np.ndarray
+    close_hit: np.ndarray
+    can_open: np.ndarray
+    can_close: np.ndarray
+    is_leader: np.ndarray
+    is_employee: np.ndarray
+    is_partner: np.ndarray
+    allowed: np.ndarray
+    min_open: int
+    min_close: int
+    min_leaders: int
+    hours: np.ndarray
+    slot_cover: np.ndarray
+    slot_mins: np.ndarray
+    slot_labels: list
+    hour_caps: np.ndarray
+    max_days: np.ndarray
+    rest: np.ndarray
+    must_work: np.ndarray
+    must_shift: np.ndarray
+    off_soft: np.ndarray
+    skill_levels: np.ndarray
+    skill_mins: np.ndarray
+    skill_names: list
+    dept_masks: np.ndarray
+    dept_names: list
+    bonus: np.ndarray
+
+
+def compile_rules(snap):
+    """model.build_model と同じ条件を、スケジュールの判定用に配列へ落とす"""
+    staffs = snap.staffs
+    days, staff_ids = snap.days, snap.staff_ids
+    S = len(staff_ids)
+    code, start_h, end_h = request_arrays(snap)
+    meet = meeting_mask(snap)
+    custom = code == REQ_CUSTOM
+
+    idx = compile_ruleset(snap)
+    is_employee, is_partner, is_newcomer = idx.is_employee, idx.is_partner, idx.is_newcomer
+    open_hit, open_key_hit, close_hit = idx.windows(start_h, end_h)
+    start, end = idx.cell_times(custom, start_h, end_h)
+    weekend = np.array([datetime.date(snap.year, snap.month, int(d)).weekday() >= 5 for d in days], dtype=bool)
+
+    # 希望処理: rest = 休み固定 / must_work = A・B・C のどれかに出勤 / must_shift = そのシフトに固定 (-1 は指定なし)
+    pn = (is_partner | is_newcomer)[None, :] & ~meet
+    pn_active = ~meet & ~np.isin(code, [REQ_NONE, REQ_PAID, REQ_OFF])
+    active = pn & pn_active
+    rest = ((code == REQ_PAID) & ~meet & is_employee[None, :]) | (pn & np.isin(code, [REQ_NONE, REQ_PAID, REQ_OFF]))
+    must_work = (active & is_newcomer[None, :]) | (active & custom)
+    must_shift = np.full(code.shape, -1, dtype=np.int8)
+    for req, k in ((REQ_EARLY, A), (REQ_MID, B), (REQ_LATE, C)):
+        must_shift[active & (code == req)] = k
+
+    # 目的関数のうち、出勤したセルに付く点数 (シフトの偏り・週末の社員・パートナーの優先度)
+    prio = np.array([str(staffs[s].get("priority", "2")) for s in staff_ids]).reshape(S)
+    weight = np.where(prio == "1", 100, np.where(prio == "2", 50, 10))
+    bonus = np.zeros(code.shape + (3,))
+    for k, st in enumerate(WORK_SHIFTS):
+        bonus[..., k] += SHIFT_BIAS[st]
+    bonus[np.ix_(weekend, is_employee, [A, B, C])] += 1000
+    bonus += np.where(pn_active & is_partner[None, :], weight[None, :], 0)[..., None]
+
+    skill_names = [name for name, v in snap.min_skills.items() if v > 0]
+    skill_levels = np.array([[staffs[s].get("skills", {}).get(name, 0) for s in staff_ids]
+                             for name in skill_names], dtype=float).reshape(len(skill_names), S)
+    dept_names = [name for name, members in snap.groups.dept_groups.items() if members]
+    dept_masks = np.array([np.isin(staff_ids, snap.groups.dept_groups[name]) for name in dept_names],
+                          dtype=bool).reshape(len(dept_names), S)
+
+    paid = (code == REQ_PAID).sum(axis=0)
+    return Rules(
+        days=days,
+        staff_ids=staff_ids,
+        meet=meet,
+        custom=custom,
+        open_hit=custom & open_hit,
+        open_key_hit=custom & open_key_hit,
+        close_hit=custom & close_hit,
+        can_open=idx.can_open,
+        can_close=idx.can_close,
+        is_leader=idx.is_leader,
+        is_employee=is_employee,
+        is_partner=is_partner,
+        allowed=idx.allowed,
+        min_open=snap.min_staff_counts.get("open", 3),
+        min_close=snap.min_staff_counts.get("close", 3),
+        min_leaders=idx.min_leaders,
+        hours=end - start,
+        slot_cover=idx.slot_cover(start, end),
+        slot_mins=idx.coverage_mins,
+        slot_labels=idx.slot_labels(),
+        hour_caps=np.array([partner_hour_cap(int(snap.daily_sales.get(d, 0)), snap.caps) for d in days], dtype=float),
+        max_days=np.array([staffs[s].get("maxDays", 22) for s in staff_ids], dtype=float).reshape(S) - paid,
+        rest=rest,
+        must_work=must_work,
+        must_shift=must_shift,
+        off_soft=(code == REQ_OFF) & ~meet & is_employee[None, :],
+        skill_levels=skill_levels,
+        skill_mins=np.array([snap.min_skills[name] for name in skill_names], dtype=float),
+        skill_names=skill_names,
+        dept_masks=dept_masks,
+        dept_names=dept_names,
+        bonus=bonus,
+    )
+
+
+def _window_sums(values, width):
+    """values (..., 日, スタッフ) の連続 width 日の合計 (..., 日 - width + 1, スタッフ)"""
+    cs = np.cumsum(values, axis=-2, dtype=np.int32)
+    pad = np.zeros(cs.shape[:-2] + (1, cs.shape[-1]), dtype=np.int32)
+    cs = np.concatenate([pad, cs], axis=-2)
+    return cs[..., width:, :] - cs[..., :-width, :]
+
+
+def _masks(rules, X):
+    """違反しているところの bool 配列 (ルール名 -> (..., 日) / (..., 日, スタッフ) / (..., スタッフ))
+
+    X は (..., 日, スタッフ, シフト) の 0/1。先頭の次元でまとめて何通りでも判定できる。
+    ソフト条件は不足量などの数値 (0 なら違反なし)。
+    """
+    # シフトごとの面 (..., 日, スタッフ) に分けておく (最後の軸で sum するより速い)
+    x = [np.ascontiguousarray(X[..., k], dtype=np.int16) for k in range(X.shape[-1])]
+    work = x[A] + x[B] + x[C]
+    total = work + x[M]
+    normal = ~rules.custom
+    fixed = np.where(rules.must_shift == A, x[A], np.where(rules.must_shift == B, x[B], x[C]))
+
+    def count(base, hit, who=None):
+        if who is None:
+            return (x[base] * normal + work * hit).sum(axis=-1)
+        return (x[base] * (normal & who[None, :]) + work * (hit & who[None, :])).sum(axis=-1)
+
+    hard = {
+        "one_shift": total > 1,
+        "meeting": (rules.meet & ((x[M] == 0) | (work > 0))) | (~rules.meet & (x[M] > 0)),
+        "open_staff": count(A, rules.open_hit) < rules.min_open,
+        "close_staff": count(C, rules.close_hit) < rules.min_close,
+        "open_key": count(A, rules.open_key_hit, rules.can_open) < 1,
+        "close_key": count(C, rules.close_hit, rules.can_close) < 1,
+        "leaders": (work[..., rules.is_leader].sum(axis=-1) < rules.min_leaders if rules.is_leader.any()
+                    else work[..., 0] < 0),
+        "partner_hours": (sum(x[k] * rules.hours[..., k] for k in (A, B, C))[..., rules.is_partner].sum(axis=-1)
+                          > rules.hour_caps + 1e-6),
+        # (..., 日, 枠)
+        "slot_coverage": sum(np.einsum("...ds,dst->...dt", x[k], rules.slot_cover[:, :, k, :].astype(np.int16))
+                             for k in (A, B, C)) < rules.slot_mins,
+        "shift_limit": (x[A] * ~rules.allowed[:, A] + x[B] * ~rules.allowed[:, B] + x[C] * ~rules.allowed[:, C]) > 0,
+        "max_days": rules.is_employee & (total.sum(axis=-2) > rules.max_days),
+        "request": ((rules.rest & (total > 0))
+                    | (rules.must_work & (work != 1))
+                    | ((rules.must_shift >= 0) & (fixed != 1))),
+    }
+    n_days = total.shape[-2]
+    hard["seven_day"] = _window_sums(total, 7) > 6 if n_days > 6 else total[..., :0, :] > 0
+
+    soft = {
+        "off_override": rules.off_soft & (total > 0),
+        "four_in_row": (rules.is_employee & (_window_sums(total, 4) > 3)) if n_days > 3 else total[..., :0, :] > 0,
+        "late_early": rules.is_employee & (x[C][..., :-1, :] > 0) & (x[A][..., 1:, :] > 0),
+        # (..., 日, 部門) / (..., 日, スキル)
+        "missing_dept": work @ rules.dept_masks.T.astype(np.int16) == 0,
+        "shortage": np.maximum(rules.skill_mins - work @ rules.skill_levels.T, 0),
+    }
+    lead = X.shape[:-3]
+    bonus = sum(x[k].reshape(lead + (-1,)) @ rules.bonus[..., k].ravel() for k in (A, B, C))
+    return hard, soft, bonus
+
+
+@dataclass
+class Evaluation:
+    """判定結果。hard / soft は ルール名 -> 件数 (まとめて判定したときは schedule ごとの配列)"""
+
+    hard: dict
+    soft: dict
+    penalties: dict
+    bonus: object
+    score: object
+
+    @property
+    def ok(self):
+        return np.sum(list(self.hard.values()), axis=0) == 0
+
+    def to_dict(self):
+        def plain(v):
+            return v.tolist() if isinstance(v, np.ndarray) else v
+
+        return {
+            "ok": plain(self.ok) if isinstance(self.ok, np.ndarray) else bool(self.ok),
+            "hard": {k: plain(v) for k, v in self.hard.items()},
+            "soft": {k: plain(v) for k, v in self.soft.items()},
+            "penalties": {k: plain(v) for k, v in self.penalties.items()},
+            "bonus": plain(self.bonus),
+            "score": plain(self.score),
+        }
+
+
+def evaluate(rules, assigned):
+    """x[日, スタッフ, シフト] の 0/1 配列 (先頭に schedule の次元を付けてもよい) を判定して点数を付ける
+
+    score は build_model の目的関数と同じ値になる (絶対条件を満たす解なら solver の objective と一致)。
+    """
+    X = np.asarray(assigned)
+    hard, soft, bonus = _masks(rules, X)
+    lead = X.ndim - 3
+
+    def total(mask):
+        return mask.reshape(mask.shape[:lead] + (-1,)).sum(axis=-1)
+
+    hard_counts = {name: total(hard[name]) for name in HARD_RULES}
+    soft_counts = {name: total(soft[name]) for name in SOFT_WEIGHTS}
+    penalties = {name: soft_counts[name] * weight for name, weight in SOFT_WEIGHTS.items()}
+    score = bonus + sum(penalties.values())
+    if lead == 0:
+        hard_counts = {k: int(v) for k, v in hard_counts.items()}
+        soft_counts = {k: float(v) if k == "shortage" else int(v) for k, v in soft_counts.items()}
+        penalties = {k: float(v) for k, v in penalties.items()}
+        bonus, score = float(bonus), float(score)
+    return Evaluation(hard=hard_counts, soft=soft_counts, penalties=penalties, bonus=bonus, score=score)
+
+
+def violations(rules, assigned):
+    """1つの schedule の違反を1件ずつ並べる ({rule, day, staffId, level})
+
+    level は "hard" (絶対条件) / "soft" (ペナルティ)。連勤の day は窓の初日。
+    """
+    hard, soft, _ = _masks(rules, np.asarray(assigned))
+    items = []
+    for level, masks in (("hard", hard), ("soft", soft)):
+        for rule, mask in masks.items():
+            mask = np.asarray(mask)
+            if rule == "max_days":
+                items += [{"level": level, "rule": rule, "staffId": rules.staff_ids[s]}
+                          for s in np.nonzero(mask)[0].tolist()]
+            elif rule == "slot_coverage":
+                items += [{"level": level, "rule": rule, "day": rules.days[d], "slot": rules.slot_labels[t]}
+                          for d, t in zip(*np.nonzero(mask))]
+            elif rule == "missing_dept":
+                items += [{"level": level, "rule": rule, "day": rules.days[d], "department": rules.dept_names[j]}
+                          for d, j in zip(*np.nonzero(mask))]
+            elif rule == "shortage":
+                items += [{"level": level, "rule": rule, "day": rules.days[d], "skill": rules.skill_names[j],
+                           "amount": float(mask[d, j])} for d, j in zip(*np.nonzero(mask))]
+            elif mask.ndim == 1:
+                items += [{"level": level, "rule": rule, "day": rules.days[d]} for d in np.nonzero(mask)[0].tolist()]
+            else:
+                items += [{"level": level, "rule": rule, "day": rules.days[d], "staffId": rules.staff_ids[s]}
+                          for d, s in zip(*np.nonzero(mask))]
+    return items
+
+
+def validate_schedule(snap, schedule, rules=None):
+    """determined_shifts の schedule (日 -> 割り当ての list) を Snapshot の条件で判定する
+
+    戻り値: evaluate の結果 (dict) に violations (1件ずつの一覧) を足したもの。
+    """
+    rules = rules or compile_rules(snap)
+    assigned = prior_assignment(snap, schedule)
+    report = evaluate(rules, assigned).to_dict()
+    report["violations"] = violations(rules, assigned)
+    return report
@@ -0,0 +1,161 @@
+import json
+import zlib
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+
+from .model import REQ_CUSTOM, SHIFT_TYPES, meeting_mask, partner_hour_cap, request_arrays
+from .ruleset import compile_ruleset
+
+LABEL_TO_SHIFT = {"A": 0, "B": 1, "C": 2, "会議": 3, "時間指定": 0}
+STAFF_FIELDS = ["rankId", "department", "canOpen", "canClose", "skills", "maxDays", "priority", "name"]
+CUSTOM_CODES = "abcdefgh"
+
+
+def _crc(value):
+    return format(zlib.crc32(json.dumps(value, sort_keys=True, ensure_ascii=False).encode()), "08x")
+
+
+def input_digest(snap):
+    """モデルに効く入力を (スタッフ, 日) 単位で要約する (determined_shifts に一緒に保存する)
+
+    希望は1日1文字: 種別コード。時間指定は時刻そのものではなく、
+    モデルが見る境界 (ルール表の鍵開け / 開け / 締めの時刻) を満たすかどうかで a-h に符号化する。
+    """
+    code, start_h, end_h = request_arrays(snap)
+    open_hit, open_key_hit, close_hit = compile_ruleset(snap).windows(start_h, end_h)
+    custom_class = open_key_hit.astype(int) * 4 + open_hit.astype(int) * 2 + close_hit.astype(int)
+    meet = meeting_mask(snap)
+    requests = {}
+    for si, sid in enumerate(snap.staff_ids):
+        requests[sid] = "".join(
+            CUSTOM_CODES[custom_class[di, si]] if code[di, si] == REQ_CUSTOM else str(code[di, si])
+            for di in range(len(snap.days))
+        )
+    return {
+        "requests": requests,
+        "staffs": {sid: _crc({k: data.get(k) for k in STAFF_FIELDS}) for sid, data in snap.staffs.items()},
+        # 時間指定の時刻は、勤務時間 (時間キャップ・時間帯ごとの人数) に効くのでその日の要約に入れる
+        "days": [
+            _crc([partner_hour_cap(int(snap.daily_sales.get(d, 0)), snap.caps), meet[di].tolist(),
+                  [[round(float(start_h[di, si]), 4), round(float(end_h[di, si]), 4)]
+                   for si in np.nonzero(code[di] == REQ_CUSTOM)[0].tolist()]])
+            for di, d in enumerate(snap.days)
+        ],
+        "global": _crc([snap.min_skills, snap.min_staff_counts, snap.staff_ids, snap.rules]),
+    }
+
+
+def changed_cells(snap, prev_digest):
+    """前回の input_digest と比べて、入力が変わった (日, スタッフ) の bool 配列を返す"""
+    D, S = len(snap.days), len(snap.staff_ids)
+    cur = input_digest(snap)
+    if not prev_digest or prev_digest.get("global") != cur["global"]:
+        return np.ones((D, S), dtype=bool)
+    touched = np.zeros((D, S), dtype=bool)
+    prev_req = prev_digest.get("requests", {})
+    prev_staff = prev_digest.get("staffs", {})
+    for si, sid in enumerate(snap.staff_ids):
+        old = prev_req.get(sid)
+        if old is None or len(old) != D or prev_staff.get(sid) != cur["staffs"][sid]:
+            touched[:, si] = True
+            continue
+        new = cur["requests"][sid]
+        touched[:, si] = [a != b for a, b in zip(old, new)]
+    prev_days = prev_digest.get("days", [])
+    for di in range(D):
+        if di >= len(prev_days) or prev_days[di] != cur["days"][di]:
+            touched[di, :] = True
+    return touched
+
+
+def free_cells(touched):
+    """変更のあったセルから、解き直す (日, スタッフ) を広げる
+
+    日単位の制約 (人数・鍵・リーダー・時間キャップ) があるので変更日の全員を、
+    連勤・上限日数は月全体にまたがるので変更のあったスタッフの全日を解放する。
+    """
+    return touched.any(axis=1)[:, None] | touched.any(axis=0)[None, :]
+
+
+def prior_assignment(snap, schedule):
+    """determined_shifts の schedule を x[日, スタッフ, シフト] の 0/1 配列に戻す
+
+    時間指定はどのシフトで割り当てたか保存されていないので A とみなす。
+    """
+    index = {s: i for i, s in enumerate(snap.staff_ids)}
+    assigned = np.zeros((len(snap.days), len(snap.staff_ids), len(SHIFT_TYPES)), dtype=bool)
+    for di, d in enumerate(snap.days):
+        for a in (schedule or {}).get(d, []):
+            si = index.get(a.get("staffId"))
+            k = LABEL_TO_SHIFT.get(a.get("shift"))
+            if si is not None and k is not None:
+                assigned[di, si, k] = True
+    return assigned
+
+
+@dataclass
+class WarmStart:
+    """前回の解 (MIP start) と、固定するセル"""
+
+    assigned: np.ndarray
+    fixed: np.ndarray = None
+    stats: dict = field(default_factory=dict)
+
+
+def make_warm_start(snap, schedule, prev_digest=None, fix_untouched=False):
+    assigned = prior_assignment(snap, schedule)
+    fixed = None
+    if fix_untouched:
+        fixed = ~free_cells(changed_cells(snap, prev_digest))
+    return WarmStart(assigned=assigned, fixed=fixed)
+
+
+def complete_start(model, start):
+    """x だけ入った初期解に、ペナルティ用の補助変数 (c4 / int / missing / shortage) の値を補う
+
+    補助変数はそれぞれ1本の行にしか現れないので、その行を満たす最小の値を入れる。
+    """
+    start = start.copy()
+    is_x = np.zeros(model.n_vars, dtype=bool)
+    is_x[model.x_index.ravel()] = True
+    on_x = is_x[model.A_col]
+    activity = np.bincount(model.A_row[on_x], weights=model.A_val[on_x] * start[model.A_col[on_x]],
+                           minlength=model.n_rows)
+
+    row, col, a = model.A_row[~on_x], model.A_col[~on_x], model.A_val[~on_x]
+    with np.errstate(invalid="ignore"):
+        need = np.where(a > 0, (model.row_lo[row] - activity[row]) / a,
+                        (model.row_hi[row] - activity[row]) / a)
+    need = np.nan_to_num(need, nan=-np.inf)
+    aux = np.nonzero(~is_x)[0]
+    value = model.lb[aux].copy()
+    pos = np.searchsorted(aux, col)
+    np.maximum.at(value, pos, need)
+    value = np.where(model.is_int[aux], np.ceil(value - 1e-9), value)
+    start[aux] = np.clip(value, model.lb[aux], model.ub[aux])
+    return start
+
+
+def apply_warm_start(model, warm):
+    """モデルに MIP start を付け、固定セルの x の上下限を前回の値に揃える
+
+    戻り値: (新しい MatrixModel, 初期解ベクトル)
+    """
+    start = np.zeros(model.n_vars)
+    start[model.x_index] = warm.assigned
+    start = complete_start(model, start)
+
+    n_x = model.x_index.size
+    n_fixed = 0
+    if warm.fixed is not None:
+        cols = model.x_index[warm.fixed].ravel()
+        vals = warm.assigned[warm.fixed].ravel().astype(float)
+        lb, ub = model.lb.copy(), model.ub.copy()
+        lb[cols] = vals
+        ub[cols] = vals
+        model = replace(model, lb=lb, ub=ub)
+        n_fixed = len(cols)
+
+    warm.stats = {"fixed": n_fixed, "freed": n_x - n_fixed, "startOnes": int(warm.assigned.sum())}
+    return model, start
@@ -1,7 +1,12 @@
 "use client";
 import { useState, useEffect } from "react";
 import { db } from "../lib/firebase";
-import { collection, addDoc, getDocs, deleteDoc, doc, updateDoc, query, orderBy, setDoc, getDoc, where, writeBatch } from "firebase/firestore";
+import { collection, addDoc, getDocs, deleteDoc, doc, updateDoc, query, orderBy, setDoc, getDoc, where, writeBatch, serverTimestamp } from "firebase/firestore";
+
+// ジョブ方式 (/api/jobs) で作成するか。job_worker.py などの実行役を用意したときだけ "1" にする
+const USE_JOBS = process.env.NEXT_PUBLIC_SHIFT_JOBS === "1";
+// ジョブの完了を待つ上限 (ミリ秒)
+const JOB_POLL_LIMIT_MS = 10 * 60 * 1000;
 
 export default function Home() {
   const [isAdmin, setIsAdmin] = useState(false);
@@ -138,8 +143,22 @@ export default function Home() {
     try {
       const docId = `${y}-${m}`;
       const snap = await getDoc(doc(db, "determined_shifts", docId));
-      if (snap.exists()) setDeterminedSchedule(snap.data().schedule || {});
-      else setDeterminedSchedule({});
+      if (!snap.exists()) { setDeterminedSchedule({}); return; }
+      const data = snap.data();
+      if (data.schedule) { setDeterminedSchedule(data.schedule); return; }
+      // 新形式: 日ごとのサブコレクション days/{日} (名前は親の staffNames に1回だけ)
+      const names = data.staffNames || {};
+      const daySnap = await getDocs(collection(db, "determined_shifts", docId, "days"));
+      const schedule = {};
+      daySnap.forEach(d => {
+        const day = d.data();
+        const times = day.times || {};
+        schedule[d.id] = (day.staff || []).map((sid, i) => ({
+          staffId: sid, name: names[sid] || "", shift: day.shift[i],
+          start: times[sid]?.start || "", end: times[sid]?.end || ""
+        }));
+      });
+      setDeterminedSchedule(schedule);
     } catch (e) { console.log("Determined shift fetch error"); }
   };
 
@@ -173,7 +192,8 @@ export default function Home() {
         name: newStaffName, rank: newStaffRank, rankId: rankMap[newStaffRank] || 99,
         department: newStaffDept, maxDays: 22, priority: "2", 
         canOpen: false, canClose: false,
-        skills: { fridge: 0, washing: 0, ac: 0, tv: 0, mobile: 0, pc: 0 }
+        skills: { fridge: 0, washing: 0, ac: 0, tv: 0, mobile: 0, pc: 0 },
+        updatedAt: serverTimestamp()
       });
       setNewStaffName(""); fetchStaffs();
     } catch (error) { alert("登録失敗"); }
@@ -185,7 +205,7 @@ export default function Home() {
       const batch = writeBatch(db);
       staffs.forEach(s => {
         const ref = doc(db, "staffs", s.id);
-        batch.update(ref, { maxDays: Number(bulkMaxDays) });
+        batch.update(ref, { maxDays: Number(bulkMaxDays), updatedAt: serverTimestamp() });
       });
       await batch.commit();
       fetchStaffs();
@@ -196,7 +216,7 @@ export default function Home() {
   const toggleKeyStatus = async (staff, type) => {
     const newVal = !staff[type];
     setStaffs(prev => prev.map(s => s.id === staff.id ? { ...s, [type]: newVal } : s));
-    await updateDoc(doc(db, "staffs", staff.id), { [type]: newVal });
+    await updateDoc(doc(db, "staffs", staff.id), { [type]: newVal, updatedAt: serverTimestamp() });
   };
   
   const updateStaffParam = async (staff, key, val) => {
@@ -206,14 +226,14 @@ export default function Home() {
        updateData.rankId = rankMap[val] || 99;
     }
     setStaffs(prev => prev.map(s => s.id === staff.id ? { ...s, ...updateData } : s));
-    await updateDoc(doc(db, "staffs", staff.id), updateData);
+    await updateDoc(doc(db, "staffs", staff.id), { ...updateData, updatedAt: serverTimestamp() });
   };
 
   const openSkillModal = (staff) => { setEditingStaff({ ...staff }); setSkillModalOpen(true); };
   const saveSkills = async () => {
     if (!editingStaff) return;
     try {
-      await updateDoc(doc(db, "staffs", editingStaff.id), { skills: editingStaff.skills });
+      await updateDoc(doc(db, "staffs", editingStaff.id), { skills: editingStaff.skills, updatedAt: serverTimestamp() });
       setSkillModalOpen(false); fetchStaffs();
     } catch (e) { alert("スキル保存失敗"); }
   };
@@ -395,7 +415,7 @@ export default function Home() {
     snap.forEach(async (d) => { await deleteDoc(doc(db, "shifts", d.id)); });
 
     await addDoc(collection(db, "shifts"), {
-      staffId: staff.id, name: staff.name, rank: staff.rank, year, month, requests: dataToSave, createdAt: new Date()
+      staffId: staff.id, name: staff.name, rank: staff.rank, year, month, requests: dataToSave, createdAt: new Date(), updatedAt: serverTimestamp()
     });
     alert("✅ 保存しました"); 
     
@@ -423,12 +443,56 @@ export default function Home() {
     });
   };
 
+  // /api/jobs にジョブを登録し、終わるまで状態を問い合わせる (phase: fetching → building → solving → writing)
+  const createShiftByJob = async () => {
+    const res = await fetch('/api/jobs', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ year, month })
+    });
+    let job = await res.json();
+    if (!res.ok) {
+      alert("❌ 作成失敗: " + (job.error || "エラー"));
+      return;
+    }
+    const deadline = Date.now() + JOB_POLL_LIMIT_MS;
+    while (job.status === "queued" || job.status === "running") {
+      if (Date.now() > deadline) {
+        alert("❌ 作成失敗: 時間内に終わりませんでした (ワーカーが動いているか確認してください)");
+        return;
+      }
+      await new Promise(r => setTimeout(r, 2000));
+      const poll = await fetch(`/api/jobs?jobId=${job.jobId || job.id}`);
+      const body = await poll.json();
+      if (!poll.ok) {
+        alert("❌ 作成失敗: " + (body.error || "ジョブが見つかりません"));
+        return;
+      }
+      job = { ...body, jobId: job.jobId || job.id };
+      console.log(`シフト作成: ${job.phase} ${Math.round((job.progress || 0) * 100)}% (${job.elapsedSec}秒)`);
+    }
+    if (job.status === "done") {
+      alert("✨ シフト作成成功！");
+      window.location.reload();
+      return;
+    }
+    alert("❌ 作成失敗: " + (job.error || "エラー"));
+  };
+
   const handleCreateShift = async () => {
     if(!confirm("クラウドAIでシフトを作成しますか？")) return;
     try {
       alert("🤖 計算中...");
       await saveConfig(); 
-      const res = await fetch('/api', { method: 'POST' }); 
+      if (USE_JOBS) {
+        await createShiftByJob();
+        return;
+      }
+      const res = await fetch('/api', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ year, month })
+      });
       if (res.ok) {
         const data = await res.json();
         alert("✨ " + data.message);
@@ -0,0 +1,105 @@
+"""monthlyConfig の設定 (caps / minStaffCounts / minSkills) を振って、まとめて解き比べる
+
+1回読み込んだ Snapshot を全シナリオで使い回し、ワーカープロセスで並列に解く。
+終わったシナリオから順に表示し、最後に比較表 (解けたか・目的関数値・パートナーの総時間・社員の希望休への出勤・
+スキル不足・部門の欠け・計算時間) を出す。先頭 (s00) は今の設定のまま。
+
+    python sweep_shift.py --year 2026 --month 2 --grid caps.hoursLow=60,70,80 --grid minStaffCounts.open=2,3
+    python sweep_shift.py --synthetic 60 --variants variants.json --time-limit 20 --out sweep.json
+"""
+import argparse
+import json
+import sys
+import time
+import warnings
+
+from shift_engine.solver import SolverOptions
+from shift_engine.sweep import TABLE_COLUMNS, expand_scenarios, iter_sweep, summarize
+
+warnings.filterwarnings("ignore")
+
+
+def parse_grid(items):
+    """["caps.hoursLow=60,70,80", ...] -> {"caps.hoursLow": [60, 70, 80], ...} (値は JSON として読む)"""
+    grid = {}
+    for item in items or []:
+        path, _, values = item.partition("=")
+        grid[path] = [json.loads(v) for v in values.split(",") if v]
+    return grid
+
+
+def print_row(row):
+    if row["status"] == "Error":
+        print(f"💥 {row['id']} {row['label']}: {row['error']}")
+    elif row.get("feasible"):
+        engine = "" if row.get("engine") == "solver" else f" ({row.get('engine')})"
+        print(f"✅ {row['id']} {row['label']}: {row['status']}{engine} 目的関数 {row['objective']:.1f}, "
+              f"パートナー {row['partnerHours']}時間, 希望休出勤 {row['offViolations']}, "
+              f"スキル不足 {row['shortage']}, 部門欠け {row['missingDept']} ({row['wallSec']:.2f}秒)")
+    else:
+        reason = f" {row['diagnosis']}" if row.get("diagnosis") else ""
+        print(f"❌ {row['id']} {row['label']}: {row['status']}{reason} ({row['wallSec']:.2f}秒)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="月の設定を振ったシフト作成の比較")
+    parser.add_argument("--year", type=int, default=2026)
+    parser.add_argument("--month", type=int, default=2)
+    parser.add_argument("--grid", action="append", help="項目=候補1,候補2,... (繰り返すと全組み合わせ)")
+    parser.add_argument("--variants", default=None, help="組み合わせを並べた JSON ファイル ([{\"caps\": {...}}, ...])")
+    parser.add_argument("--synthetic", type=int, default=None, help="Firestore の代わりにこの人数の架空店舗を使う")
+    parser.add_argument("--mode", default="monolithic", choices=["monolithic", "rolling", "lexicographic", "heuristic"])
+    parser.add_argument("--workers", type=int, default=None, help="同時に動かすプロセス数")
+    parser.add_argument("--threads", type=int, default=1, help="1シナリオあたりのソルバーのスレッド数")
+    parser.add_argument("--time-limit", type=float, default=30, help="1シナリオあたりの制限時間 (秒)")
+    parser.add_argument("--backend", default="cbc", choices=["cbc", "highs", "cpsat", "portfolio"],
+                        help="使うソルバー (portfolio は CBC の設定違いを同時に走らせる)")
+    parser.add_argument("--heuristic-start", action="store_true",
+                        help="貪欲法 + 局所探索のシフトを初期解にする (ソルバーが間に合わなければそれを使う。表の engine が fallback)")
+    parser.add_argument("--out", default=None, help="全シナリオの結果を保存する JSON")
+    args = parser.parse_args(argv)
+
+    variants = None
+    if args.variants:
+        with open(args.variants) as f:
+            variants = json.load(f)
+    scenarios = expand_scenarios(parse_grid(args.grid), variants)
+
+    t0 = time.perf_counter()
+    if args.synthetic:
+        from shift_engine.synthetic import make_store
+
+        snap = make_store(args.synthetic, args.year, args.month)
+    else:
+        from shift_engine.cache import SnapshotCache
+        from shift_engine.firestore_io import get_client
+
+        snap = SnapshotCache().load_snapshot(get_client(), args.year, args.month)
+    print(f"🤖 {args.year}年{args.month}月 ({len(snap.staffs)}名): {len(scenarios)}通りを解きます "
+          f"(読み込み {time.perf_counter() - t0:.2f}秒)")
+
+    t0 = time.perf_counter()
+    options = SolverOptions(threads=args.threads, time_limit=args.time_limit, backend=args.backend)
+    rows = []
+    for row in iter_sweep(snap, scenarios, workers=args.workers, mode=args.mode, options=options,
+                          heuristic_start=args.heuristic_start):
+        rows.append(row)
+        print_row(row)
+    summary = summarize(rows, time.perf_counter() - t0)
+
+    import pandas as pd
+
+    print("-" * 30)
+    print(pd.DataFrame(summary["table"], columns=TABLE_COLUMNS).to_string(index=False))
+    print(f"📊 {summary['feasible']}/{summary['scenarios']}通り解けました, {summary['elapsedSec']}秒 "
+          f"(1通りずつなら {summary['wallSecSum']}秒)。目的関数が一番良いのは {summary['best']}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"summary": summary, "rows": rows}, f, ensure_ascii=False, indent=2)
+        print(f"💾 {args.out} に保存しました")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())